@@ -0,0 +1,117 @@
+"""
+Admission control for the FinAI backend.
+Caps concurrent work at what the Snowflake pool can serve and sheds the excess with 429 instead of queueing it without limit.
+"""
+
+import json
+import time
+
+from scheduler import PriorityClass, Scheduler
+
+
+class AdmissionController:
+    """WSGI middleware that admits requests through a priority ``Scheduler``.
+
+    ``classify(path)`` names the scheduling class of a request and
+    ``client_id(environ)`` the API key its rate limits are charged to.
+    Without a ``scheduler`` a single class is used: at most ``max_active``
+    requests run, up to ``max_queue`` more wait for at most
+    ``queue_timeout`` seconds, and anything beyond that is answered
+    immediately with ``429 Too Many Requests`` and a ``Retry-After``
+    estimated from recent service times. A slot is held until the response
+    body has been fully sent, so streaming responses count against the
+    limit too.
+
+    Paths starting with one of ``exempt`` (health checks, metrics) bypass
+    the limit so the server stays observable while overloaded.
+    ``reject_headers`` are added to every 429, e.g. for CORS.
+    """
+
+    def __init__(self, app, max_active=8, max_queue=16, queue_timeout=5.0, exempt=(), reject_headers=(),
+                 scheduler=None, classify=None, client_id=None):
+        self.app = app
+        self.scheduler = scheduler or Scheduler(
+            max_active, [PriorityClass('default', 0, max_active, max_queue, queue_timeout)])
+        self.classify = classify or (lambda path: self.scheduler.default_class)
+        self.client_id = client_id or (lambda environ: None)
+        self.exempt = tuple(exempt)
+        self.reject_headers = list(reject_headers)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if self.scheduler.capacity <= 0 or path.startswith(self.exempt):
+            return self.app(environ, start_response)
+
+        class_name = self.classify(path)
+        reason, retry_after = self.scheduler.acquire(class_name, self.client_id(environ))
+        if reason is not None:
+            return self._reject(start_response, reason, retry_after)
+
+        started = time.monotonic()
+
+        def release():
+            self.scheduler.release(class_name, time.monotonic() - started)
+
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            release()
+            raise
+        return _ReleasingIterable(body, release)
+
+    def _reject(self, start_response, reason, retry_after):
+        if reason == 'rate_limited':
+            message = 'Rate limit exceeded for this API key, retry later'
+        else:
+            message = 'Server is at capacity, retry later'
+        body = json.dumps({'error': message, 'reason': reason}).encode('utf-8')
+        start_response('429 Too Many Requests', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(retry_after)),
+            *self.reject_headers,
+        ])
+        return [body]
+
+    def stats(self):
+        """Scheduler totals plus the per-class breakdown."""
+        stats = self.scheduler.stats()
+        rejected = {}
+        for cls in stats['classes'].values():
+            for reason, count in cls['rejected'].items():
+                rejected[reason] = rejected.get(reason, 0) + count
+        return {
+            **stats,
+            'max_active': stats['capacity'],
+            'max_queue': sum(cls['max_queue'] for cls in stats['classes'].values()),
+            'admitted': sum(cls['admitted'] for cls in stats['classes'].values()),
+            'rejected': rejected,
+        }
+
+
+class _ReleasingIterable:
+    """Response body wrapper that frees the admission slot once the body is sent or closed."""
+
+    def __init__(self, body, release):
+        self._body = body
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        try:
+            yield from self._body
+        finally:
+            # Freed as soon as the body is exhausted, even if the server closes it later
+            self._release_once()
+
+    def close(self):
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._release_once()
+
+    def _release_once(self):
+        if not self._released:
+            self._released = True
+            self._release()
@@ -4,52 +4,630 @@ FinAI Backend - Snowflake Cortex AI Financial Services API
 Flask backend that connects to Snowflake and provides AI-powered financial services.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import logging
 from datetime import datetime, timedelta
+import contextvars
+import functools
+import hashlib
 import json
+import math
+import re
+import time
+import zlib
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
-# Snowflake imports
-try:
-    import snowflake.connector
-    from snowflake.connector import DictCursor
-except ImportError:
-    print("❌ Install snowflake-connector-python: pip install snowflake-connector-python")
-    exit(1)
-
-# Cryptography imports for key-pair authentication
-try:
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.hazmat.primitives.asymmetric import rsa
-    from cryptography.hazmat.backends import default_backend
-except ImportError:
-    print("❌ Install cryptography for key-pair auth: pip install cryptography")
-    print("   Note: Key-pair authentication will be disabled without this package")
-    serialization = None
+# snowflake.connector and cryptography are imported on first use (see
+# SnowflakeCortexAI.connector and _load_private_key); together they add
+# around a second to cold start, which autoscaled pods pay on every launch.
+
+from connection_pool import SnowflakeConnectionPool, PoolExhaustedError
+from response_cache import ResponseCache
+from fraud_prescreen import FraudPrescreen
+from async_jobs import AsyncJob, AsyncJobStore
+from single_flight import SingleFlight
+from metrics import MetricsRegistry
+from model_router import ModelRouter, DEFAULT_POLICIES
+from deadline import Deadline, DeadlineExceeded, socket_disconnected
+from chat_sessions import ChatSessionStore
+from semantic_cache import SemanticCache, LOCAL_EMBEDDING_DIM, hashing_embedding
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from query_log import SlowQueryLog, current_trace_id, new_trace_id, prompt_chars, query_tag, set_trace_id
+from admission import AdmissionController
+from scheduler import DEFAULT_CLASSES, DEFAULT_ROUTES, PriorityClass, Scheduler
+from traffic_capture import DEFAULT_MASK_FIELDS, PiiMasker, TrafficCapture
+from workloads import (DEFAULT_WORKLOAD, DEFAULT_WORKLOADS, DEFAULT_WORKLOAD_ROUTES, Workload, current_workload,
+                       set_workload, workload_for_path)
+
+# Snowflake error codes meaning the session is gone and a fresh connection is needed
+SESSION_ERROR_CODES = {
+    390111,  # Session no longer exists
+    390112,  # Session has been closed
+    390114,  # Authentication token has expired
+}
+
+# Snowflake error codes for statements cancelled for running too long
+QUERY_TIMEOUT_CODES = {
+    604,  # SQL execution canceled (cursor.execute timeout)
+    630,  # Statement reached its statement timeout
+}
+
+FRAUD_PROMPT = (
+    'As a fraud detection expert, analyze this transaction and provide a risk score (0-100) and explanation. '
+    'Consider factors like amount, merchant type, location, and timing patterns. '
+    'Respond in JSON format with "risk_score", "risk_level", and "explanation" fields.\n\n'
+)
+
+# COMPLETE with an options argument takes a message list and returns a JSON
+# envelope; the generated text is extracted from choices[0].messages.
+FRAUD_QUERY = """
+SELECT PARSE_JSON(SNOWFLAKE.CORTEX.COMPLETE(
+    %s,
+    ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', CONCAT(%s, %s))),
+    PARSE_JSON(%s)
+)):choices[0]:messages::STRING as fraud_analysis
+"""
+
+SENTIMENT_QUERY = """
+SELECT 
+    SNOWFLAKE.CORTEX.SENTIMENT(%s) as sentiment_score,
+    PARSE_JSON(SNOWFLAKE.CORTEX.COMPLETE(
+        %s,
+        ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', CONCAT(
+            'Analyze this financial news for market impact. Provide investment implications in JSON format with ',
+            '"sentiment", "market_impact", "sectors_affected", and "investment_recommendation" fields.\n\n',
+            %s
+        ))),
+        PARSE_JSON(%s)
+    )):choices[0]:messages::STRING as market_analysis
+"""
+
+RISK_PROMPT = (
+    'As a credit risk analyst, evaluate this customer profile and provide a credit score (300-850), '
+    'risk category (Low/Medium/High), and detailed analysis. '
+    'Respond in JSON format with "credit_score", "risk_category", "approval_recommendation", and "analysis" fields.\n\n'
+)
+
+RISK_QUERY = """
+SELECT PARSE_JSON(SNOWFLAKE.CORTEX.COMPLETE(
+    %s,
+    ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', CONCAT(%s, %s))),
+    PARSE_JSON(%s)
+)):choices[0]:messages::STRING as risk_assessment
+"""
+
+CHAT_QUERY = """
+SELECT PARSE_JSON(SNOWFLAKE.CORTEX.COMPLETE(
+    %s,
+    ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', %s)),
+    PARSE_JSON(%s)
+)):choices[0]:messages::STRING as chat_response
+"""
+
+EMBED_QUESTION_QUERY = """
+SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_768(%s, %s) as embedding
+"""
+
+CHAT_SUMMARY_PROMPT = (
+    'Summarize this conversation between a user and a financial advisor assistant in under 150 words. '
+    'Keep the facts the user shared about their finances, their goals and any advice already given. '
+    'Reply with the summary only.\n\n'
+)
+
+# Profile fields read from the customers table for server-side credit risk
+# assessment. The text is constant so Snowflake can reuse the compiled plan.
+CUSTOMER_PROFILE_QUERY = """
+SELECT customer_id, annual_income, credit_score, employment_status, employment_years,
+       debt_to_income_ratio, previous_defaults, credit_utilization
+FROM customers
+WHERE customer_id = %s
+"""
+
+# Resolves a portfolio by explicit IDs or by a filter; unset criteria are ignored.
+PORTFOLIO_PROFILES_QUERY = """
+SELECT customer_id, annual_income, credit_score, employment_status, employment_years,
+       debt_to_income_ratio, previous_defaults, credit_utilization
+FROM customers
+WHERE (%(customer_ids)s IS NULL
+       OR customer_id IN (SELECT value::STRING FROM TABLE(FLATTEN(input => PARSE_JSON(%(customer_ids)s)))))
+  AND (%(state)s IS NULL OR state = %(state)s)
+  AND (%(employment_status)s IS NULL OR employment_status = %(employment_status)s)
+  AND (%(min_credit_score)s IS NULL OR credit_score >= %(min_credit_score)s)
+  AND (%(max_credit_score)s IS NULL OR credit_score <= %(max_credit_score)s)
+  AND (%(min_annual_income)s IS NULL OR annual_income >= %(min_annual_income)s)
+  AND (%(max_annual_income)s IS NULL OR annual_income <= %(max_annual_income)s)
+ORDER BY customer_id
+LIMIT %(limit)s
+"""
+
+# Filter keys accepted by /api/risk/portfolio
+PORTFOLIO_FILTERS = ('state', 'employment_status', 'min_credit_score', 'max_credit_score',
+                     'min_annual_income', 'max_annual_income')
+
+# Scores the transactions table inside Snowflake; the transaction context mirrors
+# SnowflakeCortexAI._build_transaction_context so bulk and API scores agree.
+BULK_FRAUD_SCORING_SQL = """
+MERGE INTO fraud_scores s
+USING (
+    SELECT
+        transaction_id,
+        TRY_TO_NUMBER(analysis:risk_score::STRING) AS risk_score,
+        analysis:risk_level::STRING AS risk_level,
+        COALESCE(analysis:explanation::STRING, raw_analysis) AS explanation
+    FROM (
+        SELECT
+            t.transaction_id,
+            PARSE_JSON(SNOWFLAKE.CORTEX.TRY_COMPLETE(
+                %(model)s,
+                ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', CONCAT(
+                    %(prompt)s,
+                    'Transaction Details:\nAmount: $', COALESCE(TO_VARCHAR(t.amount), '0'),
+                    '\nMerchant: ', COALESCE(t.merchant, 'Unknown'),
+                    '\nLocation: ', COALESCE(t.location, 'Unknown'),
+                    '\nTime: ', COALESCE(TO_VARCHAR(t.transaction_time), 'Unknown'),
+                    '\nCard Type: ', COALESCE(t.card_type, 'Unknown'),
+                    '\nCustomer ID: ', COALESCE(t.customer_id, 'Unknown')
+                ))),
+                PARSE_JSON(%(options)s)
+            )):choices[0]:messages::STRING AS raw_analysis,
+            TRY_PARSE_JSON(raw_analysis) AS analysis
+        FROM transactions t
+        WHERE %(rescore)s
+           OR NOT EXISTS (SELECT 1 FROM fraud_scores f WHERE f.transaction_id = t.transaction_id)
+    )
+) scored
+ON s.transaction_id = scored.transaction_id
+WHEN MATCHED THEN UPDATE SET
+    risk_score = scored.risk_score,
+    risk_level = scored.risk_level,
+    explanation = scored.explanation,
+    model = %(model)s,
+    scored_at = CURRENT_TIMESTAMP()
+WHEN NOT MATCHED THEN INSERT (transaction_id, risk_score, risk_level, explanation, model, scored_at)
+    VALUES (scored.transaction_id, scored.risk_score, scored.risk_level, scored.explanation, %(model)s, CURRENT_TIMESTAMP())
+"""
+
+# Incremental sentiment scoring of market_news. Rows published after the stored
+# watermark are new; rows inside the lookback window whose headline or content
+# hash changed since they were scored are re-scored. Everything happens in one
+# set-based UPDATE, so article text never leaves Snowflake.
+NEWS_SCORING_PIPELINE = 'market_news_sentiment'
+
+NEWS_WATERMARK_QUERY = """
+SELECT watermark FROM scoring_watermarks WHERE pipeline = %s
+"""
+
+NEWS_SENTIMENT_SCORING_SQL = """
+UPDATE market_news n
+SET sentiment_score = scored.sentiment_score,
+    impact_level = CASE
+        WHEN ABS(scored.sentiment_score) >= %(high_impact)s THEN 'High'
+        WHEN ABS(scored.sentiment_score) >= %(medium_impact)s THEN 'Medium'
+        ELSE 'Low'
+    END,
+    content_hash = scored.text_hash,
+    scored_at = CURRENT_TIMESTAMP()
+FROM (
+    SELECT
+        news_id,
+        text_hash,
+        ROUND(SNOWFLAKE.CORTEX.SENTIMENT(article), 2) AS sentiment_score
+    FROM (
+        SELECT
+            m.news_id,
+            m.publish_date,
+            m.content_hash,
+            CONCAT(COALESCE(m.headline, ''), '\n\n', COALESCE(m.content, '')) AS article,
+            SHA2(article) AS text_hash
+        FROM market_news m
+    )
+    WHERE %(rescore)s
+       OR %(watermark)s IS NULL
+       OR content_hash IS NULL
+       OR publish_date > TO_TIMESTAMP(%(watermark)s)
+       OR (publish_date >= DATEADD(hour, -%(lookback_hours)s, TO_TIMESTAMP(%(watermark)s))
+           AND content_hash <> text_hash)
+) scored
+WHERE n.news_id = scored.news_id
+"""
+
+ADVANCE_NEWS_WATERMARK_SQL = """
+MERGE INTO scoring_watermarks w
+USING (
+    SELECT %(pipeline)s AS pipeline, MAX(publish_date) AS watermark
+    FROM market_news
+    WHERE scored_at IS NOT NULL
+) latest
+ON w.pipeline = latest.pipeline
+WHEN MATCHED AND latest.watermark IS NOT NULL THEN UPDATE SET
+    watermark = GREATEST(COALESCE(w.watermark, latest.watermark), latest.watermark),
+    updated_at = CURRENT_TIMESTAMP()
+WHEN NOT MATCHED AND latest.watermark IS NOT NULL THEN INSERT (pipeline, watermark, updated_at)
+    VALUES (latest.pipeline, latest.watermark, CURRENT_TIMESTAMP())
+"""
+
+NEWS_SENTIMENT_COLUMNS = """
+SELECT news_id, headline, source, publish_date, sector, sentiment_score, impact_level, scored_at
+FROM market_news
+"""
+
+# Sentiment per sector and time bucket in one statement. The bucket is
+# formatted in from a validated (length, unit) pair because TIME_SLICE only
+# accepts constants; everything else is bound.
+SECTOR_SENTIMENT_QUERY = """
+SELECT
+    sector,
+    TIME_SLICE(publish_date, {slice_length}, '{date_part}') AS bucket_start,
+    COUNT(*) AS articles,
+    AVG(sentiment) AS mean_sentiment,
+    MIN(sentiment) AS min_sentiment,
+    MAX(sentiment) AS max_sentiment
+FROM (
+    SELECT
+        sector,
+        publish_date,
+        SNOWFLAKE.CORTEX.SENTIMENT(CONCAT(COALESCE(headline, ''), '\\n\\n', COALESCE(content, ''))) AS sentiment
+    FROM market_news
+    WHERE publish_date >= COALESCE(
+            TRY_TO_TIMESTAMP(%(since)s),
+            DATEADD(hour, -%(hours)s, COALESCE(TRY_TO_TIMESTAMP(%(until)s), CURRENT_TIMESTAMP())))
+      AND publish_date < COALESCE(TRY_TO_TIMESTAMP(%(until)s), CURRENT_TIMESTAMP())
+      AND (%(sectors)s IS NULL OR ARRAY_CONTAINS(sector::VARIANT, PARSE_JSON(%(sectors)s)))
+)
+GROUP BY sector, bucket_start
+ORDER BY sector, bucket_start
+"""
+
+# Bucket suffixes accepted by /api/market/sentiment/sectors, e.g. 15m, 1h, 1d
+SENTIMENT_BUCKET_UNITS = {'m': 'MINUTE', 'h': 'HOUR', 'd': 'DAY', 'w': 'WEEK'}
+
+# Splits a finished answer into sentences for chunked streaming
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Longest a client may long-poll /api/jobs/<id>
+ASYNC_JOB_MAX_WAIT = float(os.getenv('ASYNC_JOB_MAX_WAIT', '30'))
+
+# Largest number of transactions accepted by /api/fraud/analyze/batch
+FRAUD_BATCH_MAX_SIZE = int(os.getenv('FRAUD_BATCH_MAX_SIZE', '1000'))
+
+# Largest number of customers assessed by one /api/risk/portfolio call
+RISK_PORTFOLIO_MAX_SIZE = int(os.getenv('RISK_PORTFOLIO_MAX_SIZE', '1000'))
+
+# Default per-request deadlines in seconds; clients may send X-Request-Timeout instead (0 disables)
+REQUEST_TIMEOUTS = {
+    'fraud': float(os.getenv('REQUEST_TIMEOUT_FRAUD', '10')),
+    'fraud_batch': float(os.getenv('REQUEST_TIMEOUT_FRAUD_BATCH', '120')),
+    'sentiment': float(os.getenv('REQUEST_TIMEOUT_SENTIMENT', '30')),
+    'risk': float(os.getenv('REQUEST_TIMEOUT_RISK', '30')),
+    'risk_portfolio': float(os.getenv('REQUEST_TIMEOUT_RISK_PORTFOLIO', '300')),
+    'chat': float(os.getenv('REQUEST_TIMEOUT_CHAT', '60')),
+    'sector_sentiment': float(os.getenv('REQUEST_TIMEOUT_SECTOR_SENTIMENT', '60')),
+}
+REQUEST_TIMEOUT_MAX = float(os.getenv('REQUEST_TIMEOUT_MAX', '300'))
+
+# |sentiment| at or above which a stored news score is rated High / Medium impact
+NEWS_IMPACT_HIGH = float(os.getenv('NEWS_IMPACT_HIGH', '0.7'))
+NEWS_IMPACT_MEDIUM = float(os.getenv('NEWS_IMPACT_MEDIUM', '0.3'))
+
+# Longest look-back window for /api/market/sentiment/sectors, in hours
+SECTOR_SENTIMENT_MAX_HOURS = int(os.getenv('SECTOR_SENTIMENT_MAX_HOURS', '720'))
+
+# Largest page served by /api/market/news/sentiment
+NEWS_SENTIMENT_MAX_LIMIT = int(os.getenv('NEWS_SENTIMENT_MAX_LIMIT', '1000'))
+
+# Bounds for polling a deadline-governed query's status, in seconds
+DEADLINE_POLL_MIN = 0.02
+DEADLINE_POLL_MAX = float(os.getenv('DEADLINE_POLL_MAX', '0.25'))
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for iOS app
+CORS(app, expose_headers=['X-Trace-ID'])  # Enable CORS for iOS app
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Metrics exposed at /api/metrics
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    'finai_request_duration_seconds', 'Total API request latency', ['endpoint', 'method', 'status'])
+ENSURE_CONNECTION_SECONDS = metrics.histogram(
+    'finai_ensure_connection_seconds', 'Time spent in ensure_connection')
+CHECKOUT_SECONDS = metrics.histogram(
+    'finai_pool_checkout_wait_seconds', 'Time waiting for a pooled Snowflake connection', ['endpoint'])
+EXECUTE_SECONDS = metrics.histogram(
+    'finai_snowflake_execute_seconds', 'Snowflake cursor.execute time', ['endpoint', 'model'])
+FETCH_SECONDS = metrics.histogram(
+    'finai_snowflake_fetch_seconds', 'Snowflake result fetch time', ['endpoint', 'model'])
+QUERY_ERRORS = metrics.counter(
+    'finai_snowflake_query_errors_total', 'Snowflake queries that raised', ['endpoint', 'model'])
+PARSE_SECONDS = metrics.histogram(
+    'finai_json_parse_seconds', 'Time spent parsing LLM JSON responses', ['endpoint'])
+PARSE_FALLBACKS = metrics.counter(
+    'finai_json_parse_fallback_total', 'LLM responses that were not valid JSON', ['endpoint'])
+CONNECT_SECONDS = metrics.histogram(
+    'finai_snowflake_connect_seconds', 'Snowflake login time for new pooled connections', ['auth_method'])
+KEY_LOADS = metrics.counter(
+    'finai_private_key_loads_total', 'Private key lookups served from the cache vs. parsed from disk', ['outcome'])
+QUERIES_CANCELLED = metrics.counter(
+    'finai_queries_cancelled_total', 'Snowflake statements aborted by query ID', ['endpoint', 'reason'])
+PROMPT_CHARS = metrics.histogram(
+    'finai_query_prompt_chars', 'Characters of text bound to each Snowflake statement', ['endpoint'],
+    buckets=(100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000))
+WORKLOAD_QUERY_SECONDS = metrics.histogram(
+    'finai_workload_query_seconds', 'Snowflake statement time (checkout + execute + fetch) by workload', ['workload'])
+WORKLOAD_CHECKOUT_SECONDS = metrics.histogram(
+    'finai_workload_checkout_seconds', 'Time statements waited for a connection from their workload pool',
+    ['workload'])
+MODEL_FALLBACKS = metrics.counter(
+    'finai_model_fallbacks_total', 'COMPLETE calls retried on a smaller model after exceeding the latency budget',
+    ['endpoint', 'model', 'fallback_model'])
+
+SCHEDULER_WAIT_SECONDS = metrics.histogram(
+    'finai_scheduler_wait_seconds', 'Time requests queued for a scheduler slot', ['class'])
+
+# Admit only as many requests as the Snowflake pool can serve, highest priority class first;
+# queue a few per class, shed the rest with 429
+ADMISSION_MAX_ACTIVE = int(os.getenv('ADMISSION_MAX_ACTIVE', os.getenv('SNOWFLAKE_POOL_MAX_SIZE', '8')))
+scheduler = Scheduler(
+    ADMISSION_MAX_ACTIVE,
+    [
+        PriorityClass(
+            name,
+            priority,
+            max_active=int(os.getenv(f'SCHEDULER_MAX_ACTIVE_{name.upper()}',
+                                     str(max(1, math.ceil(share * ADMISSION_MAX_ACTIVE))))),
+            max_queue=int(os.getenv(f'SCHEDULER_MAX_QUEUE_{name.upper()}', str(queue * ADMISSION_MAX_ACTIVE))),
+            queue_timeout=float(os.getenv(f'SCHEDULER_QUEUE_TIMEOUT_{name.upper()}', str(timeout))),
+            rate=float(os.getenv(f'SCHEDULER_RATE_{name.upper()}', str(rate))),
+            burst=float(os.getenv(f'SCHEDULER_BURST_{name.upper()}', str(burst))),
+        )
+        for name, (priority, share, queue, timeout, rate, burst) in DEFAULT_CLASSES.items()
+    ],
+    default_class='normal',
+    max_clients=int(os.getenv('SCHEDULER_MAX_CLIENTS', '10000')),
+    on_wait=lambda class_name, seconds: SCHEDULER_WAIT_SECONDS.observe(seconds, class_name),
+)
+
+
+# Routes can be moved between workloads with WORKLOAD_ROUTES="/api/risk/assess=bulk,/api/market=chat"
+WORKLOAD_ROUTES = tuple(
+    tuple(part.strip() for part in item.split('=', 1))
+    for item in os.getenv('WORKLOAD_ROUTES', '').split(',') if '=' in item
+) + DEFAULT_WORKLOAD_ROUTES
+
+
+def scheduling_class(path):
+    for prefix, class_name in DEFAULT_ROUTES:
+        if path.startswith(prefix):
+            return class_name
+    return 'normal'
+
+
+def scheduling_client(environ):
+    """Rate limits are charged to the X-API-Key header; requests without one are only scheduled."""
+    return environ.get('HTTP_X_API_KEY')
+
+
+# Never shed and never hold a scheduler slot: probes, plus in-memory reads such as job polls, whose ?wait= long-poll
+# would otherwise sit on a Snowflake-bound slot for up to ASYNC_JOB_MAX_WAIT seconds
+ADMISSION_EXEMPT = ('/api/health', '/api/metrics', '/api/debug', '/api/jobs', '/api/chat/sessions')
+
+admission = AdmissionController(
+    app.wsgi_app,
+    scheduler=scheduler,
+    classify=scheduling_class,
+    client_id=scheduling_client,
+    exempt=ADMISSION_EXEMPT,
+    reject_headers=[('Access-Control-Allow-Origin', '*'), ('Access-Control-Expose-Headers', 'Retry-After')],
+)
+app.wsgi_app = admission
+
+# Opt-in capture of sampled requests for replay.py; outside admission so queueing and 429s are recorded too
+traffic_capture = None
+if os.getenv('TRAFFIC_CAPTURE_PATH'):
+    traffic_capture = TrafficCapture(
+        app.wsgi_app,
+        os.getenv('TRAFFIC_CAPTURE_PATH'),
+        sample_rate=float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '1.0')),
+        max_body=int(os.getenv('TRAFFIC_CAPTURE_MAX_BODY', '65536')),
+        masker=PiiMasker(
+            DEFAULT_MASK_FIELDS | {field.strip() for field in os.getenv('TRAFFIC_CAPTURE_MASK_FIELDS', '').split(',')
+                                   if field.strip()},
+            salt=os.getenv('TRAFFIC_CAPTURE_SALT'),
+        ),
+        exempt=('/api/health', '/api/metrics', '/api/debug'),
+    )
+    app.wsgi_app = traffic_capture
+
+# Seconds spent in each phase of initialize_snowflake, reported by /api/health
+STARTUP_SECONDS = {}
+
 class SnowflakeCortexAI:
     """Handles Snowflake Cortex AI operations for financial services."""
     
-    def __init__(self):
-        self.connection = None
-        self.cursor = None
+    def __init__(self, connector=None):
+        # Any module with the snowflake.connector interface; tests and benchmarks pass a stand-in
+        self._connector = connector
+        self._private_keys = {}  # path -> (mtime_ns, size, passphrase, DER bytes)
+        self._private_keys_lock = threading.Lock()
+        # Interactive, chat and bulk traffic each get their own warehouse (if configured) and connection pool
+        self.workloads = {}
+        for name, (min_size, max_size) in DEFAULT_WORKLOADS.items():
+            if name == DEFAULT_WORKLOAD:
+                min_size = int(os.getenv('SNOWFLAKE_POOL_MIN_SIZE', str(min_size)))
+                max_size = int(os.getenv('SNOWFLAKE_POOL_MAX_SIZE', str(max_size)))
+            warehouse = os.getenv(f'SNOWFLAKE_WAREHOUSE_{name.upper()}', os.getenv('SNOWFLAKE_WAREHOUSE', 'COMPUTE_WH'))
+            self.workloads[name] = Workload(name, warehouse, SnowflakeConnectionPool(
+                functools.partial(self._open_connection, warehouse),
+                min_size=int(os.getenv(f'SNOWFLAKE_POOL_MIN_SIZE_{name.upper()}', str(min_size))),
+                max_size=int(os.getenv(f'SNOWFLAKE_POOL_MAX_SIZE_{name.upper()}', str(max_size))),
+                idle_timeout=float(os.getenv('SNOWFLAKE_POOL_IDLE_TIMEOUT', '300')),
+                checkout_timeout=float(os.getenv('SNOWFLAKE_POOL_CHECKOUT_TIMEOUT', '30')),
+                liveness_ttl=float(os.getenv('SNOWFLAKE_LIVENESS_TTL', '60')),
+                probe=self._probe_connection,
+            ))
+        self.keepalive_interval = float(os.getenv('SNOWFLAKE_KEEPALIVE_INTERVAL', '30'))
+        self.login_timeout = int(os.getenv('SNOWFLAKE_LOGIN_TIMEOUT', '30'))
+        # A headless server must never wait on a browser login; only the dev server enables this
+        self.interactive_auth = os.getenv('SNOWFLAKE_INTERACTIVE_AUTH', 'false').lower() == 'true'
+        self.breaker = CircuitBreaker(
+            'Snowflake',
+            failure_threshold=int(os.getenv('SNOWFLAKE_BREAKER_FAILURES', '5')),
+            backoff=float(os.getenv('SNOWFLAKE_BREAKER_BACKOFF', '1')),
+            max_backoff=float(os.getenv('SNOWFLAKE_BREAKER_MAX_BACKOFF', '60')),
+            probe_timeout=float(os.getenv('SNOWFLAKE_LOGIN_TIMEOUT', '30')) * 2,
+        )
+        self.fraud_batch_chunk_size = max(1, int(os.getenv('FRAUD_BATCH_CHUNK_SIZE', '50')))
+        self.fraud_batch_max_parallel = max(1, int(os.getenv('FRAUD_BATCH_MAX_PARALLEL', '4')))
+        self.risk_batch_chunk_size = max(1, int(os.getenv('RISK_BATCH_CHUNK_SIZE', '25')))
+        self.risk_batch_max_parallel = max(1, int(os.getenv('RISK_BATCH_MAX_PARALLEL', '4')))
+        self.cache = ResponseCache(
+            max_entries=int(os.getenv('CACHE_MAX_ENTRIES', '1024')),
+            ttls={
+                'fraud': float(os.getenv('CACHE_TTL_FRAUD', '300')),
+                'sentiment': float(os.getenv('CACHE_TTL_SENTIMENT', '900')),
+                'risk': float(os.getenv('CACHE_TTL_RISK', '900')),
+                'chat': float(os.getenv('CACHE_TTL_CHAT', '3600')),
+                'sector_sentiment': float(os.getenv('CACHE_TTL_SECTOR_SENTIMENT', '60')),
+                'customer_profile': float(os.getenv('CACHE_TTL_CUSTOMER_PROFILE', '300')),
+            },
+        )
+        self.single_flight = SingleFlight()
+        self.slow_queries = SlowQueryLog(
+            threshold=float(os.getenv('SLOW_QUERY_THRESHOLD', '1.0')),
+            max_entries=int(os.getenv('SLOW_QUERY_LOG_SIZE', '500')),
+        )
+        self.router = ModelRouter(
+            tiers={
+                'fast': os.getenv('CORTEX_MODEL_FAST', 'mistral-7b'),
+                'accurate': os.getenv('CORTEX_MODEL_ACCURATE', 'llama2-70b-chat'),
+            },
+            fallbacks={
+                'fast': os.getenv('CORTEX_MODEL_FAST_FALLBACK', 'llama3.2-1b'),
+                'accurate': os.getenv('CORTEX_MODEL_ACCURATE_FALLBACK', os.getenv('CORTEX_MODEL_FAST', 'mistral-7b')),
+            },
+            policies={
+                endpoint: (
+                    os.getenv(f'CORTEX_TIER_{endpoint.upper()}', tier),
+                    int(os.getenv(f'CORTEX_MAX_TOKENS_{endpoint.upper()}', str(max_tokens))),
+                    float(os.getenv(f'CORTEX_TEMPERATURE_{endpoint.upper()}', str(temperature))),
+                    float(os.getenv(f'CORTEX_LATENCY_BUDGET_{endpoint.upper()}', str(budget))),
+                )
+                for endpoint, (tier, max_tokens, temperature, budget) in DEFAULT_POLICIES.items()
+            },
+        )
+        self.jobs = AsyncJobStore(
+            max_jobs=int(os.getenv('ASYNC_JOB_MAX', '10000')),
+            ttl=float(os.getenv('ASYNC_JOB_TTL', '3600')),
+        )
+        self.news_scoring_interval = float(os.getenv('NEWS_SCORING_INTERVAL', '0'))
+        self.news_scoring_lookback_hours = int(os.getenv('NEWS_SCORING_LOOKBACK_HOURS', '168'))
+        self._news_scoring_lock = threading.Lock()
+        self._news_scoring_thread = None
+        self.sessions = ChatSessionStore(
+            summarizer=self._summarize_chat,
+            max_sessions=int(os.getenv('CHAT_SESSION_MAX', '10000')),
+            ttl=float(os.getenv('CHAT_SESSION_TTL', '3600')),
+            token_budget=int(os.getenv('CHAT_SESSION_TOKEN_BUDGET', '2000')),
+            keep_turns=int(os.getenv('CHAT_SESSION_KEEP_TURNS', '4')),
+        )
+        # Reworded chat questions reuse an earlier answer; EMBED_TEXT costs far less than COMPLETE
+        self.semantic_embedder = os.getenv('SEMANTIC_CACHE_EMBEDDER', 'cortex').lower()
+        self.semantic_embed_model = os.getenv('SEMANTIC_CACHE_EMBED_MODEL', 'snowflake-arctic-embed-m-v1.5')
+        self.semantic_cache = SemanticCache(
+            dim=768 if self.semantic_embedder == 'cortex' else LOCAL_EMBEDDING_DIM,
+            threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.9')),
+            max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2048')),
+            ttl=float(os.getenv('SEMANTIC_CACHE_TTL', os.getenv('CACHE_TTL_CHAT', '3600'))),
+        )
+        self.chat_streaming = os.getenv('CORTEX_CHAT_STREAMING', 'rest').lower()
+        # After the REST stream fails before its first token, use sentence chunks for this long before retrying
+        self.chat_rest_retry = float(os.getenv('CORTEX_CHAT_REST_RETRY', '300'))
+        self._chat_rest_retry_at = 0.0
+        self.chat_stream_timeout = float(os.getenv('CORTEX_CHAT_STREAM_TIMEOUT', '120'))
+        self.prescreen = None
+        if os.getenv('FRAUD_PRESCREEN_ENABLED', 'true').lower() == 'true':
+            self.prescreen = FraudPrescreen(
+                small_amount=float(os.getenv('FRAUD_PRESCREEN_SMALL_AMOUNT', '100')),
+                high_amount=float(os.getenv('FRAUD_PRESCREEN_HIGH_AMOUNT', '5000')),
+                max_velocity=int(os.getenv('FRAUD_PRESCREEN_MAX_VELOCITY', '5')),
+                min_history=int(os.getenv('FRAUD_PRESCREEN_MIN_HISTORY', '3')),
+                max_events=int(os.getenv('FRAUD_PRESCREEN_WINDOW_SIZE', '50')),
+            )
+    
+    @property
+    def workload(self):
+        """The workload the current request or background job was routed to."""
+        return self.workloads.get(current_workload()) or self.workloads[DEFAULT_WORKLOAD]
+    
+    @property
+    def pool(self):
+        """Connection pool of the current workload."""
+        return self.workload.pool
+    
+    @pool.setter
+    def pool(self, pool):
+        self.workload.pool = pool
+    
+    def workload_stats(self):
+        return {name: workload.stats() for name, workload in self.workloads.items()}
+    
+    @property
+    def connector(self):
+        """The snowflake.connector module, imported the first time it is needed."""
+        if self._connector is None:
+            started = time.perf_counter()
+            try:
+                import snowflake.connector
+            except ImportError as e:
+                raise ImportError("Install snowflake-connector-python: pip install snowflake-connector-python") from e
+            self._connector = snowflake.connector
+            logger.info(f"Imported snowflake.connector in {time.perf_counter() - started:.2f}s")
+        return self._connector
+    
+    @connector.setter
+    def connector(self, connector):
+        self._connector = connector
     
     def _load_private_key(self, private_key_path, passphrase=None):
+        """Return the DER private key, re-parsing the PEM only when the file changes.
+        
+        Decrypting and converting the key costs far more than the login
+        round trip it feeds, so reconnects and pool growth reuse the bytes
+        until the file's mtime or size changes (e.g. after key rotation).
+        """
+        try:
+            stat = os.stat(private_key_path)
+        except FileNotFoundError:
+            logger.error(f"Private key file not found: {private_key_path}")
+            return None
+        
+        with self._private_keys_lock:
+            cached = self._private_keys.get(private_key_path)
+            if cached and cached[:3] == (stat.st_mtime_ns, stat.st_size, passphrase):
+                KEY_LOADS.inc('cached')
+                return cached[3]
+            
+            private_key_der = self._read_private_key(private_key_path, passphrase)
+            if private_key_der:
+                KEY_LOADS.inc('loaded')
+                self._private_keys[private_key_path] = (stat.st_mtime_ns, stat.st_size, passphrase, private_key_der)
+            return private_key_der
+    
+    def _read_private_key(self, private_key_path, passphrase=None):
         """Load and return private key from file."""
         try:
-            if not serialization:
-                logger.error("Cryptography package not available for key-pair authentication")
-                return None
-                
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.backends import default_backend
+        except ImportError:
+            logger.error("Cryptography package not available for key-pair authentication: pip install cryptography")
+            return None
+        
+        try:
             with open(private_key_path, 'rb') as key_file:
                 private_key = serialization.load_pem_private_key(
                     key_file.read(),
@@ -89,59 +667,310 @@ class SnowflakeCortexAI:
         # Default to external browser authentication
         return 'externalbrowser'
     
-    def connect(self):
-        """Connect to Snowflake using the best available authentication method."""
-        try:
-            # Base connection parameters
-            connection_params = {
-                'account': os.getenv('SNOWFLAKE_ACCOUNT'),
-                'user': os.getenv('SNOWFLAKE_USER'),
-                'warehouse': os.getenv('SNOWFLAKE_WAREHOUSE', 'COMPUTE_WH'),
-                'database': os.getenv('SNOWFLAKE_DATABASE', 'FINAI_DB'),
-                'schema': os.getenv('SNOWFLAKE_SCHEMA', 'CORTEX_AI'),
-            }
-            
-            if not connection_params['account'] or not connection_params['user']:
-                logger.error("Missing SNOWFLAKE_ACCOUNT or SNOWFLAKE_USER environment variables")
-                return False
-            
-            # Determine and configure authentication method
-            auth_method = self._get_auth_method()
+    def _connection_params(self):
+        """Build connector arguments using the best available authentication method."""
+        # Base connection parameters
+        connection_params = {
+            'account': os.getenv('SNOWFLAKE_ACCOUNT'),
+            'user': os.getenv('SNOWFLAKE_USER'),
+            'warehouse': os.getenv('SNOWFLAKE_WAREHOUSE', 'COMPUTE_WH'),
+            'database': os.getenv('SNOWFLAKE_DATABASE', 'FINAI_DB'),
+            'schema': os.getenv('SNOWFLAKE_SCHEMA', 'CORTEX_AI'),
+            'login_timeout': self.login_timeout,
+        }
+        
+        if not connection_params['account'] or not connection_params['user']:
+            raise ValueError("Missing SNOWFLAKE_ACCOUNT or SNOWFLAKE_USER environment variables")
+        
+        # Determine and configure authentication method
+        auth_method = self._get_auth_method()
+        
+        if auth_method == 'keypair':
+            logger.info("Using key-pair authentication")
+            private_key_path = os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH')
+            private_key_passphrase = os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
             
-            if auth_method == 'keypair':
-                logger.info("Using key-pair authentication")
-                private_key_path = os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH')
-                private_key_passphrase = os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
-                
-                private_key_der = self._load_private_key(private_key_path, private_key_passphrase)
-                if not private_key_der:
-                    logger.error("Failed to load private key, falling back to external browser")
-                    connection_params['authenticator'] = 'externalbrowser'
-                else:
-                    connection_params['private_key'] = private_key_der
-                    
-            elif auth_method == 'password':
-                logger.info("Using password authentication")
-                connection_params['password'] = os.getenv('SNOWFLAKE_PASSWORD')
-                
-            else:
-                logger.info("Using external browser authentication")
+            private_key_der = self._load_private_key(private_key_path, private_key_passphrase)
+            if not private_key_der and not self.interactive_auth:
+                raise ValueError(f"Failed to load private key from {private_key_path}")
+            if not private_key_der:
+                logger.error("Failed to load private key, falling back to external browser")
                 connection_params['authenticator'] = 'externalbrowser'
+            else:
+                connection_params['private_key'] = private_key_der
+                
+        elif auth_method == 'password':
+            logger.info("Using password authentication")
+            connection_params['password'] = os.getenv('SNOWFLAKE_PASSWORD')
             
-            self.connection = snowflake.connector.connect(**connection_params)
-            self.cursor = self.connection.cursor(DictCursor)
-            logger.info(f"Connected to Snowflake successfully using {auth_method} authentication")
+        elif not self.interactive_auth:
+            raise ValueError("No Snowflake credentials: set SNOWFLAKE_PRIVATE_KEY_PATH or SNOWFLAKE_PASSWORD "
+                             "(external browser login is only available to the development server)")
+        else:
+            logger.info("Using external browser authentication")
+            connection_params['authenticator'] = 'externalbrowser'
+        
+        return connection_params, auth_method
+    
+    def _open_connection(self, warehouse=None):
+        """Open a new Snowflake connection. Used by the workload pools as their factory.
+        
+        The session uses ``warehouse`` instead of SNOWFLAKE_WAREHOUSE if given.
+        Logins go through the circuit breaker: while it is open this raises
+        CircuitOpenError at once instead of waiting out the login timeout.
+        """
+        self.breaker.allow()
+        try:
+            connection_params, auth_method = self._connection_params()
+            if warehouse:
+                connection_params['warehouse'] = warehouse
+            started = time.perf_counter()
+            connection = self.connector.connect(**connection_params)
+        except Exception as e:
+            self.breaker.failure(e)
+            raise
+        self.breaker.success()
+        CONNECT_SECONDS.observe(time.perf_counter() - started, auth_method)
+        logger.info(f"Connected to Snowflake successfully using {auth_method} authentication "
+                    f"(warehouse {connection_params['warehouse']})")
+        return connection
+    
+    def _probe_connection(self, connection):
+        """Cheap liveness check used by the background keepalive."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+    
+    def connect(self):
+        """Open the minimum number of pooled Snowflake connections."""
+        try:
+            self.pool.fill()
+            self.pool.start_keepalive(self.keepalive_interval)
             return True
-            
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Failed to connect to Snowflake: {e}")
             return False
     
-    def analyze_fraud(self, transaction_data):
-        """Use Cortex AI to analyze transaction for fraud indicators."""
+    def _is_connection_error(self, error, connection):
+        """Return True if a query failed because the session itself is unusable."""
+        if connection.is_closed():
+            return True
+        if isinstance(error, (self.connector.errors.OperationalError,
+                              self.connector.errors.InterfaceError)):
+            return True
+        return getattr(error, 'errno', None) in SESSION_ERROR_CODES
+    
+    def _is_timeout(self, error):
+        """Return True if Snowflake cancelled a statement for exceeding its timeout."""
+        return getattr(error, 'errno', None) in QUERY_TIMEOUT_CODES
+    
+    def _cancel_query(self, cursor, query_id, endpoint, reason):
+        """Abort a running statement by its query ID so it stops using the warehouse."""
         try:
-            # Prepare transaction context for AI analysis
-            transaction_context = f"""
+            cursor.abort_query(query_id)
+            QUERIES_CANCELLED.inc(endpoint, reason)
+            logger.info(f"Cancelled {endpoint} query {query_id} ({reason})")
+        except Exception as e:
+            logger.warning(f"Could not cancel query {query_id}: {e}")
+    
+    def _execute_with_deadline(self, connection, cursor, query, params, timeout, deadline, endpoint,
+                               statement_params=None):
+        """Run ``query`` so it can be abandoned, leaving its results on ``cursor``.
+        
+        A blocking ``execute`` hides the query ID until it finishes, so the
+        statement is submitted with ``execute_async`` and its status polled.
+        If the deadline passes or the client disconnects, the query is
+        aborted and DeadlineExceeded raised; if ``timeout`` elapses first it
+        is aborted and raised like the connector's own statement timeout.
+        """
+        deadline.check()
+        limit = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+        # Server-side backstop in case this process dies before it can cancel
+        cursor.execute_async(query, params, _statement_params={
+            **(statement_params or {}), 'STATEMENT_TIMEOUT_IN_SECONDS': str(max(math.ceil(limit), 1))})
+        query_id = cursor.sfqid
+        started = time.monotonic()
+        delay = DEADLINE_POLL_MIN
+        
+        while True:
+            status = connection.get_query_status_throw_if_error(query_id)
+            if not connection.is_still_running(status):
+                cursor.get_results_from_sfqid(query_id)
+                return
+            
+            reason = deadline.reason()
+            elapsed = time.monotonic() - started
+            if reason is not None:
+                self._cancel_query(cursor, query_id, endpoint, reason)
+                raise DeadlineExceeded(deadline.message(reason), reason)
+            if timeout is not None and elapsed >= timeout:
+                self._cancel_query(cursor, query_id, endpoint, 'timeout')
+                raise self.connector.errors.ProgrammingError(
+                    msg=f"Statement exceeded its {timeout:g}s timeout", errno=604)
+            
+            time.sleep(min(delay, max(limit - elapsed, 0.001)))
+            delay = min(delay * 1.5, DEADLINE_POLL_MAX)
+    
+    def _record_outcome(self, error=None):
+        """Feed a query's outcome to the circuit breaker.
+        
+        Dead sessions and network errors count as failures; any other answer
+        from Snowflake (even a SQL error) proves it is reachable. Statement
+        timeouts are ones the app imposed itself (latency budgets, request
+        deadlines), so like errors that say nothing about Snowflake they only
+        release a half-open probe; a slow model must not cut off every
+        endpoint, and the caller's fallback retry must still be allowed.
+        """
+        errors = self.connector.errors
+        if error is None:
+            self.breaker.success()
+        elif not isinstance(error, errors.Error) or self._is_timeout(error):
+            self.breaker.abandon()
+        elif isinstance(error, (errors.OperationalError, errors.InterfaceError)) \
+                or getattr(error, 'errno', None) in SESSION_ERROR_CODES:
+            self.breaker.failure(error)
+        else:
+            self.breaker.success()
+    
+    def _statement_params(self, endpoint, model):
+        """Tag a statement with the current request's trace ID so it can be found in QUERY_HISTORY."""
+        return {'QUERY_TAG': query_tag(endpoint, model, current_trace_id())}
+    
+    def _record_query(self, query_id, endpoint, model, query, params, checkout, execute, fetch, error=None):
+        """Record one statement's prompt size and timings under its workload; slow ones go to the slow-query log."""
+        size = prompt_chars(params)
+        PROMPT_CHARS.observe(size, endpoint)
+        workload = self.workload
+        workload.record(checkout, checkout + execute + fetch, error is not None)
+        WORKLOAD_CHECKOUT_SECONDS.observe(checkout, workload.name)
+        WORKLOAD_QUERY_SECONDS.observe(checkout + execute + fetch, workload.name)
+        entry = self.slow_queries.record(endpoint, model, query, query_id, size, checkout, execute, fetch,
+                                         error=type(error).__name__ if error else None,
+                                         trace_id=current_trace_id())
+        if entry:
+            logger.warning(f"Slow {endpoint} query {query_id}: {entry['total_ms']:.0f} ms "
+                           f"(trace {entry['trace_id']}, {size} prompt chars)")
+    
+    def _run_query(self, query, params, fetch, endpoint='other', model='none', timeout=None, deadline=None):
+        """Run a query on a pooled connection and return ``fetch(cursor)``.
+        
+        If the query fails because the connection is dead, the connection is
+        discarded and the query is retried once on a fresh one. Checkout,
+        execute and fetch times are recorded under ``endpoint`` and ``model``
+        and, with the query ID, in the slow-query log. The statement carries
+        the request's trace ID as its QUERY_TAG. Snowflake cancels it after
+        ``timeout`` seconds, if given, or once ``deadline`` passes or its
+        client disconnects.
+        """
+        for attempt in range(2):
+            if deadline is not None:
+                deadline.check()
+            self.breaker.allow()
+            started = time.perf_counter()
+            try:
+                pooled = self.pool.acquire(None if deadline is None else min(self.pool.checkout_timeout,
+                                                                              deadline.remaining()))
+            except Exception:
+                # A failed login has already been counted by _open_connection
+                self.breaker.abandon()
+                raise
+            checkout = time.perf_counter() - started
+            CHECKOUT_SECONDS.observe(checkout, endpoint)
+            cursor = None
+            error = None
+            started = executed = fetched = None
+            try:
+                cursor = pooled.connection.cursor(self.connector.DictCursor)
+                statement_params = self._statement_params(endpoint, model)
+                started = time.perf_counter()
+                if deadline is None:
+                    cursor.execute(query, params, timeout=timeout, _statement_params=statement_params)
+                else:
+                    self._execute_with_deadline(pooled.connection, cursor, query, params, timeout, deadline,
+                                                endpoint, statement_params)
+                executed = time.perf_counter()
+                EXECUTE_SECONDS.observe(executed - started, endpoint, model)
+                result = fetch(cursor)
+                fetched = time.perf_counter()
+                FETCH_SECONDS.observe(fetched - executed, endpoint, model)
+            except Exception as e:
+                error = e
+                QUERY_ERRORS.inc(endpoint, model)
+                self._record_outcome(e)
+                if attempt == 0 and self._is_connection_error(e, pooled.connection):
+                    logger.warning(f"Snowflake connection failed during query: {e}, reconnecting and retrying...")
+                    self.pool.release(pooled, discard=True)
+                    continue
+                self.pool.release(pooled, discard=pooled.is_closed())
+                raise
+            finally:
+                if cursor is not None:
+                    now = time.perf_counter()
+                    self._record_query(getattr(cursor, 'sfqid', None), endpoint, model, query, params, checkout,
+                                       (executed or now) - started if started else 0.0,
+                                       (fetched or now) - executed if executed else 0.0, error)
+                    cursor.close()
+            
+            self._record_outcome()
+            self.pool.release(pooled)
+            return result
+    
+    def _fetch_one(self, query, params=None, endpoint='other', model='none', timeout=None, deadline=None):
+        """Run a query on a pooled connection and return the first row as a dict."""
+        return self._run_query(query, params, lambda cursor: cursor.fetchone(), endpoint, model, timeout, deadline)
+    
+    def _fetch_one_coalesced(self, key, query, params=None, timeout=None, deadline=None):
+        """Like ``_fetch_one``, but concurrent callers with the same key share one query.
+        
+        ``key`` is a response-cache key, so it also supplies the endpoint and
+        model labels. The returned row may be shared between threads and must
+        not be mutated. The query runs under the first caller's deadline; a
+        follower with time left runs it again itself if that caller gives up.
+        """
+        endpoint, model = key[0], key[1]
+        try:
+            return self.single_flight.do(key, self._fetch_one, query, params, endpoint, model, timeout, deadline)
+        except DeadlineExceeded:
+            if deadline is None or deadline.expired():
+                raise
+            return self._fetch_one(query, params, endpoint, model, timeout, deadline)
+    
+    def _fetch_one_routed(self, route, cache_key, query, params_for, deadline=None):
+        """Run a COMPLETE query for ``route`` and return ``(row, model used)``.
+        
+        ``params_for(model)`` builds the query parameters. The primary model
+        runs with the route's latency budget as its statement timeout; if
+        Snowflake cancels it for running over, the query is retried once on
+        the smaller fallback model without a budget.
+        """
+        try:
+            row = self._fetch_one_coalesced(cache_key, query, params_for(route.model),
+                                            timeout=route.latency_budget, deadline=deadline)
+            return row, route.model
+        except Exception as e:
+            if not route.fallback_model or not self._is_timeout(e):
+                raise
+        
+        logger.warning(f"{route.model} exceeded the {route.latency_budget}s {route.endpoint} budget, "
+                       f"retrying on {route.fallback_model}")
+        self.router.record_fallback(route)
+        MODEL_FALLBACKS.inc(route.endpoint, route.model, route.fallback_model)
+        row = self._fetch_one(query, params_for(route.fallback_model), route.endpoint, route.fallback_model,
+                              deadline=deadline)
+        return row, route.fallback_model
+    
+    def _fetch_all(self, query, params=None, endpoint='other', model='none', deadline=None):
+        """Run a query on a pooled connection and return every row as a dict."""
+        return self._run_query(query, params, lambda cursor: cursor.fetchall(), endpoint, model, deadline=deadline)
+    
+    @staticmethod
+    def _build_transaction_context(transaction_data):
+        """Format a transaction for the fraud prompt."""
+        return f"""
             Transaction Details:
             Amount: ${transaction_data.get('amount', 0)}
             Merchant: {transaction_data.get('merchant', 'Unknown')}
@@ -150,88 +979,495 @@ class SnowflakeCortexAI:
             Card Type: {transaction_data.get('card_type', 'Unknown')}
             Customer ID: {transaction_data.get('customer_id', 'Unknown')}
             """
+    
+    @staticmethod
+    def _parse_fraud_analysis(raw_analysis):
+        """Parse the LLM fraud response, falling back to a medium-risk verdict."""
+        started = time.perf_counter()
+        try:
+            analysis = json.loads(raw_analysis)
+            if isinstance(analysis, dict):
+                return analysis
+        except json.JSONDecodeError:
+            pass
+        finally:
+            PARSE_SECONDS.observe(time.perf_counter() - started, 'fraud')
+        
+        # Fallback if not a valid JSON object
+        PARSE_FALLBACKS.inc('fraud')
+        return {
+            'risk_score': 50,
+            'risk_level': 'Medium',
+            'explanation': raw_analysis
+        }
+    
+    def warm_prescreen(self, per_customer=None):
+        """Load each customer's most recent transactions into the pre-screen window."""
+        if not self.prescreen:
+            return 0
+        
+        per_customer = per_customer or self.prescreen.max_events
+        query = """
+        SELECT customer_id, amount, location, transaction_time
+        FROM transactions
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY transaction_time DESC) <= %s
+        ORDER BY transaction_time
+        """
+        
+        rows = self._fetch_all(query, (per_customer,), endpoint='prescreen_warm')
+        for row in rows:
+            self.prescreen.observe(row['CUSTOMER_ID'], row['AMOUNT'], row['LOCATION'], row['TRANSACTION_TIME'])
+        
+        logger.info(f"Warmed fraud pre-screen with {len(rows)} transactions")
+        return len(rows)
+    
+    def analyze_fraud(self, transaction_data, use_cache=True, tier=None, deadline=None):
+        """Use Cortex AI to analyze transaction for fraud indicators.
+        
+        Transactions the local pre-screen clears as low risk are answered
+        without calling Cortex; everything else escalates to the LLM.
+        Either way the transaction joins the customer's pre-screen history
+        only once it has a verdict.
+        """
+        try:
+            if self.prescreen:
+                verdict = self.prescreen.screen(transaction_data)
+                if verdict:
+                    self._record_screened(transaction_data)
+                    return verdict
             
-            # Use Cortex AI LLM for fraud analysis
-            query = """
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                'llama2-70b-chat',
-                CONCAT(
-                    'As a fraud detection expert, analyze this transaction and provide a risk score (0-100) and explanation. ',
-                    'Consider factors like amount, merchant type, location, and timing patterns. ',
-                    'Respond in JSON format with "risk_score", "risk_level", and "explanation" fields.\n\n',
-                    %s
-                )
-            ) as fraud_analysis
-            """
+            # Prepare transaction context for AI analysis
+            transaction_context = self._build_transaction_context(transaction_data)
+            
+            route = self.router.route('fraud', tier)
+            cache_key = self.cache.make_key('fraud', route.model, transaction_context)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self._record_screened(transaction_data)
+                    return cached
             
-            self.cursor.execute(query, (transaction_context,))
-            result = self.cursor.fetchone()
+            # Use Cortex AI LLM for fraud analysis
+            result, model = self._fetch_one_routed(
+                route, cache_key, FRAUD_QUERY,
+                lambda model: (model, FRAUD_PROMPT, transaction_context, route.options), deadline)
             
             if result and result['FRAUD_ANALYSIS']:
-                # Try to parse JSON response
-                try:
-                    analysis = json.loads(result['FRAUD_ANALYSIS'])
-                except json.JSONDecodeError:
-                    # Fallback if not valid JSON
-                    analysis = {
-                        'risk_score': 50,
-                        'risk_level': 'Medium',
-                        'explanation': result['FRAUD_ANALYSIS']
-                    }
-                
+                analysis = {**self._parse_fraud_analysis(result['FRAUD_ANALYSIS']), 'model': model}
+                self.cache.set(cache_key, analysis)
+                self._record_screened(transaction_data)
                 return analysis
             
             return {'error': 'Failed to analyze transaction'}
             
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Fraud analysis error: {e}")
             return {'error': str(e)}
     
-    def analyze_market_sentiment(self, news_text):
-        """Analyze market sentiment using Cortex AI."""
+    def _record_screened(self, transaction_data):
+        """Add a transaction with a final verdict to the pre-screen's customer history."""
+        if self.prescreen:
+            self.prescreen.record(transaction_data)
+    
+    def _complete_chunk(self, prompt, contexts, route, alias, endpoint, deadline=None):
+        """Run ``prompt`` over one chunk of contexts in a single statement.
+        
+        Returns one raw answer (or None) per context, in input order.
+        TRY_COMPLETE yields NULL for rows the model fails on, so one bad
+        item does not fail the rest of the chunk.
+        """
+        query = f"""
+        SELECT
+            f.index AS item_index,
+            PARSE_JSON(SNOWFLAKE.CORTEX.TRY_COMPLETE(
+                %s,
+                ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', CONCAT(%s, f.value::STRING))),
+                PARSE_JSON(%s)
+            )):choices[0]:messages::STRING AS {alias}
+        FROM TABLE(FLATTEN(input => PARSE_JSON(%s))) f
+        ORDER BY f.index
+        """
+        
+        rows = self._fetch_all(query, (route.model, prompt, route.options, json.dumps(contexts)),
+                               endpoint=endpoint, model=route.model, deadline=deadline)
+        analyses = [None] * len(contexts)
+        for row in rows:
+            analyses[row['ITEM_INDEX']] = row[alias.upper()]
+        return analyses
+    
+    def _complete_chunks(self, prompt, pending, route, alias, endpoint, chunk_size, max_parallel, deadline=None):
+        """Score ``(key, context)`` pairs in parallel chunks of one statement each.
+        
+        Yields ``(key, context, raw answer or None, error message)`` once per
+        pair. At most ``max_parallel`` chunks hold a pooled connection at a
+        time; a failed chunk reports its error on each of its items.
+        """
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        if not chunks:
+            return
+        
+        def score_chunk(chunk):
+            return self._complete_chunk(prompt, [context for _, context in chunk], route, alias, endpoint, deadline)
+        
+        workers = min(len(chunks), max_parallel)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=endpoint.replace('_', '-')) as executor:
+            # Each chunk's statement carries the request's trace ID
+            futures = [executor.submit(contextvars.copy_context().run, score_chunk, chunk) for chunk in chunks]
+            
+            for chunk, future in zip(chunks, futures):
+                try:
+                    analyses = future.result()
+                except DeadlineExceeded:
+                    # The other chunks share the deadline and abort their own queries
+                    raise
+                except Exception as e:
+                    logger.error(f"{endpoint} chunk error: {e}")
+                    analyses = [None] * len(chunk)
+                    chunk_error = str(e)
+                else:
+                    chunk_error = None
+                
+                for (key, context), raw_analysis in zip(chunk, analyses):
+                    yield key, context, raw_analysis, chunk_error
+    
+    def analyze_fraud_batch(self, transactions, use_cache=True, tier=None, deadline=None):
+        """Score many transactions with one COMPLETE statement per chunk.
+        
+        Chunks run in parallel on separate pooled connections. Results come
+        back in input order, with per-item errors rather than a failed batch.
+        Transactions cleared by the pre-screen or already in the response
+        cache are not sent to Snowflake.
+        """
+        route = self.router.route('fraud', tier)
+        results = [None] * len(transactions)
+        pending = []  # (input index, transaction context)
+        
+        for index, transaction_data in enumerate(transactions):
+            if not isinstance(transaction_data, dict):
+                results[index] = {'index': index, 'error': 'Transaction must be a JSON object'}
+                continue
+            
+            if self.prescreen:
+                verdict = self.prescreen.screen(transaction_data)
+                if verdict:
+                    self._record_screened(transaction_data)
+                    results[index] = {'index': index, **verdict}
+                    continue
+            
+            transaction_context = self._build_transaction_context(transaction_data)
+            cached = None
+            if use_cache:
+                cached = self.cache.get(self.cache.make_key('fraud', route.model, transaction_context))
+            
+            if cached is not None:
+                self._record_screened(transaction_data)
+                results[index] = {'index': index, **cached}
+            else:
+                pending.append((index, transaction_context))
+        
+        scored = self._complete_chunks(FRAUD_PROMPT, pending, route, 'fraud_analysis', 'fraud_batch',
+                                       self.fraud_batch_chunk_size, self.fraud_batch_max_parallel, deadline)
+        for index, transaction_context, raw_analysis, chunk_error in scored:
+            if raw_analysis:
+                analysis = {**self._parse_fraud_analysis(raw_analysis), 'model': route.model}
+                self.cache.set(self.cache.make_key('fraud', route.model, transaction_context), analysis)
+                self._record_screened(transactions[index])
+                results[index] = {'index': index, **analysis}
+            else:
+                results[index] = {'index': index, 'error': chunk_error or 'Failed to analyze transaction'}
+        
+        for index, transaction_data in enumerate(transactions):
+            if isinstance(transaction_data, dict) and 'id' in transaction_data:
+                results[index]['id'] = transaction_data['id']
+        
+        return {
+            'results': results,
+            'count': len(results),
+            'errors': sum(1 for result in results if 'error' in result)
+        }
+    
+    def start_bulk_fraud_scoring(self, rescore=False, tier=None):
+        """Submit a warehouse-side job that scores the transactions table into fraud_scores.
+        
+        Only transactions without a score are processed unless ``rescore`` is
+        set. The statement runs asynchronously, so the pooled connection is
+        returned immediately; the Snowflake query ID identifies the job.
+        """
+        route = self.router.route('fraud', tier)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute_async(BULK_FRAUD_SCORING_SQL, {
+                    'model': route.model,
+                    'options': route.options,
+                    'prompt': FRAUD_PROMPT,
+                    'rescore': bool(rescore),
+                }, _statement_params=self._statement_params('fraud_bulk', route.model))
+                return cursor.sfqid
+            finally:
+                cursor.close()
+    
+    def bulk_fraud_scoring_status(self, query_id):
+        """Return the state of a bulk scoring job by its Snowflake query ID."""
+        with self.pool.connection() as connection:
+            status = connection.get_query_status(query_id)
+            return {
+                'query_id': query_id,
+                'status': status.name,
+                'running': connection.is_still_running(status),
+                'failed': connection.is_an_error(status),
+            }
+    
+    def iter_fraud_scores(self, page_size=1000, since=None):
+        """Yield pages of stored fraud scores without loading the whole table.
+        
+        Uses Arrow result batches when pyarrow is installed and falls back to
+        ``fetchmany`` otherwise. The pooled connection is held only while the
+        generator is being consumed.
+        """
+        query = """
+        SELECT s.transaction_id, t.customer_id, t.amount, s.risk_score, s.risk_level,
+               s.explanation, s.model, s.scored_at
+        FROM fraud_scores s
+        JOIN transactions t ON t.transaction_id = s.transaction_id
+        WHERE %s IS NULL OR s.scored_at >= TRY_TO_TIMESTAMP(%s)
+        ORDER BY s.transaction_id
+        """
+        
+        pooled = self.pool.acquire()
+        cursor = None
         try:
-            # Use Cortex sentiment analysis
-            query = """
-            SELECT 
-                SNOWFLAKE.CORTEX.SENTIMENT(%s) as sentiment_score,
-                SNOWFLAKE.CORTEX.COMPLETE(
-                    'llama2-70b-chat',
-                    CONCAT(
-                        'Analyze this financial news for market impact. Provide investment implications in JSON format with ',
-                        '"sentiment", "market_impact", "sectors_affected", and "investment_recommendation" fields.\n\n',
-                        %s
-                    )
-                ) as market_analysis
-            """
+            cursor = pooled.connection.cursor(self.connector.DictCursor)
+            cursor.execute(query, (since, since), _statement_params=self._statement_params('fraud_scores', 'none'))
             
-            self.cursor.execute(query, (news_text, news_text))
-            result = self.cursor.fetchone()
+            try:
+                batches = cursor.fetch_arrow_batches()
+            except (self.connector.errors.ProgrammingError,
+                    self.connector.errors.NotSupportedError):
+                batches = None
             
-            if result:
-                analysis = {
-                    'sentiment_score': result['SENTIMENT_SCORE'],
-                    'market_analysis': result['MARKET_ANALYSIS']
+            if batches is not None:
+                for table in batches:
+                    rows = table.to_pylist()
+                    for start in range(0, len(rows), page_size):
+                        yield rows[start:start + page_size]
+            else:
+                while True:
+                    rows = cursor.fetchmany(page_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            # Also runs when the client disconnects and the generator is closed early
+            if cursor is not None:
+                cursor.close()
+            self.pool.release(pooled)
+    
+    def score_market_news(self, rescore=False):
+        """Score new and changed market_news rows in place and advance the watermark.
+        
+        Sentiment is computed by one set-based UPDATE that writes
+        ``sentiment_score`` and ``impact_level`` back to the table; nothing is
+        scored twice unless its text changed or ``rescore`` is set. Runs are
+        serialized so two callers never score the same rows concurrently.
+        """
+        with self._news_scoring_lock, self.pool.connection() as connection:
+            cursor = connection.cursor(self.connector.DictCursor)
+            statement_params = self._statement_params('news_scoring', 'none')
+            try:
+                started = time.perf_counter()
+                cursor.execute(NEWS_WATERMARK_QUERY, (NEWS_SCORING_PIPELINE,), _statement_params=statement_params)
+                row = cursor.fetchone()
+                previous = row['WATERMARK'] if row else None
+                
+                scoring_params = {
+                    'rescore': bool(rescore),
+                    'watermark': previous,
+                    'lookback_hours': self.news_scoring_lookback_hours,
+                    'high_impact': NEWS_IMPACT_HIGH,
+                    'medium_impact': NEWS_IMPACT_MEDIUM,
                 }
+                scoring_started = time.perf_counter()
+                cursor.execute(NEWS_SENTIMENT_SCORING_SQL, scoring_params, _statement_params=statement_params)
+                self._record_query(cursor.sfqid, 'news_scoring', 'none', NEWS_SENTIMENT_SCORING_SQL, scoring_params,
+                                   0.0, time.perf_counter() - scoring_started, 0.0)
+                scored = cursor.rowcount or 0
                 
-                # Try to parse market analysis JSON
+                cursor.execute(ADVANCE_NEWS_WATERMARK_SQL, {'pipeline': NEWS_SCORING_PIPELINE},
+                               _statement_params=statement_params)
+                cursor.execute(NEWS_WATERMARK_QUERY, (NEWS_SCORING_PIPELINE,), _statement_params=statement_params)
+                row = cursor.fetchone()
+                watermark = row['WATERMARK'] if row else previous
+                EXECUTE_SECONDS.observe(time.perf_counter() - started, 'news_scoring', 'none')
+            finally:
+                cursor.close()
+        
+        logger.info(f"Scored {scored} market_news rows (watermark {previous} -> {watermark})")
+        return {
+            'scored': scored,
+            'previous_watermark': self._isoformat(previous),
+            'watermark': self._isoformat(watermark),
+        }
+    
+    def start_news_scoring(self, interval):
+        """Run ``score_market_news`` every ``interval`` seconds in a daemon thread."""
+        if not interval:
+            return
+        if self._news_scoring_thread and self._news_scoring_thread.is_alive():
+            return
+        
+        def loop():
+            set_workload('bulk')
+            while True:
+                time.sleep(interval)
                 try:
-                    market_data = json.loads(result['MARKET_ANALYSIS'])
-                    analysis['market_analysis'] = market_data
-                except json.JSONDecodeError:
-                    pass
-                
+                    self.score_market_news()
+                except Exception as e:
+                    logger.error(f"Market news scoring error: {e}")
+        
+        self._news_scoring_thread = threading.Thread(target=loop, name='news-scoring', daemon=True)
+        self._news_scoring_thread.start()
+    
+    def get_news_sentiment(self, news_id):
+        """Return the stored sentiment for one article, or None if it does not exist."""
+        row = self._fetch_one(NEWS_SENTIMENT_COLUMNS + 'WHERE news_id = %s', (news_id,), endpoint='news_sentiment')
+        return self._news_sentiment_row(row) if row else None
+    
+    def list_news_sentiment(self, sector=None, limit=100):
+        """Return stored sentiment for the newest articles, optionally in one sector."""
+        rows = self._fetch_all(
+            NEWS_SENTIMENT_COLUMNS + 'WHERE %s IS NULL OR sector = %s ORDER BY publish_date DESC LIMIT %s',
+            (sector, sector, limit), endpoint='news_sentiment')
+        return [self._news_sentiment_row(row) for row in rows]
+    
+    @staticmethod
+    def parse_sentiment_bucket(bucket):
+        """Split a bucket like ``15m`` or ``1d`` into ``(length, TIME_SLICE unit)``."""
+        match = re.fullmatch(r'(\d+)([mhdw])', (bucket or '').strip().lower())
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Invalid bucket '{bucket}' (expected e.g. 15m, 1h, 1d or 1w)")
+        return int(match.group(1)), SENTIMENT_BUCKET_UNITS[match.group(2)]
+    
+    def sector_sentiment(self, sectors=None, bucket='1h', hours=24, since=None, until=None,
+                         use_cache=True, deadline=None):
+        """Aggregate article sentiment by sector and time bucket in a single query.
+        
+        Snowflake scores every article in the window with CORTEX.SENTIMENT and
+        returns only count, mean, min and max per (sector, bucket), so one
+        round trip replaces a sentiment call per article. The window is
+        ``since``..``until`` or, without ``since``, the ``hours`` before
+        ``until`` (default now).
+        """
+        slice_length, date_part = self.parse_sentiment_bucket(bucket)
+        params = {
+            'since': since,
+            'until': until,
+            'hours': hours,
+            'sectors': json.dumps(sorted(sectors)) if sectors else None,
+        }
+        cache_key = self.cache.make_key('sector_sentiment', 'none',
+                                        json.dumps({**params, 'bucket': [slice_length, date_part]}, sort_keys=True))
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        query = SECTOR_SENTIMENT_QUERY.format(slice_length=slice_length, date_part=date_part)
+        rows = self._fetch_all(query, params, endpoint='sector_sentiment', deadline=deadline)
+        
+        series = {}
+        for row in rows:
+            series.setdefault(row['SECTOR'], []).append({
+                'start': self._isoformat(row['BUCKET_START']),
+                'count': row['ARTICLES'],
+                'mean': round(float(row['MEAN_SENTIMENT']), 4),
+                'min': round(float(row['MIN_SENTIMENT']), 4),
+                'max': round(float(row['MAX_SENTIMENT']), 4),
+            })
+        
+        result = {
+            'bucket': f"{slice_length}{date_part[0].lower()}",
+            'window': {'since': since, 'until': until, 'hours': None if since else hours},
+            'series': [{'sector': sector, 'buckets': buckets} for sector, buckets in series.items()],
+            'articles': sum(row['ARTICLES'] for row in rows),
+        }
+        self.cache.set(cache_key, result)
+        return result
+    
+    @classmethod
+    def _news_sentiment_row(cls, row):
+        """Shape a market_news row for JSON; unscored articles have a null score."""
+        score = row.get('SENTIMENT_SCORE')
+        return {
+            'news_id': row.get('NEWS_ID'),
+            'headline': row.get('HEADLINE'),
+            'source': row.get('SOURCE'),
+            'sector': row.get('SECTOR'),
+            'publish_date': cls._isoformat(row.get('PUBLISH_DATE')),
+            'sentiment_score': float(score) if score is not None else None,
+            'impact_level': row.get('IMPACT_LEVEL'),
+            'scored_at': cls._isoformat(row.get('SCORED_AT')),
+        }
+    
+    @staticmethod
+    def _isoformat(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+    
+    @staticmethod
+    def _parse_sentiment_result(result, model):
+        """Build the sentiment response from a SENTIMENT_QUERY row."""
+        analysis = {
+            'sentiment_score': result['SENTIMENT_SCORE'],
+            'market_analysis': result['MARKET_ANALYSIS'],
+            'model': model
+        }
+        
+        # Try to parse market analysis JSON
+        started = time.perf_counter()
+        try:
+            market_data = json.loads(result['MARKET_ANALYSIS'])
+            analysis['market_analysis'] = market_data
+        except (json.JSONDecodeError, TypeError):
+            PARSE_FALLBACKS.inc('sentiment')
+        finally:
+            PARSE_SECONDS.observe(time.perf_counter() - started, 'sentiment')
+        
+        return analysis
+    
+    def analyze_market_sentiment(self, news_text, use_cache=True, tier=None, deadline=None):
+        """Analyze market sentiment using Cortex AI."""
+        try:
+            route = self.router.route('sentiment', tier)
+            cache_key = self.cache.make_key('sentiment', route.model, news_text)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            # Use Cortex sentiment analysis
+            result, model = self._fetch_one_routed(
+                route, cache_key, SENTIMENT_QUERY,
+                lambda model: (news_text, model, news_text, route.options), deadline)
+            
+            if result:
+                analysis = self._parse_sentiment_result(result, model)
+                self.cache.set(cache_key, analysis)
                 return analysis
             
             return {'error': 'Failed to analyze market sentiment'}
             
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Market sentiment analysis error: {e}")
             return {'error': str(e)}
     
-    def assess_credit_risk(self, customer_data):
-        """Assess credit risk using customer financial data."""
-        try:
-            customer_context = f"""
+    @staticmethod
+    def _build_customer_context(customer_data):
+        """Format a customer profile for the credit risk prompt."""
+        return f"""
             Customer Profile:
             Income: ${customer_data.get('income', 0)}
             Credit History: {customer_data.get('credit_history', 'Unknown')} years
@@ -240,96 +1476,679 @@ class SnowflakeCortexAI:
             Previous Defaults: {customer_data.get('defaults', 0)}
             Credit Utilization: {customer_data.get('utilization', 0)}%
             """
+    
+    @staticmethod
+    def _parse_risk_assessment(raw_assessment):
+        """Parse the LLM credit risk response, falling back to a medium-risk verdict."""
+        started = time.perf_counter()
+        try:
+            assessment = json.loads(raw_assessment)
+            if isinstance(assessment, dict):
+                return assessment
+        except json.JSONDecodeError:
+            pass
+        finally:
+            PARSE_SECONDS.observe(time.perf_counter() - started, 'risk')
+        
+        PARSE_FALLBACKS.inc('risk')
+        return {
+            'credit_score': 650,
+            'risk_category': 'Medium',
+            'analysis': raw_assessment
+        }
+    
+    def assess_credit_risk(self, customer_data, use_cache=True, tier=None, deadline=None):
+        """Assess credit risk using customer financial data."""
+        try:
+            customer_context = self._build_customer_context(customer_data)
             
-            query = """
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                'llama2-70b-chat',
-                CONCAT(
-                    'As a credit risk analyst, evaluate this customer profile and provide a credit score (300-850), ',
-                    'risk category (Low/Medium/High), and detailed analysis. ',
-                    'Respond in JSON format with "credit_score", "risk_category", "approval_recommendation", and "analysis" fields.\n\n',
-                    %s
-                )
-            ) as risk_assessment
-            """
+            route = self.router.route('risk', tier)
+            cache_key = self.cache.make_key('risk', route.model, customer_context)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            self.cursor.execute(query, (customer_context,))
-            result = self.cursor.fetchone()
+            result, model = self._fetch_one_routed(
+                route, cache_key, RISK_QUERY,
+                lambda model: (model, RISK_PROMPT, customer_context, route.options), deadline)
             
             if result and result['RISK_ASSESSMENT']:
-                try:
-                    assessment = json.loads(result['RISK_ASSESSMENT'])
-                except json.JSONDecodeError:
-                    assessment = {
-                        'credit_score': 650,
-                        'risk_category': 'Medium',
-                        'analysis': result['RISK_ASSESSMENT']
-                    }
-                
+                assessment = {**self._parse_risk_assessment(result['RISK_ASSESSMENT']), 'model': model}
+                self.cache.set(cache_key, assessment)
                 return assessment
             
             return {'error': 'Failed to assess credit risk'}
             
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Credit risk assessment error: {e}")
             return {'error': str(e)}
     
-    def financial_chat(self, user_question, context=None):
-        """AI-powered financial assistant chat."""
+    @staticmethod
+    def _customer_data_from_profile(profile):
+        """Map a customers row onto the fields ``_build_customer_context`` reads."""
+        employment = profile.get('EMPLOYMENT_STATUS') or 'Unknown'
+        if profile.get('EMPLOYMENT_YEARS') is not None:
+            employment = f"{employment}, {profile['EMPLOYMENT_YEARS']} years"
+        return {
+            'income': profile.get('ANNUAL_INCOME') or 0,
+            'debt_ratio': profile.get('DEBT_TO_INCOME_RATIO') or 0,
+            'employment': employment,
+            'defaults': profile.get('PREVIOUS_DEFAULTS') or 0,
+            'utilization': profile.get('CREDIT_UTILIZATION') or 0,
+        }
+    
+    def get_customer_profile(self, customer_id, use_cache=True, deadline=None):
+        """Return the stored profile of ``customer_id`` as risk input, or None if unknown."""
+        cache_key = self.cache.make_key('customer_profile', 'none', customer_id)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        row = self._fetch_one(CUSTOMER_PROFILE_QUERY, (customer_id,), endpoint='customer_profile', deadline=deadline)
+        if not row:
+            return None
+        profile = self._customer_data_from_profile(row)
+        self.cache.set(cache_key, profile)
+        return profile
+    
+    def assess_customer_risk(self, customer_id, use_cache=True, tier=None, deadline=None):
+        """Assess credit risk for a stored customer; returns None if the customer does not exist."""
+        profile = self.get_customer_profile(customer_id, use_cache=use_cache, deadline=deadline)
+        if profile is None:
+            return None
+        return {'customer_id': customer_id,
+                **self.assess_credit_risk(profile, use_cache=use_cache, tier=tier, deadline=deadline)}
+    
+    def assess_portfolio(self, customer_ids=None, filters=None, limit=RISK_PORTFOLIO_MAX_SIZE,
+                         use_cache=True, tier=None, deadline=None):
+        """Assess many stored customers with one COMPLETE statement per chunk.
+        
+        Customers are chosen by ``customer_ids`` or by ``filters`` on the
+        customers table and resolved in one query. Assessments already in the
+        response cache are reused; the rest run in parallel chunks exactly
+        like batch fraud scoring. Unknown IDs are reported per item.
+        """
+        filters = filters or {}
+        params = {name: filters.get(name) for name in PORTFOLIO_FILTERS}
+        params['customer_ids'] = json.dumps(list(customer_ids)) if customer_ids is not None else None
+        params['limit'] = limit
+        rows = self._fetch_all(PORTFOLIO_PROFILES_QUERY, params, endpoint='customer_profile', deadline=deadline)
+        
+        route = self.router.route('risk', tier)
+        order = list(customer_ids) if customer_ids is not None else [row['CUSTOMER_ID'] for row in rows]
+        results = {customer_id: {'customer_id': customer_id, 'error': 'Customer not found'} for customer_id in order}
+        pending = []  # (customer ID, customer context)
+        
+        for row in rows:
+            profile = self._customer_data_from_profile(row)
+            self.cache.set(self.cache.make_key('customer_profile', 'none', row['CUSTOMER_ID']), profile)
+            customer_context = self._build_customer_context(profile)
+            cached = self.cache.get(self.cache.make_key('risk', route.model, customer_context)) if use_cache else None
+            if cached is not None:
+                results[row['CUSTOMER_ID']] = {'customer_id': row['CUSTOMER_ID'], **cached}
+            else:
+                pending.append((row['CUSTOMER_ID'], customer_context))
+        
+        scored = self._complete_chunks(RISK_PROMPT, pending, route, 'risk_assessment', 'risk_portfolio',
+                                       self.risk_batch_chunk_size, self.risk_batch_max_parallel, deadline)
+        for customer_id, customer_context, raw_assessment, chunk_error in scored:
+            if raw_assessment:
+                assessment = {**self._parse_risk_assessment(raw_assessment), 'model': route.model}
+                self.cache.set(self.cache.make_key('risk', route.model, customer_context), assessment)
+                results[customer_id] = {'customer_id': customer_id, **assessment}
+            else:
+                results[customer_id] = {'customer_id': customer_id,
+                                        'error': chunk_error or 'Failed to assess credit risk'}
+        
+        ordered = [results[customer_id] for customer_id in order]
+        categories = {}
+        for result in ordered:
+            if 'error' not in result:
+                category = result.get('risk_category', 'Unknown')
+                categories[category] = categories.get(category, 0) + 1
+        
+        return {
+            'results': ordered,
+            'count': len(ordered),
+            'errors': sum(1 for result in ordered if 'error' in result),
+            'risk_categories': categories,
+            'model': route.model,
+        }
+    
+    def _async_request(self, endpoint, payload, route):
+        """Return (prompt, query, params) for an endpoint that supports async mode."""
+        if endpoint == 'fraud':
+            prompt = self._build_transaction_context(payload)
+            return prompt, FRAUD_QUERY, (route.model, FRAUD_PROMPT, prompt, route.options)
+        if endpoint == 'risk':
+            prompt = self._build_customer_context(payload)
+            return prompt, RISK_QUERY, (route.model, RISK_PROMPT, prompt, route.options)
+        if endpoint == 'sentiment':
+            return payload, SENTIMENT_QUERY, (payload, route.model, payload, route.options)
+        raise ValueError(f"Async mode is not supported for {endpoint}")
+    
+    def _parse_async_result(self, endpoint, result, model):
+        """Turn the row of a finished async query into the endpoint's response."""
+        if endpoint == 'fraud' and result and result['FRAUD_ANALYSIS']:
+            return {**self._parse_fraud_analysis(result['FRAUD_ANALYSIS']), 'model': model}
+        if endpoint == 'risk' and result and result['RISK_ASSESSMENT']:
+            return {**self._parse_risk_assessment(result['RISK_ASSESSMENT']), 'model': model}
+        if endpoint == 'sentiment' and result:
+            return self._parse_sentiment_result(result, model)
+        return None
+    
+    def submit_analysis(self, endpoint, payload, use_cache=True, tier=None):
+        """Start a fraud, risk or sentiment analysis without waiting for Cortex.
+        
+        The query is submitted with ``execute_async`` and the pooled
+        connection is returned straight away. Pre-screened and cached answers
+        produce a job that is already complete. Async jobs have no latency
+        budget, so the tier's primary model is always used.
+        """
+        if endpoint == 'fraud' and self.prescreen:
+            verdict = self.prescreen.screen(payload)
+            if verdict:
+                self._record_screened(payload)
+                job = AsyncJob(endpoint)
+                job.succeed(verdict)
+                return self.jobs.add(job)
+        
+        route = self.router.route(endpoint, tier)
+        prompt, query, params = self._async_request(endpoint, payload, route)
+        job = AsyncJob(endpoint, cache_key=self.cache.make_key(endpoint, route.model, prompt),
+                       transaction=payload if endpoint == 'fraud' else None)
+        
+        cached = self.cache.get(job.cache_key) if use_cache else None
+        if cached is not None:
+            if job.transaction is not None:
+                self._record_screened(job.transaction)
+            job.succeed(cached)
+            return self.jobs.add(job)
+        
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute_async(query, params, _statement_params=self._statement_params(endpoint, route.model))
+                job.query_id = cursor.sfqid
+            finally:
+                cursor.close()
+        
+        return self.jobs.add(job)
+    
+    def refresh_job(self, job):
+        """Check a running job in Snowflake and record its result once it has finished."""
+        if job.done:
+            return job
+        
         try:
-            system_prompt = """
+            with self.pool.connection() as connection:
+                status = connection.get_query_status_throw_if_error(job.query_id)
+                if connection.is_still_running(status):
+                    return job
+                
+                cursor = connection.cursor(self.connector.DictCursor)
+                try:
+                    cursor.get_results_from_sfqid(job.query_id)
+                    result = cursor.fetchone()
+                finally:
+                    cursor.close()
+        except self.connector.errors.ProgrammingError as e:
+            # The query itself failed; connection problems propagate to the caller
+            logger.error(f"Async {job.endpoint} job {job.id} failed: {e}")
+            job.fail(e)
+            return job
+        
+        analysis = self._parse_async_result(job.endpoint, result, job.cache_key[1])
+        if analysis is None:
+            job.fail(f"Failed to complete {job.endpoint} analysis")
+        else:
+            self.cache.set(job.cache_key, analysis)
+            if job.transaction is not None:
+                self._record_screened(job.transaction)
+            job.succeed(analysis)
+        return job
+    
+    @staticmethod
+    def _build_chat_prompt(user_question, context=None, history=None):
+        """Combine the advisor system prompt with the conversation so far, the question and context."""
+        system_prompt = """
             You are a professional financial advisor AI assistant. Provide helpful, accurate financial advice 
             while being clear about limitations and encouraging users to consult with licensed professionals 
             for personalized advice. Keep responses concise and actionable.
             """
+        
+        full_prompt = system_prompt
+        if history:
+            full_prompt += f"\n\nConversation so far:\n{history}"
+        full_prompt += f"\n\nUser Question: {user_question}"
+        if context:
+            full_prompt += f"\n\nContext: {context}"
+        return full_prompt
+    
+    def _session_history(self, session):
+        return session.history(self.sessions.token_budget) if session is not None else None
+    
+    def _embed_question(self, question, deadline=None):
+        """Embed a chat question with Cortex EMBED_TEXT_768, or locally with SEMANTIC_CACHE_EMBEDDER=local."""
+        if self.semantic_embedder == 'local':
+            return hashing_embedding(question, LOCAL_EMBEDDING_DIM)
+        row = self._fetch_one(EMBED_QUESTION_QUERY, (self.semantic_embed_model, question),
+                              endpoint='chat_embed', model=self.semantic_embed_model, deadline=deadline)
+        embedding = row['EMBEDDING'] if row else None
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        if not embedding:
+            raise RuntimeError('Empty question embedding')
+        return embedding
+    
+    def _semantic_lookup(self, user_question, context, history, model, deadline=None):
+        """Return ``(namespace, embedding, answer)`` for a semantically cached chat question.
+        
+        Only standalone questions are eligible: with conversation history the
+        answer depends on more than the question, so nothing is looked up or
+        stored. ``answer`` is None on a miss; ``embedding`` is None when the
+        question was not embedded.
+        """
+        if history or self.semantic_cache.max_entries <= 0:
+            return None, None, None
+        context_hash = hashlib.sha256(str(context or '').encode('utf-8')).hexdigest()[:16]
+        namespace = f"{model}:{context_hash}"
+        try:
+            embedding = self._embed_question(user_question, deadline)
+            match = self.semantic_cache.get(namespace, embedding)
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.warning(f"Semantic chat cache skipped: {e}")
+            return None, None, None
+        if match is None:
+            return namespace, embedding, None
+        answer, similarity = match
+        return namespace, embedding, {**answer, 'semantic_similarity': round(similarity, 4)}
+    
+    def _summarize_chat(self, summary, turns):
+        """Fold ``turns`` into ``summary`` with a short COMPLETE call (runs off the request path)."""
+        transcript = '\n\n'.join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+        if summary:
+            transcript = f"Earlier summary: {summary}\n\n{transcript}"
+        
+        route = self.router.route('chat_summary')
+        prompt = CHAT_SUMMARY_PROMPT + transcript
+        row, _ = self._fetch_one_routed(
+            route, self.cache.make_key('chat_summary', route.model, prompt), CHAT_QUERY,
+            lambda model: (model, prompt, route.options))
+        if not row or not row['CHAT_RESPONSE']:
+            raise RuntimeError('Empty conversation summary')
+        return row['CHAT_RESPONSE'].strip()
+    
+    def financial_chat(self, user_question, context=None, use_cache=True, tier=None, deadline=None, session=None):
+        """AI-powered financial assistant chat.
+        
+        With a ``session``, the prompt carries the conversation so far within
+        the session's token budget and the finished turn is added to it.
+        """
+        try:
+            history = self._session_history(session)
+            full_prompt = self._build_chat_prompt(user_question, context, history)
             
-            full_prompt = f"{system_prompt}\n\nUser Question: {user_question}"
-            if context:
-                full_prompt += f"\n\nContext: {context}"
-            
-            query = """
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                'llama2-70b-chat',
-                %s
-            ) as chat_response
-            """
+            route = self.router.route('chat', tier)
+            cache_key = self.cache.make_key('chat', route.model, full_prompt)
+            namespace = embedding = None
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is None:
+                    namespace, embedding, cached = self._semantic_lookup(
+                        user_question, context, history, route.model, deadline)
+                if cached is not None:
+                    if session is not None:
+                        self.sessions.record_turn(session, user_question, cached['response'])
+                    return cached
             
-            self.cursor.execute(query, (full_prompt,))
-            result = self.cursor.fetchone()
+            result, model = self._fetch_one_routed(
+                route, cache_key, CHAT_QUERY,
+                lambda model: (model, full_prompt, route.options), deadline)
             
             if result and result['CHAT_RESPONSE']:
-                return {'response': result['CHAT_RESPONSE']}
+                response = {'response': result['CHAT_RESPONSE'], 'model': model}
+                self.cache.set(cache_key, response)
+                if embedding is not None:
+                    self.semantic_cache.set(namespace, embedding, response)
+                if session is not None:
+                    self.sessions.record_turn(session, user_question, response['response'])
+                return response
             
             return {'error': 'Failed to generate response'}
             
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Financial chat error: {e}")
             return {'error': str(e)}
     
+    def _stream_complete_rest(self, prompt, route, deadline=None):
+        """Yield COMPLETE tokens from the Cortex REST API using a pooled session's token.
+        
+        The pooled connection is held until generation ends so its session
+        (and therefore the token) stays valid for the whole stream.
+        """
+        with self.pool.connection() as connection:
+            rest_token = getattr(getattr(connection, 'rest', None), 'token', None)
+            if not rest_token or not getattr(connection, 'host', None):
+                raise RuntimeError("Cortex REST API unavailable: session has no REST token or host")
+            request_body = json.dumps({
+                'model': route.model,
+                'messages': [{'role': 'user', 'content': prompt}],
+                'max_tokens': route.max_tokens,
+                'temperature': route.temperature,
+                'stream': True,
+            }).encode('utf-8')
+            http_request = urllib.request.Request(
+                f"https://{connection.host}/api/v2/cortex/inference:complete",
+                data=request_body,
+                headers={
+                    'Authorization': f'Snowflake Token="{rest_token}"',
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream',
+                },
+                method='POST',
+            )
+            
+            timeout = self.chat_stream_timeout if deadline is None else min(self.chat_stream_timeout,
+                                                                             deadline.remaining())
+            with urllib.request.urlopen(http_request, timeout=timeout) as http_response:
+                for raw_line in http_response:
+                    if deadline is not None:
+                        deadline.check()
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        break
+                    for choice in json.loads(payload).get('choices', []):
+                        token = choice.get('delta', {}).get('content')
+                        if token:
+                            yield token
+    
+    def stream_financial_chat(self, user_question, context=None, use_cache=True, tier=None, deadline=None,
+                              session=None):
+        """Yield the assistant's answer in chunks as soon as they are available.
+        
+        By default (CORTEX_CHAT_STREAMING=rest) tokens are relayed from the
+        Cortex REST API as they are generated, so the first one arrives long
+        before the answer is complete. With ``sentence``, or while the REST
+        stream is unavailable (no session token, or it failed before its
+        first token within the last CORTEX_CHAT_REST_RETRY seconds), the
+        answer is generated with SQL COMPLETE and delivered one sentence at
+        a time, which gives no time-to-first-token gain.
+        """
+        history = self._session_history(session)
+        full_prompt = self._build_chat_prompt(user_question, context, history)
+        route = self.router.route('chat', tier)
+        cache_key = self.cache.make_key('chat', route.model, full_prompt)
+        cached = self.cache.get(cache_key) if use_cache else None
+        
+        use_rest = self.chat_streaming == 'rest' and time.monotonic() >= self._chat_rest_retry_at
+        namespace = embedding = None
+        if cached is None and use_cache and use_rest:
+            # Sentence mode goes through financial_chat, which does its own semantic lookup
+            namespace, embedding, cached = self._semantic_lookup(
+                user_question, context, history, route.model, deadline)
+        
+        if cached is None and use_rest:
+            tokens = []
+            try:
+                for token in self._stream_complete_rest(full_prompt, route, deadline):
+                    tokens.append(token)
+                    yield token
+            except Exception as e:
+                if tokens or isinstance(e, (DeadlineExceeded, CircuitOpenError)):
+                    raise
+                self._chat_rest_retry_at = time.monotonic() + self.chat_rest_retry
+                logger.warning(f"Cortex token streaming unavailable, using sentence chunks for "
+                               f"{self.chat_rest_retry:g}s: {e}")
+            
+            if tokens:
+                response = {'response': ''.join(tokens), 'model': route.model}
+                self.cache.set(cache_key, response)
+                if embedding is not None:
+                    self.semantic_cache.set(namespace, embedding, response)
+                if session is not None:
+                    self.sessions.record_turn(session, user_question, ''.join(tokens))
+                return
+        
+        if cached is not None:
+            result = cached
+            if session is not None:
+                self.sessions.record_turn(session, user_question, cached['response'])
+        else:
+            result = self.financial_chat(user_question, context, use_cache=use_cache, tier=tier,
+                                         deadline=deadline, session=session)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        
+        for sentence in SENTENCE_BOUNDARY.split(result['response'].strip()):
+            if sentence:
+                yield sentence + ' '
+    
     def ensure_connection(self):
-        """Ensure Snowflake connection is active."""
-        if not self.connection or not self.cursor:
-            logger.warning("Connection lost, attempting to reconnect...")
+        """Ensure a pooled Snowflake connection is available.
+        
+        No query is issued while a connection has succeeded within the
+        liveness TTL; the background keepalive keeps that window fresh and
+        dead connections are otherwise detected from the real query's error.
+        Raises CircuitOpenError at once while the circuit breaker is open.
+        """
+        started = time.perf_counter()
+        try:
+            self.breaker.check()
+            return self._check_connection()
+        finally:
+            ENSURE_CONNECTION_SECONDS.observe(time.perf_counter() - started)
+    
+    def _check_connection(self):
+        """Connect, trust a fresh pool, or probe once; see ``ensure_connection``."""
+        if self.pool.size == 0:
+            logger.warning(f"No pooled {self.workload.name} connections, attempting to connect...")
+            return self.connect()
+        
+        if self.pool.is_fresh():
+            return True
+        
+        # Nothing has succeeded recently (e.g. keepalive disabled); probe once
+        try:
+            pooled = self.pool.acquire()
+        except PoolExhaustedError as e:
+            logger.warning(f"Connection pool exhausted: {e}")
+            return False
+        except Exception as e:
+            logger.warning(f"Connection checkout failed: {e}, attempting to reconnect...")
             return self.connect()
         
         try:
-            # Test the connection with a simple query
-            self.cursor.execute("SELECT 1")
+            self._probe_connection(pooled.connection)
+            self.pool.release(pooled)
             return True
         except Exception as e:
             logger.warning(f"Connection test failed: {e}, attempting to reconnect...")
+            self.pool.release(pooled, discard=True)
             return self.connect()
 
 # Initialize Cortex AI handler
 cortex_ai = SnowflakeCortexAI()
 
+metrics.gauge_callback(
+    'finai_pool_connections', 'Pooled Snowflake connections by state', ['state'],
+    lambda: {(state,): cortex_ai.pool.stats()[state] for state in ('idle', 'in_use')})
+metrics.gauge_callback(
+    'finai_workload_connections', 'Connections per workload pool by state', ['workload', 'state'],
+    lambda: {(name, state): workload.pool.stats()[state] for name, workload in cortex_ai.workloads.items()
+             for state in ('idle', 'in_use', 'waiting')})
+metrics.gauge_callback(
+    'finai_cache_requests', 'Response cache lookups by endpoint and outcome', ['endpoint', 'outcome'],
+    lambda: {(endpoint, outcome): counts[key]
+             for endpoint, counts in cortex_ai.cache.stats()['endpoints'].items()
+             for outcome, key in (('hit', 'hits'), ('miss', 'misses'))})
+metrics.gauge_callback(
+    'finai_semantic_cache_requests', 'Semantic chat cache lookups by outcome', ['outcome'],
+    lambda: {(outcome,): cortex_ai.semantic_cache.stats()[key] for outcome, key in (('hit', 'hits'), ('miss', 'misses'))})
+metrics.gauge_callback(
+    'finai_coalesced_requests', 'Cortex calls executed vs. collapsed onto an in-flight query', ['endpoint', 'outcome'],
+    lambda: {(endpoint, outcome): count
+             for endpoint, counts in cortex_ai.single_flight.stats()['endpoints'].items()
+             for outcome, count in counts.items()})
+metrics.gauge_callback(
+    'finai_prescreen_transactions', 'Fraud pre-screen outcomes', ['outcome'],
+    lambda: {(outcome,): cortex_ai.prescreen.stats()[outcome] for outcome in ('fast_path', 'escalated')}
+    if cortex_ai.prescreen else {})
+metrics.gauge_callback(
+    'finai_chat_sessions', 'Live server-side chat sessions', [],
+    lambda: {(): cortex_ai.sessions.stats()['sessions']})
+metrics.gauge_callback(
+    'finai_scheduler_requests', 'Requests holding or waiting for a scheduler slot by class', ['class', 'state'],
+    lambda: {(name, state): cls[state] for name, cls in scheduler.stats()['classes'].items()
+             for state in ('active', 'queued')})
+metrics.gauge_callback(
+    'finai_scheduler_rejected', 'Requests shed with 429 by class and reason', ['class', 'reason'],
+    lambda: {(name, reason): count for name, cls in scheduler.stats()['classes'].items()
+             for reason, count in cls['rejected'].items()})
+metrics.gauge_callback(
+    'finai_circuit_state', 'Snowflake circuit breaker state (1 for the current state)', ['state'],
+    lambda: {(state,): int(cortex_ai.breaker.state == state) for state in ('closed', 'open', 'half_open')})
+metrics.gauge_callback(
+    'finai_circuit_rejected', 'Snowflake calls rejected while the circuit was open', [],
+    lambda: {(): cortex_ai.breaker.stats()['rejected']})
+metrics.gauge_callback(
+    'finai_startup_seconds', 'Time spent in each Snowflake initialization phase', ['phase'],
+    lambda: {(phase,): seconds for phase, seconds in STARTUP_SECONDS.items()})
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started and give it a trace ID for its Snowflake query tags."""
+    g.request_started = time.perf_counter()
+    g.trace_id = new_trace_id(request.headers.get('X-Trace-ID'))
+    set_trace_id(g.trace_id)
+    set_workload(workload_for_path(request.path, WORKLOAD_ROUTES))
+
+@app.after_request
+def record_request_latency(response):
+    """Record total request latency labelled by route, method and status."""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, response.status_code)
+    if g.get('trace_id'):
+        response.headers['X-Trace-ID'] = g.trace_id
+    return response
+
+@app.teardown_request
+def clear_trace_id(error=None):
+    """Forget the trace ID and workload once the response (including any stream) is finished."""
+    set_trace_id(None)
+    set_workload(None)
+
+def use_response_cache():
+    """Return False if the client asked to bypass the response cache."""
+    if request.headers.get('X-Cache-Bypass', '').lower() in ('1', 'true', 'yes'):
+        return False
+    return 'no-cache' not in request.headers.get('Cache-Control', '').lower()
+
+def requested_tier():
+    """Model tier asked for with ``?tier=`` or ``X-Model-Tier``; None means server policy."""
+    tier = request.args.get('tier') or request.headers.get('X-Model-Tier')
+    return tier.strip().lower() if tier else None
+
+def invalid_tier_response(tier):
+    """Return a 400 response for an unknown model tier, or None if the tier is usable."""
+    if tier and not cortex_ai.router.has_tier(tier):
+        return jsonify({'error': f"Unknown model tier '{tier}'", 'tiers': sorted(cortex_ai.router.tiers)}), 400
+    return None
+
+def request_deadline(endpoint):
+    """Deadline from ``X-Request-Timeout`` (seconds) or the endpoint default; None if disabled.
+    
+    Client disconnects are detected when the server exposes the socket in
+    the WSGI environ (the Werkzeug dev server and gunicorn do).
+    """
+    seconds = request.headers.get('X-Request-Timeout', type=float) or REQUEST_TIMEOUTS[endpoint]
+    if not seconds or seconds <= 0:
+        return None
+    
+    sock = request.environ.get('werkzeug.socket') or request.environ.get('gunicorn.socket')
+    disconnected = socket_disconnected(sock) if sock is not None else None
+    return Deadline(min(seconds, REQUEST_TIMEOUT_MAX), disconnected)
+
+def deadline_response(error):
+    """Reply 504 for a request whose deadline passed or whose client went away."""
+    return jsonify({'error': str(error), 'reason': error.reason}), 504
+
+def circuit_open_response(error):
+    """Reply 503 with Retry-After while the Snowflake circuit breaker is open."""
+    response = jsonify({'error': str(error), 'retry_after': round(error.retry_after, 3)})
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response, 503
+
+def wants_async():
+    """Return True if the client asked for a job ID instead of a blocking answer."""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '').lower()
+
+def async_job_response(job):
+    """Reply to an async submission with the job and where to poll it."""
+    status_url = f"/api/jobs/{job.id}"
+    return jsonify({**job.to_dict(), 'status_url': status_url}), 200 if job.done else 202, {'Location': status_url}
+
 def initialize_snowflake():
-    """Initialize Snowflake connection on startup."""
+    """Initialize Snowflake connection on startup.
+    
+    Every workload pool is connected and kept alive, in parallel, so the
+    first chat or bulk request does not pay for a login either. With
+    SNOWFLAKE_POOL_PREWARM=N (or SNOWFLAKE_POOL_PREWARM_<WORKLOAD>), N
+    sessions per pool are opened before the server accepts traffic.
+    """
+    started = time.perf_counter()
     logger.info("Initializing Snowflake connection...")
-    if not cortex_ai.connect():
+    
+    def connect_workload(name):
+        set_workload(name)
+        phase_started = time.perf_counter()
+        if not cortex_ai.connect():
+            return False
+        prewarm = int(os.getenv(f'SNOWFLAKE_POOL_PREWARM_{name.upper()}', os.getenv('SNOWFLAKE_POOL_PREWARM', '0')))
+        if prewarm:
+            opened = cortex_ai.pool.prewarm(prewarm)
+            logger.info(f"Pre-warmed {opened} {name} Snowflake connections")
+        STARTUP_SECONDS[f'pool_{name}'] = time.perf_counter() - phase_started
+        return True
+    
+    with ThreadPoolExecutor(max_workers=len(cortex_ai.workloads), thread_name_prefix='snowflake-init') as executor:
+        # Each pool connects in its own context so the workload selection does not leak into the executor
+        futures = [executor.submit(contextvars.copy_context().run, connect_workload, name)
+                   for name in cortex_ai.workloads]
+        connected = [future.result() for future in futures]
+    if not all(connected):
         logger.error("Failed to initialize Snowflake connection")
         return False
-    logger.info("Snowflake connection initialized successfully")
+    STARTUP_SECONDS['connect'] = time.perf_counter() - started
+    logger.info(f"Snowflake connection initialized successfully in {STARTUP_SECONDS['connect']:.2f}s")
+    
+    if cortex_ai.prescreen:
+        phase_started = time.perf_counter()
+        try:
+            cortex_ai.warm_prescreen()
+        except Exception as e:
+            logger.warning(f"Could not warm fraud pre-screen from transactions table: {e}")
+        STARTUP_SECONDS['prescreen'] = time.perf_counter() - phase_started
+    
+    cortex_ai.start_news_scoring(cortex_ai.news_scoring_interval)
+    
+    STARTUP_SECONDS['total'] = time.perf_counter() - started
+    logger.info(f"Snowflake initialization finished in {STARTUP_SECONDS['total']:.2f}s")
     return True
 
 # API Routes
@@ -337,32 +2156,235 @@ def initialize_snowflake():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    breaker = cortex_ai.breaker.stats()
+    return jsonify({
+        'status': 'healthy' if breaker['state'] == 'closed' else 'degraded',
+        'timestamp': datetime.now().isoformat(),
+        'snowflake_circuit': breaker,
+        'pool': cortex_ai.pool.stats(),
+        'workloads': cortex_ai.workload_stats(),
+        'admission': admission.stats(),
+        'traffic_capture': traffic_capture.stats() if traffic_capture else None,
+        'startup_seconds': {phase: round(seconds, 3) for phase, seconds in STARTUP_SECONDS.items()}
+    })
 
 @app.route('/api/fraud/analyze', methods=['POST'])
 def analyze_fraud():
     """Analyze transaction for fraud indicators."""
     try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
         if not cortex_ai.ensure_connection():
             return jsonify({'error': 'Database connection failed'}), 500
         
         transaction_data = request.get_json()
-        result = cortex_ai.analyze_fraud(transaction_data)
+        if wants_async():
+            return async_job_response(cortex_ai.submit_analysis('fraud', transaction_data, use_cache=use_response_cache(), tier=tier))
+        
+        result = cortex_ai.analyze_fraud(transaction_data, use_cache=use_response_cache(), tier=tier,
+                                         deadline=request_deadline('fraud'))
+        return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/fraud/analyze/batch', methods=['POST'])
+def analyze_fraud_batch():
+    """Analyze a list of transactions for fraud indicators."""
+    try:
+        data = request.get_json()
+        transactions = data.get('transactions') if isinstance(data, dict) else data
+        
+        if not isinstance(transactions, list) or not transactions:
+            return jsonify({'error': 'Expected a non-empty list of transactions'}), 400
+        if len(transactions) > FRAUD_BATCH_MAX_SIZE:
+            return jsonify({'error': f'Batch exceeds maximum of {FRAUD_BATCH_MAX_SIZE} transactions'}), 400
+        
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        result = cortex_ai.analyze_fraud_batch(transactions, use_cache=use_response_cache(), tier=tier,
+                                               deadline=request_deadline('fraud_batch'))
         return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/fraud/bulk-score', methods=['POST'])
+def start_bulk_fraud_scoring():
+    """Start an in-warehouse fraud scoring job over the transactions table."""
+    try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        data = request.get_json(silent=True) or {}
+        query_id = cortex_ai.start_bulk_fraud_scoring(rescore=bool(data.get('rescore', False)), tier=tier)
+        return jsonify({'query_id': query_id, 'status': 'submitted'}), 202
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/fraud/bulk-score/<query_id>', methods=['GET'])
+def bulk_fraud_scoring_status(query_id):
+    """Report the status of a bulk fraud scoring job."""
+    try:
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        return jsonify(cortex_ai.bulk_fraud_scoring_status(query_id))
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/fraud/scores', methods=['GET'])
+def stream_fraud_scores():
+    """Stream stored fraud scores as gzip-compressed NDJSON, one flush per page."""
+    try:
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    
+    page_size = min(max(request.args.get('page_size', 1000, type=int), 1), 10000)
+    since = request.args.get('since')
+    
+    def generate():
+        compressor = zlib.compressobj(wbits=31)  # wbits=31 emits a gzip container
+        for page in cortex_ai.iter_fraud_scores(page_size=page_size, since=since):
+            lines = ''.join(json.dumps(row, default=str) + '\n' for row in page)
+            yield compressor.compress(lines.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Encoding': 'gzip'}
+    )
+
 @app.route('/api/market/sentiment', methods=['POST'])
 def market_sentiment():
     """Analyze market sentiment from news."""
     try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
         if not cortex_ai.ensure_connection():
             return jsonify({'error': 'Database connection failed'}), 500
         
         data = request.get_json()
         news_text = data.get('text', '')
-        result = cortex_ai.analyze_market_sentiment(news_text)
+        if wants_async():
+            return async_job_response(cortex_ai.submit_analysis('sentiment', news_text, use_cache=use_response_cache(), tier=tier))
+        
+        result = cortex_ai.analyze_market_sentiment(news_text, use_cache=use_response_cache(), tier=tier,
+                                                    deadline=request_deadline('sentiment'))
         return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/market/sentiment/sectors', methods=['GET'])
+def sector_sentiment():
+    """Sentiment per sector and time bucket (count, mean, min, max) from one Snowflake query.
+    
+    Query parameters: ``sector`` (repeatable), ``bucket`` (``15m``, ``1h``,
+    ``1d``, ``1w``), and either ``hours`` or ``since``/``until`` timestamps.
+    """
+    try:
+        sectors = [sector for value in request.args.getlist('sector') for sector in value.split(',') if sector]
+        bucket = request.args.get('bucket', '1h')
+        hours = request.args.get('hours', 24, type=int)
+        try:
+            cortex_ai.parse_sentiment_bucket(bucket)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= hours <= SECTOR_SENTIMENT_MAX_HOURS:
+            return jsonify({'error': f'hours must be between 1 and {SECTOR_SENTIMENT_MAX_HOURS}'}), 400
+        
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        result = cortex_ai.sector_sentiment(
+            sectors=sectors or None,
+            bucket=bucket,
+            hours=hours,
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            use_cache=use_response_cache(),
+            deadline=request_deadline('sector_sentiment'),
+        )
+        return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/market/news/score', methods=['POST'])
+def score_market_news():
+    """Score new and changed market_news rows and store the results in the table."""
+    try:
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        data = request.get_json(silent=True) or {}
+        return jsonify(cortex_ai.score_market_news(rescore=bool(data.get('rescore', False))))
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/market/news/<news_id>/sentiment', methods=['GET'])
+def news_sentiment(news_id):
+    """Serve the stored sentiment score for one article."""
+    try:
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        result = cortex_ai.get_news_sentiment(news_id)
+        if result is None:
+            return jsonify({'error': f'News item {news_id} not found'}), 404
+        return jsonify(result)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/market/news/sentiment', methods=['GET'])
+def list_news_sentiment():
+    """Serve stored sentiment scores, newest first, optionally filtered by ``sector``."""
+    try:
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        limit = min(max(request.args.get('limit', 100, type=int), 1), NEWS_SENTIMENT_MAX_LIMIT)
+        results = cortex_ai.list_news_sentiment(sector=request.args.get('sector'), limit=limit)
+        return jsonify({'results': results, 'count': len(results)})
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -370,30 +2392,242 @@ def market_sentiment():
 def assess_risk():
     """Assess customer credit risk."""
     try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
         if not cortex_ai.ensure_connection():
             return jsonify({'error': 'Database connection failed'}), 500
         
         customer_data = request.get_json()
-        result = cortex_ai.assess_credit_risk(customer_data)
+        if wants_async():
+            return async_job_response(cortex_ai.submit_analysis('risk', customer_data, use_cache=use_response_cache(), tier=tier))
+        
+        result = cortex_ai.assess_credit_risk(customer_data, use_cache=use_response_cache(), tier=tier,
+                                              deadline=request_deadline('risk'))
+        return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/risk/assess/<customer_id>', methods=['GET'])
+def assess_customer_risk(customer_id):
+    """Assess credit risk for a customer whose profile is stored in Snowflake."""
+    try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        result = cortex_ai.assess_customer_risk(customer_id, use_cache=use_response_cache(), tier=tier,
+                                                deadline=request_deadline('risk'))
+        if result is None:
+            return jsonify({'error': f'Customer {customer_id} not found'}), 404
         return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/risk/portfolio', methods=['POST'])
+def assess_portfolio():
+    """Assess a list of customer IDs, or every customer matching a filter, in bulk.
+    
+    Body: ``{"customer_ids": [...]}`` or ``{"filter": {...}, "limit": N}``
+    where the filter keys are listed in PORTFOLIO_FILTERS.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        customer_ids = data.get('customer_ids')
+        filters = data.get('filter') or {}
+        limit = data.get('limit', RISK_PORTFOLIO_MAX_SIZE)
+        
+        if customer_ids is not None:
+            if not isinstance(customer_ids, list) or not customer_ids:
+                return jsonify({'error': 'customer_ids must be a non-empty list'}), 400
+            customer_ids = list(dict.fromkeys(str(customer_id) for customer_id in customer_ids))
+            if len(customer_ids) > RISK_PORTFOLIO_MAX_SIZE:
+                return jsonify({'error': f'Portfolio exceeds maximum of {RISK_PORTFOLIO_MAX_SIZE} customers'}), 400
+        elif not isinstance(filters, dict) or set(filters) - set(PORTFOLIO_FILTERS):
+            return jsonify({'error': f"filter keys must be among: {', '.join(PORTFOLIO_FILTERS)}"}), 400
+        if not isinstance(limit, int) or not 1 <= limit <= RISK_PORTFOLIO_MAX_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {RISK_PORTFOLIO_MAX_SIZE}'}), 400
+        
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
+        if not cortex_ai.ensure_connection():
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        result = cortex_ai.assess_portfolio(customer_ids=customer_ids, filters=filters, limit=limit,
+                                            use_cache=use_response_cache(), tier=tier,
+                                            deadline=request_deadline('risk_portfolio'))
+        return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message."""
+    message = f"event: {event}\n" if event else ''
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def wants_event_stream():
+    """Return True if the client negotiated SSE via the Accept header."""
+    best = request.accept_mimetypes.best_match(['application/json', 'text/event-stream'])
+    return best == 'text/event-stream'
+
 @app.route('/api/chat/financial', methods=['POST'])
 def financial_chat():
-    """AI-powered financial assistant."""
+    """AI-powered financial assistant.
+    
+    Clients sending ``Accept: text/event-stream`` receive the answer as SSE
+    ``data`` chunks followed by a ``done`` event.
+    """
     try:
+        tier = requested_tier()
+        if invalid_tier_response(tier):
+            return invalid_tier_response(tier)
+        
         if not cortex_ai.ensure_connection():
             return jsonify({'error': 'Database connection failed'}), 500
         
         data = request.get_json()
         question = data.get('question', '')
         context = data.get('context', '')
-        result = cortex_ai.financial_chat(question, context)
+        session = None
+        if data.get('session_id'):
+            session = cortex_ai.sessions.get(data['session_id'])
+            if session is None:
+                return jsonify({'error': 'Chat session not found or expired'}), 404
+        
+        if wants_event_stream():
+            chunks = cortex_ai.stream_financial_chat(question, context, use_cache=use_response_cache(), tier=tier,
+                                                     deadline=request_deadline('chat'), session=session)
+            
+            def generate():
+                try:
+                    for chunk in chunks:
+                        yield sse_event({'delta': chunk})
+                    yield sse_event({'session_id': session.id} if session else {}, event='done')
+                except Exception as e:
+                    logger.error(f"Financial chat stream error: {e}")
+                    yield sse_event({'error': str(e)}, event='error')
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        result = cortex_ai.financial_chat(question, context, use_cache=use_response_cache(), tier=tier,
+                                          deadline=request_deadline('chat'), session=session)
+        if session is not None and 'error' not in result:
+            result = {**result, 'session_id': session.id}
         return jsonify(result)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/sessions', methods=['POST'])
+def create_chat_session():
+    """Start a server-side conversation; pass the returned ``session_id`` to /api/chat/financial."""
+    session = cortex_ai.sessions.create()
+    return jsonify(session.to_dict()), 201
+
+@app.route('/api/chat/sessions', methods=['GET'])
+def chat_session_stats():
+    """Session store occupancy, evictions and compactions."""
+    return jsonify(cortex_ai.sessions.stats())
+
+@app.route('/api/chat/sessions/<session_id>', methods=['GET'])
+def get_chat_session(session_id):
+    """Size and compaction state of one conversation."""
+    session = cortex_ai.sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Chat session not found or expired'}), 404
+    return jsonify(session.to_dict())
+
+@app.route('/api/chat/sessions/<session_id>', methods=['DELETE'])
+def delete_chat_session(session_id):
+    """End a conversation and free its history."""
+    if not cortex_ai.sessions.delete(session_id):
+        return jsonify({'error': 'Chat session not found or expired'}), 404
+    return '', 204
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and result of an async analysis; ``?wait=N`` long-polls up to N seconds."""
+    try:
+        job = cortex_ai.jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        wait = min(max(request.args.get('wait', 0, type=float), 0), ASYNC_JOB_MAX_WAIT)
+        deadline = time.monotonic() + wait
+        delay = 0.1
+        
+        while True:
+            cortex_ai.refresh_job(job)
+            remaining = deadline - time.monotonic()
+            if job.done or remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+        
+        return jsonify(job.to_dict())
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/fraud/prescreen/stats', methods=['GET'])
+def prescreen_stats():
+    """Fraud pre-screen fast-path and escalation rates."""
+    if not cortex_ai.prescreen:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cortex_ai.prescreen.stats()})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Response cache hit/miss counters and request coalescing stats."""
+    return jsonify({**cortex_ai.cache.stats(), 'coalescing': cortex_ai.single_flight.stats(),
+                    'semantic': cortex_ai.semantic_cache.stats()})
+
+@app.route('/api/debug/slow-queries', methods=['GET'])
+def slow_queries():
+    """Recent statements slower than SLOW_QUERY_THRESHOLD, newest first, with their Snowflake query IDs."""
+    entries = cortex_ai.slow_queries.entries(
+        limit=request.args.get('limit', type=int),
+        endpoint=request.args.get('endpoint'),
+        trace_id=request.args.get('trace_id'),
+    )
+    return jsonify({**cortex_ai.slow_queries.stats(), 'queries': entries})
+
+@app.route('/api/models', methods=['GET'])
+def model_routing():
+    """Model tiers, per-endpoint routing defaults and latency-budget fallback counts."""
+    return jsonify(cortex_ai.router.stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/demo/sample-data', methods=['GET'])
 def get_sample_data():
     """Get sample data for demo purposes."""
@@ -441,9 +2675,11 @@ def get_sample_data():
 if __name__ == '__main__':
     # Initialize Snowflake connection before starting the app
     logger.info("Starting FinAI Backend Server...")
+    # Interactive, so a browser login is acceptable when no key or password is configured
+    cortex_ai.interactive_auth = os.getenv('SNOWFLAKE_INTERACTIVE_AUTH', 'true').lower() == 'true'
     
     if initialize_snowflake():
-        logger.info("🚀 Starting Flask server on http://localhost:5000")
+        logger.info("🚀 Starting Flask development server on http://localhost:5000 (use serve.py in production)")
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
         logger.error("❌ Failed to initialize Snowflake connection. Please check your credentials.")
@@ -0,0 +1,91 @@
+"""
+Asynchronous Cortex job tracking for the FinAI backend.
+Analyses are submitted with execute_async and polled by job ID instead of holding a worker thread.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class AsyncJob:
+    """A Cortex analysis submitted to Snowflake without waiting for the result."""
+
+    def __init__(self, endpoint, query_id=None, cache_key=None, transaction=None):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.query_id = query_id
+        self.cache_key = cache_key
+        self.transaction = transaction  # fraud jobs: recorded by the pre-screen once scored
+        self.status = 'running'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.completed_at = None
+
+    @property
+    def done(self):
+        return self.status != 'running'
+
+    def succeed(self, result):
+        self.result = result
+        self.status = 'succeeded'
+        self.completed_at = time.time()
+
+    def fail(self, error):
+        self.error = str(error)
+        self.status = 'failed'
+        self.completed_at = time.time()
+
+    def to_dict(self):
+        job = {
+            'job_id': self.id,
+            'endpoint': self.endpoint,
+            'status': self.status,
+            'query_id': self.query_id,
+            'submitted_at': self.submitted_at,
+            'completed_at': self.completed_at,
+        }
+        if self.status == 'succeeded':
+            job['result'] = self.result
+        elif self.status == 'failed':
+            job['error'] = self.error
+        return job
+
+
+class AsyncJobStore:
+    """Bounded in-memory registry of jobs, oldest evicted first.
+
+    Finished jobs are kept for ``ttl`` seconds so clients can collect them.
+    """
+
+    def __init__(self, max_jobs=10000, ttl=3600):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._expire_locked()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if not job.done)
+            return {'jobs': len(self._jobs), 'running': running, 'max_jobs': self.max_jobs}
+
+    def _expire_locked(self):
+        now = time.time()
+        while self._jobs:
+            oldest = next(iter(self._jobs.values()))
+            expired = oldest.done and now - oldest.completed_at > self.ttl
+            if len(self._jobs) <= self.max_jobs and not expired:
+                break
+            self._jobs.popitem(last=False)
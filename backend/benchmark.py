@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness for the FinAI backend.
+Drives the /api/* routes against the fake Snowflake connector and reports latency percentiles, throughput and errors.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import fake_snowflake
+from fake_snowflake import LatencyModel
+
+logger = logging.getLogger(__name__)
+
+# Only used to satisfy SnowflakeCortexAI._connection_params; the fake ignores them
+FAKE_CONNECTION_ENV = {
+    'SNOWFLAKE_ACCOUNT': 'benchmark',
+    'SNOWFLAKE_USER': 'benchmark',
+    'SNOWFLAKE_PASSWORD': 'benchmark',
+}
+
+LOCATIONS = ['New York, NY', 'Miami, FL', 'Los Angeles, CA', 'Chicago, IL', 'Lagos, NG']
+MERCHANTS = ['Amazon', 'Whole Foods', 'Shell', 'Best Buy', 'Unknown Merchant']
+HEADLINES = [
+    'Federal Reserve holds rates steady as inflation cools',
+    'Tech earnings beat expectations on strong cloud growth',
+    'Oil prices slide after surprise inventory build',
+    'Regional bank shares fall on commercial real estate worries',
+    'Retail sales rise for a third straight month',
+]
+QUESTIONS = [
+    'How should I start investing with $1,000?',
+    'Should I pay off my student loans or invest?',
+    'What is a good emergency fund size?',
+    'How do index funds work?',
+    'Is now a good time to refinance my mortgage?',
+]
+
+# Rewordings of the same questions, as users actually type them
+PARAPHRASES = [
+    ['Should I pay off my debt or invest?', 'should i pay off debt or invest', 'Pay off debt, or invest?'],
+    ['How do index funds work?', 'how does an index fund work', 'How do index funds actually work?'],
+    ['What is a good emergency fund size?', 'Good emergency fund size?', 'what is a good size for an emergency fund'],
+]
+
+
+def transaction(variant):
+    return {
+        'id': f'BENCH{variant:05d}',
+        'customer_id': f'CUST{variant % 50:03d}',
+        'amount': round(25 + (variant * 137) % 7500, 2),
+        'merchant': MERCHANTS[variant % len(MERCHANTS)],
+        'location': LOCATIONS[variant % len(LOCATIONS)],
+        'timestamp': f'2024-01-{1 + variant % 28:02d}T{variant % 24:02d}:15:00',
+        'card_type': 'Credit',
+    }
+
+
+def customer(variant):
+    return {
+        'customer_id': f'CUST{variant % 50:03d}',
+        'income': 30000 + (variant * 1733) % 170000,
+        'credit_history': 1 + variant % 25,
+        'debt_ratio': (variant * 7) % 60,
+        'employment': 'Full-time',
+        'defaults': variant % 3,
+        'utilization': (variant * 11) % 90,
+    }
+
+
+def news(variant):
+    return f"{HEADLINES[variant % len(HEADLINES)]} (update {variant})"
+
+
+def question(variant):
+    return f"{QUESTIONS[variant % len(QUESTIONS)]} (#{variant})"
+
+
+def paraphrase(variant):
+    group = PARAPHRASES[variant % len(PARAPHRASES)]
+    return group[(variant // len(PARAPHRASES)) % len(group)]
+
+
+# Each scenario is (route, call) where call(client, variant, state) returns a response.
+# ``route`` is the Flask rule the scenario exercises, so results line up with /api/metrics.
+SCENARIOS = {
+    'health': ('/api/health', lambda client, v, state: client.get('/api/health')),
+    'fraud': ('/api/fraud/analyze', lambda client, v, state: client.post(
+        '/api/fraud/analyze', json=transaction(v), headers=state['headers'])),
+    'fraud_batch': ('/api/fraud/analyze/batch', lambda client, v, state: client.post(
+        '/api/fraud/analyze/batch', json={'transactions': [transaction(v * 10 + i) for i in range(10)]},
+        headers=state['headers'])),
+    'fraud_bulk_score': ('/api/fraud/bulk-score', lambda client, v, state: client.post(
+        '/api/fraud/bulk-score', json={})),
+    'fraud_bulk_status': ('/api/fraud/bulk-score/<query_id>', lambda client, v, state: client.get(
+        f"/api/fraud/bulk-score/{state['bulk_query_id']}")),
+    'fraud_scores': ('/api/fraud/scores', lambda client, v, state: client.get('/api/fraud/scores')),
+    'sentiment': ('/api/market/sentiment', lambda client, v, state: client.post(
+        '/api/market/sentiment', json={'text': news(v)}, headers=state['headers'])),
+    'news_sentiment': ('/api/market/news/<news_id>/sentiment', lambda client, v, state: client.get(
+        f"/api/market/news/NEWS{v % 3 + 1:03d}/sentiment")),
+    'sector_sentiment': ('/api/market/sentiment/sectors', lambda client, v, state: client.get(
+        '/api/market/sentiment/sectors?bucket=1h&hours=24', headers=state['headers'])),
+    'risk': ('/api/risk/assess', lambda client, v, state: client.post(
+        '/api/risk/assess', json=customer(v), headers=state['headers'])),
+    'risk_lookup': ('/api/risk/assess/<customer_id>', lambda client, v, state: client.get(
+        f"/api/risk/assess/CUST{v % 3 + 1:03d}", headers=state['headers'])),
+    'risk_portfolio': ('/api/risk/portfolio', lambda client, v, state: client.post(
+        '/api/risk/portfolio', json={'customer_ids': ['CUST001', 'CUST002', 'CUST003']}, headers=state['headers'])),
+    'chat': ('/api/chat/financial', lambda client, v, state: client.post(
+        '/api/chat/financial', json={'question': question(v)}, headers=state['headers'])),
+    'chat_paraphrase': ('/api/chat/financial', lambda client, v, state: client.post(
+        '/api/chat/financial', json={'question': paraphrase(v)}, headers=state['headers'])),
+    'chat_session': ('/api/chat/financial', lambda client, v, state: client.post(
+        '/api/chat/financial', json={'question': question(v), 'session_id': state['chat_sessions'][v % 8]},
+        headers=state['headers'])),
+    'chat_stream': ('/api/chat/financial', lambda client, v, state: client.post(
+        '/api/chat/financial', json={'question': question(v)},
+        headers={**state['headers'], 'Accept': 'text/event-stream'})),
+    'jobs': ('/api/jobs/<job_id>', lambda client, v, state: poll_job(client, v, state)),
+    'prescreen_stats': ('/api/fraud/prescreen/stats', lambda client, v, state: client.get(
+        '/api/fraud/prescreen/stats')),
+    'cache_stats': ('/api/cache/stats', lambda client, v, state: client.get('/api/cache/stats')),
+    'metrics': ('/api/metrics', lambda client, v, state: client.get('/api/metrics')),
+    'sample_data': ('/api/demo/sample-data', lambda client, v, state: client.get('/api/demo/sample-data')),
+}
+
+
+def poll_job(client, variant, state):
+    """Submit a sentiment analysis in async mode and long-poll its job until it finishes."""
+    submitted = client.post('/api/market/sentiment?async=true', json={'text': news(variant)},
+                            headers=state['headers'])
+    if submitted.status_code not in (200, 202):
+        return submitted
+    return client.get(f"{submitted.get_json()['status_url']}?wait=30")
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, errors, elapsed):
+    """Return count, error rate, throughput and latency percentiles (ms) for one group."""
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1] if ordered else None),
+        'mean_ms': ms(sum(ordered) / count if count else None),
+    }
+
+
+@contextmanager
+def fake_snowflake_backend(cortex_ai):
+    """Point ``cortex_ai`` at the fake connector with a fresh pool and empty cache.
+
+    The original connector, pool and environment are restored on exit, so
+    the benchmark can run inside the test suite or next to a live app.
+    """
+    from connection_pool import SnowflakeConnectionPool
+
+    saved_env = {name: os.environ.get(name) for name in FAKE_CONNECTION_ENV}
+    for name, value in FAKE_CONNECTION_ENV.items():
+        os.environ.setdefault(name, value)
+    # Keep a real key path from winning over the fake password
+    saved_key_path = os.environ.pop('SNOWFLAKE_PRIVATE_KEY_PATH', None)
+
+    original_connector = cortex_ai.connector
+    original_pools = {name: workload.pool for name, workload in cortex_ai.workloads.items()}
+    cortex_ai.connector = fake_snowflake
+    for workload in cortex_ai.workloads.values():
+        original_pool = workload.pool
+        workload.pool = SnowflakeConnectionPool(
+            functools.partial(cortex_ai._open_connection, workload.warehouse),
+            min_size=original_pool.min_size,
+            max_size=original_pool.max_size,
+            idle_timeout=original_pool.idle_timeout,
+            checkout_timeout=original_pool.checkout_timeout,
+            liveness_ttl=original_pool.liveness_ttl,
+            probe=cortex_ai._probe_connection,
+        )
+    cortex_ai.cache.clear()
+    cortex_ai.semantic_cache.clear()
+    try:
+        yield cortex_ai
+    finally:
+        for name, workload in cortex_ai.workloads.items():
+            workload.pool.close()
+            workload.pool = original_pools[name]
+        cortex_ai.connector = original_connector
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        if saved_key_path is not None:
+            os.environ['SNOWFLAKE_PRIVATE_KEY_PATH'] = saved_key_path
+
+
+def run_benchmark(scenarios=None, concurrency=8, requests=200, distinct_payloads=50, bypass_cache=False,
+                  tier=None, label=None):
+    """Drive the selected scenarios round-robin at ``concurrency`` and return the results.
+
+    The fake connector is configured separately with ``fake_snowflake.configure``.
+    """
+    from app import app, cortex_ai
+
+    scenarios = scenarios or list(SCENARIOS)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(unknown)}")
+
+    samples = {name: [] for name in scenarios}  # name -> [(seconds, ok)]
+    samples_lock = threading.Lock()
+    local = threading.local()
+    state = {'headers': {}}
+    if bypass_cache:
+        state['headers']['X-Cache-Bypass'] = 'true'
+    if tier:
+        state['headers']['X-Model-Tier'] = tier
+
+    with fake_snowflake_backend(cortex_ai):
+        connect_started = time.perf_counter()
+        if not cortex_ai.connect():
+            raise RuntimeError("Could not connect the fake Snowflake backend")
+        connect_seconds = time.perf_counter() - connect_started
+
+        if 'fraud_bulk_status' in scenarios:
+            state['bulk_query_id'] = cortex_ai.start_bulk_fraud_scoring()
+        if 'chat_session' in scenarios:
+            state['chat_sessions'] = [cortex_ai.sessions.create().id for _ in range(8)]
+
+        def issue(index):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = app.test_client()
+
+            name = scenarios[index % len(scenarios)]
+            variant = (index // len(scenarios)) % distinct_payloads
+            started = time.perf_counter()
+            try:
+                response = SCENARIOS[name][1](client, variant, state)
+                response.get_data()  # drain streamed bodies so their full duration is counted
+                # Several routes report failures as a 200 with an ``error`` field
+                body = response.get_json(silent=True) if response.is_json else None
+                ok = response.status_code < 400 and not (isinstance(body, dict) and 'error' in body)
+            except Exception as e:
+                logger.warning(f"Benchmark request to {name} failed: {e}")
+                ok = False
+            elapsed = time.perf_counter() - started
+
+            with samples_lock:
+                samples[name].append((elapsed, ok))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as executor:
+            list(executor.map(issue, range(requests)))
+        wall_seconds = time.perf_counter() - started
+
+        pool_stats = cortex_ai.pool.stats()
+        workload_stats = cortex_ai.workload_stats()
+        cache_stats = cortex_ai.cache.stats()
+        coalescing_stats = cortex_ai.single_flight.stats()
+        model_stats = cortex_ai.router.stats()
+
+    routes = {}
+    for name, results in samples.items():
+        route_summary = summarize([seconds for seconds, _ in results],
+                                  sum(1 for _, ok in results if not ok), wall_seconds)
+        routes[name] = {'route': SCENARIOS[name][0], **route_summary}
+
+    all_results = [result for results in samples.values() for result in results]
+    return {
+        'label': label,
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'scenarios': scenarios,
+            'concurrency': concurrency,
+            'requests': requests,
+            'distinct_payloads': distinct_payloads,
+            'bypass_cache': bypass_cache,
+            'tier': tier,
+            'fake_snowflake': fake_snowflake.config.to_dict(),
+        },
+        'wall_seconds': round(wall_seconds, 3),
+        'connect_seconds': round(connect_seconds, 3),
+        'overall': summarize([seconds for seconds, _ in all_results],
+                             sum(1 for _, ok in all_results if not ok), wall_seconds),
+        'routes': routes,
+        'pool': pool_stats,
+        'workloads': workload_stats,
+        'cache': cache_stats,
+        'coalescing': coalescing_stats,
+        'models': model_stats,
+    }
+
+
+def print_report(results):
+    """Print a per-route latency table."""
+    header = f"{'scenario':<18}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    rows = list(results['routes'].items()) + [('overall', results['overall'])]
+    for name, summary in rows:
+        print(f"{name:<18}{summary['requests']:>9}{summary['errors']:>8}{summary['rps']:>9}"
+              f"{summary['p50_ms'] or 0:>10}{summary['p95_ms'] or 0:>10}{summary['p99_ms'] or 0:>10}")
+    header = f"{'workload':<18}{'queries':>9}{'errors':>8}{'wait p95':>10}{'p50 ms':>10}{'p95 ms':>10}"
+    print(f"\n{header}")
+    print('-' * len(header))
+    for name, workload in results.get('workloads', {}).items():
+        print(f"{name:<18}{workload['queries']:>9}{workload['errors']:>8}{workload['checkout_p95_ms']:>10}"
+              f"{workload['latency_p50_ms']:>10}{workload['latency_p95_ms']:>10}")
+    print(f"\nWall time {results['wall_seconds']}s at concurrency {results['config']['concurrency']}, "
+          f"error rate {results['overall']['error_rate']:.2%}")
+
+
+def latency_model(args, median):
+    return LatencyModel(kind=args.latency_dist, median=median, sigma=args.latency_sigma,
+                        spread=args.latency_spread * median)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FinAI backend against a simulated Snowflake.')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=200, help='total requests to send')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--distinct-payloads', type=int, default=50,
+                        help='distinct payloads per scenario; lower values raise the cache hit rate')
+    parser.add_argument('--bypass-cache', action='store_true', help='send X-Cache-Bypass on every request')
+    parser.add_argument('--latency-dist', choices=['lognormal', 'uniform', 'constant'], default='lognormal')
+    parser.add_argument('--latency-sigma', type=float, default=0.4, help='lognormal shape parameter')
+    parser.add_argument('--latency-spread', type=float, default=0.5,
+                        help='uniform half-width as a fraction of the median')
+    parser.add_argument('--cortex-latency', type=float, default=0.8, help='median Cortex call latency (s)')
+    parser.add_argument('--query-latency', type=float, default=0.02, help='median non-Cortex query latency (s)')
+    parser.add_argument('--connect-latency', type=float, default=0.3, help='login latency (s)')
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SECONDS',
+                        help='median latency for one Cortex model, e.g. mistral-7b=0.3 (repeatable)')
+    parser.add_argument('--tier', default=None, help='model tier to request on every call (fast or accurate)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of statements that fail')
+    parser.add_argument('--sentiment-score', type=float, default=None, help='canned SENTIMENT value')
+    parser.add_argument('--complete-outputs', default=None,
+                        help='JSON file mapping fraud_analysis/risk_assessment/market_analysis/chat_response '
+                             'to canned COMPLETE text')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for latencies and errors')
+    parser.add_argument('--label', default=None, help='name recorded with the results')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    complete_outputs = None
+    if args.complete_outputs:
+        with open(args.complete_outputs) as f:
+            complete_outputs = json.load(f)
+
+    fake_snowflake.configure(
+        cortex_latency=latency_model(args, args.cortex_latency),
+        query_latency=latency_model(args, args.query_latency),
+        connect_latency=LatencyModel(kind='constant', median=args.connect_latency),
+        model_latency={model: latency_model(args, float(seconds))
+                       for model, seconds in (entry.split('=', 1) for entry in args.model_latency)},
+        error_rate=args.error_rate,
+        complete_outputs=complete_outputs,
+        sentiment_score=args.sentiment_score,
+        seed=args.seed,
+    )
+
+    results = run_benchmark(
+        scenarios=[name.strip() for name in args.scenarios.split(',') if name.strip()],
+        concurrency=args.concurrency,
+        requests=args.requests,
+        distinct_payloads=args.distinct_payloads,
+        bypass_cache=args.bypass_cache,
+        tier=args.tier,
+        label=args.label,
+    )
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Server-side chat sessions for the FinAI backend.
+Keeps each conversation's history within a token budget by folding older turns into a running summary.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return (len(text or '') + 3) // 4
+
+
+class ChatSession:
+    """One conversation: a summary of compacted turns plus the recent turns verbatim."""
+
+    def __init__(self, session_id=None):
+        self.id = session_id or uuid.uuid4().hex
+        self.summary = ''
+        self.turns = []  # [(question, answer)], oldest first
+        self.compactions = 0
+        self.compacting = False
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def tokens(self):
+        """Estimated tokens of the summary plus every stored turn."""
+        with self.lock:
+            return estimate_tokens(self.summary) + sum(_turn_tokens(turn) for turn in self.turns)
+
+    def add_turn(self, question, answer):
+        with self.lock:
+            self.turns.append((question, answer))
+
+    def history(self, budget):
+        """Render the conversation so far for a prompt, never exceeding ``budget`` tokens.
+
+        The newest turns are kept first; the summary is included when it
+        fits. Older turns that have not been compacted yet are dropped here
+        rather than letting the prompt grow.
+        """
+        with self.lock:
+            summary, turns = self.summary, list(self.turns)
+
+        lines, used = [], 0
+        for question, answer in reversed(turns):
+            line = f"User: {question}\nAssistant: {answer}"
+            cost = estimate_tokens(line + '\n\n')
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        lines.reverse()
+
+        if summary:
+            line = f"Summary of earlier conversation: {summary}"
+            if used + estimate_tokens(line + '\n\n') <= budget:
+                lines.insert(0, line)
+        return '\n\n'.join(lines)
+
+    def to_dict(self):
+        with self.lock:
+            turns, has_summary, compactions = len(self.turns), bool(self.summary), self.compactions
+        return {
+            'session_id': self.id,
+            'turns': turns,
+            'tokens': self.tokens(),
+            'has_summary': has_summary,
+            'compactions': compactions,
+            'created_at': self.created_at,
+        }
+
+
+def _turn_tokens(turn):
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+
+class ChatSessionStore:
+    """Bounded, LRU-evicted registry of chat sessions.
+
+    At most ``max_sessions`` sessions are kept and sessions idle for ``ttl``
+    seconds expire. Once a session's history exceeds ``token_budget``, all
+    but the last ``keep_turns`` turns are handed to ``summarizer(summary,
+    turns)`` on a background thread and replaced by the summary it returns,
+    so compaction never adds latency to a chat turn.
+    """
+
+    def __init__(self, summarizer=None, max_sessions=10000, ttl=3600, token_budget=2000, keep_turns=4,
+                 compaction_workers=2):
+        self.summarizer = summarizer
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(compaction_workers, 1),
+                                            thread_name_prefix='chat-compaction')
+        self._evictions = 0
+        self._compactions = 0
+        self._compaction_failures = 0
+
+    def create(self):
+        session = ChatSession()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._expire_locked()
+        return session
+
+    def get(self, session_id):
+        """Return the live session and mark it most recently used, or None."""
+        with self._lock:
+            self._expire_locked()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def record_turn(self, session, question, answer):
+        """Append a finished turn and compact in the background if over budget."""
+        session.add_turn(question, answer)
+        if session.tokens() <= self.token_budget or self.summarizer is None:
+            return
+        with session.lock:
+            if session.compacting or len(session.turns) <= self.keep_turns:
+                return
+            session.compacting = True
+        self._executor.submit(self.compact, session)
+
+    def compact(self, session):
+        """Fold the older turns of ``session`` into its summary."""
+        try:
+            with session.lock:
+                old = session.turns[:-self.keep_turns] if self.keep_turns else list(session.turns)
+                summary = session.summary
+            if not old:
+                return
+
+            try:
+                new_summary = self.summarizer(summary, old)
+            except Exception as e:
+                # Old turns are outside the prompt budget anyway; drop them to bound memory
+                logger.warning(f"Chat session {session.id} summary failed, dropping {len(old)} old turns: {e}")
+                new_summary = summary
+                with self._lock:
+                    self._compaction_failures += 1
+
+            with session.lock:
+                # New turns may have been appended meanwhile; the compacted ones are still the prefix
+                session.turns = session.turns[len(old):]
+                session.summary = new_summary or summary
+                session.compactions += 1
+            with self._lock:
+                self._compactions += 1
+        finally:
+            with session.lock:
+                session.compacting = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'token_budget': self.token_budget,
+                'evictions': self._evictions,
+                'compactions': self._compactions,
+                'compaction_failures': self._compaction_failures,
+            }
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._evictions += 1
@@ -0,0 +1,138 @@
+"""
+Circuit breaker for the FinAI backend's Snowflake calls.
+Fails requests in microseconds while Snowflake is unreachable and probes for recovery with jittered exponential backoff.
+"""
+
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Snowflake while the breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker with jittered exponential backoff.
+
+    ``failure_threshold`` consecutive failures open the circuit. While open,
+    ``allow`` raises CircuitOpenError immediately. Once the backoff has
+    elapsed, one thread is let through as a probe (half-open). If the probe
+    succeeds the circuit closes; if it fails the circuit reopens for twice
+    as long, up to ``max_backoff``. Each delay is drawn from its upper half
+    so that processes that failed together do not retry together.
+
+    A probe that ends without telling us anything about the backend's
+    health, e.g. because the client went away, should call ``abandon`` so
+    another request can probe. A probe that has not resolved within
+    ``probe_timeout`` seconds is replaced anyway.
+    """
+
+    def __init__(self, name='snowflake', failure_threshold=5, backoff=1.0, max_backoff=60.0, probe_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0  # consecutive
+        self._opens = 0  # consecutive openings; sets the backoff exponent
+        self._open_until = 0.0
+        self._probe_owner = None
+        self._probe_started = 0.0
+        self._rejected = 0
+        self._trips = 0
+        self._last_error = None
+        self._changed_at = time.time()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def check(self):
+        """Raise CircuitOpenError if calls are currently being rejected, without claiming the probe."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() < self._open_until:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, self._open_until - time.monotonic())
+
+    def allow(self):
+        """Return if the caller may call the backend, else raise CircuitOpenError."""
+        now = time.monotonic()
+        thread = threading.get_ident()
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN:
+                if now < self._open_until:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, self._open_until - now)
+                self._set_state(HALF_OPEN)
+                self._probe_owner = None
+            # Half-open: one probe at a time; the prober may make several calls (connect, then query)
+            if self._probe_owner in (None, thread) or now - self._probe_started > self.probe_timeout:
+                if self._probe_owner != thread:
+                    self._probe_started = now
+                self._probe_owner = thread
+                return
+            self._rejected += 1
+            raise CircuitOpenError(self.name, self.backoff)
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opens = 0
+            self._probe_owner = None
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) if error is not None else None
+            # Calls already in flight when the circuit opened only count; they must not lengthen the backoff
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._trip_locked()
+
+    def abandon(self):
+        """Release the half-open probe held by this thread without judging the backend."""
+        with self._lock:
+            if self._probe_owner == threading.get_ident():
+                self._probe_owner = None
+
+    def _trip_locked(self):
+        delay = min(self.max_backoff, self.backoff * 2 ** self._opens)
+        delay = random.uniform(delay / 2, delay)
+        self._opens += 1
+        self._trips += 1
+        self._open_until = time.monotonic() + delay
+        self._probe_owner = None
+        self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self._state = state
+        self._changed_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'retry_in': round(max(self._open_until - time.monotonic(), 0.0), 3) if self._state == OPEN else 0.0,
+                'trips': self._trips,
+                'rejected': self._rejected,
+                'last_error': self._last_error,
+                'state_since': self._changed_at,
+            }
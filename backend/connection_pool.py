@@ -0,0 +1,314 @@
+"""
+Snowflake connection pool for the FinAI backend.
+Gives each request its own Snowflake connection instead of sharing one cursor across threads.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes available before the checkout timeout."""
+
+
+class PooledConnection:
+    """A Snowflake connection plus the bookkeeping the pool needs."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def is_closed(self):
+        """Return True if the underlying connection has been closed."""
+        try:
+            return self.connection.is_closed()
+        except Exception:
+            return True
+
+    def close(self):
+        """Close the underlying connection, ignoring errors."""
+        try:
+            self.connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+
+class SnowflakeConnectionPool:
+    """Bounded, thread-safe pool of Snowflake connections.
+
+    Connections are created on demand by ``factory`` up to ``max_size``.
+    Callers block for up to ``checkout_timeout`` seconds when the pool is
+    exhausted. Idle connections above ``min_size`` are closed once they have
+    been unused for ``idle_timeout`` seconds.
+
+    A connection that completed a query within ``liveness_ttl`` seconds is
+    assumed healthy. ``start_keepalive`` runs ``probe`` in the background on
+    idle connections older than that, so request threads never have to.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=8, idle_timeout=300, checkout_timeout=30,
+                 liveness_ttl=60, probe=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.liveness_ttl = liveness_ttl
+        self._probe = probe
+
+        self._idle = []  # LIFO so the most recently used (warmest) connection goes out first
+        self._size = 0  # idle + checked out + being created
+        self._waiting = 0  # callers blocked in acquire
+        self._cond = threading.Condition()
+        self._closed = False
+        self._last_success = 0.0
+        self._keepalive_thread = None
+        self._keepalive_stop = threading.Event()
+
+    @property
+    def size(self):
+        """Number of open connections, including checked-out ones."""
+        with self._cond:
+            return self._size
+
+    @property
+    def last_success(self):
+        """Monotonic time at which any pooled connection last completed work."""
+        with self._cond:
+            return self._last_success
+
+    def is_fresh(self):
+        """Return True if a connection proved itself alive within ``liveness_ttl``."""
+        return time.monotonic() - self.last_success < self.liveness_ttl
+
+    def fill(self):
+        """Open connections until the pool holds at least ``min_size``."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= max(self.min_size, 1):
+                    return True
+                self._size += 1
+
+            pooled = self._create()
+            self.release(pooled)
+
+    def prewarm(self, count):
+        """Open up to ``count`` connections in parallel and park them as idle.
+
+        Logins are dominated by network round trips, so opening sessions
+        concurrently makes startup cost roughly one login instead of
+        ``count``. Returns the number of connections opened; failures are
+        logged and leave their slots free.
+        """
+        with self._cond:
+            if self._closed:
+                return 0
+            slots = max(min(count, self.max_size) - self._size, 0)
+            self._size += slots
+
+        if not slots:
+            return 0
+
+        opened = 0
+        with ThreadPoolExecutor(max_workers=slots, thread_name_prefix='snowflake-prewarm') as executor:
+            futures = [executor.submit(self._create) for _ in range(slots)]
+            for future in futures:
+                try:
+                    pooled = future.result()
+                except Exception as e:
+                    logger.warning(f"Pre-warm connection failed: {e}")
+                    continue
+                self.release(pooled)
+                opened += 1
+        return opened
+
+    def acquire(self, timeout=None):
+        """Check out a connection, creating one if the pool has room."""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        expired = []
+
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolExhaustedError("Connection pool is closed")
+
+                    expired.extend(self._take_expired_locked())
+
+                    if self._idle:
+                        return self._idle.pop()
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(
+                            f"No Snowflake connection available after {timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            for pooled in expired:
+                pooled.close()
+
+        # Connect outside the lock so a slow login doesn't block other checkouts
+        return self._create()
+
+    def release(self, pooled, discard=False):
+        """Return a connection to the pool, or close it if it is no longer usable."""
+        if discard or pooled.is_closed():
+            pooled.close()
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._last_success = max(self._last_success, pooled.last_used)
+            if self._closed:
+                self._size -= 1
+                pooled.close()
+                return
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that checks a connection out and always returns it.
+
+        The connection is discarded instead of reused if the block raises and
+        the connection turns out to be closed.
+        """
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.connection
+        except Exception:
+            self.release(pooled, discard=pooled.is_closed())
+            raise
+        else:
+            self.release(pooled)
+
+    def evict_idle(self):
+        """Close idle connections that have outlived ``idle_timeout``."""
+        with self._cond:
+            expired = self._take_expired_locked()
+
+        for pooled in expired:
+            pooled.close()
+        return len(expired)
+
+    def start_keepalive(self, interval):
+        """Start a daemon thread that evicts, probes and refills idle connections."""
+        if not interval or not self._probe:
+            return
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, args=(interval,), name='snowflake-keepalive', daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def keepalive(self):
+        """Probe idle connections that have not proved themselves within ``liveness_ttl``."""
+        self.evict_idle()
+
+        now = time.monotonic()
+        with self._cond:
+            stale = [p for p in self._idle if now - p.last_used >= self.liveness_ttl]
+            self._idle = [p for p in self._idle if p not in stale]
+
+        for pooled in stale:
+            try:
+                self._probe(pooled.connection)
+            except Exception as e:
+                logger.warning(f"Keepalive probe failed, discarding connection: {e}")
+                self.release(pooled, discard=True)
+            else:
+                self.release(pooled)
+
+        try:
+            self.fill()
+        except Exception as e:
+            logger.warning(f"Keepalive could not refill pool: {e}")
+
+        return len(stale)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        self._keepalive_stop.set()
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for pooled in idle:
+            pooled.close()
+
+    def stats(self):
+        """Return a snapshot of pool occupancy."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+    def _keepalive_loop(self, interval):
+        while not self._keepalive_stop.wait(interval):
+            try:
+                self.keepalive()
+            except Exception as e:
+                logger.error(f"Keepalive error: {e}")
+
+    def _create(self):
+        """Open a new connection for a slot that has already been reserved."""
+        try:
+            connection = self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(connection)
+
+    def _take_expired_locked(self):
+        """Remove expired idle connections and return them for closing.
+
+        Caller must hold ``self._cond``; closing happens outside the lock.
+        """
+        if not self.idle_timeout:
+            return []
+
+        now = time.monotonic()
+        keep, expired = [], []
+        for pooled in self._idle:
+            if now - pooled.last_used > self.idle_timeout and self._size > self.min_size:
+                self._size -= 1
+                expired.append(pooled)
+            else:
+                keep.append(pooled)
+        self._idle = keep
+        return expired
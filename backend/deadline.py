@@ -0,0 +1,74 @@
+"""
+Per-request deadlines for the FinAI backend.
+Lets long Snowflake statements be cancelled once the client has given up or its time budget has run out.
+"""
+
+import select
+import socket
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes or its client disconnects mid-query.
+
+    ``reason`` is ``expired`` or ``disconnected``.
+    """
+
+    def __init__(self, message, reason='expired'):
+        super().__init__(message)
+        self.reason = reason
+
+
+class Deadline:
+    """Time by which a request must finish.
+
+    ``disconnected`` is an optional callable that returns True once the
+    client has closed its connection; it is consulted whenever the deadline
+    is checked, so a request is abandoned as soon as nobody is waiting.
+    """
+
+    def __init__(self, seconds, disconnected=None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._disconnected = disconnected
+
+    def remaining(self):
+        """Seconds left before the deadline, never negative."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def reason(self):
+        """Return ``expired``, ``disconnected`` or None while the request is still wanted."""
+        if time.monotonic() >= self.expires_at:
+            return 'expired'
+        if self._disconnected is not None and self._disconnected():
+            return 'disconnected'
+        return None
+
+    def expired(self):
+        return self.reason() is not None
+
+    def check(self):
+        """Raise DeadlineExceeded if the request should stop."""
+        reason = self.reason()
+        if reason is not None:
+            raise DeadlineExceeded(self.message(reason), reason)
+
+    def message(self, reason):
+        if reason == 'disconnected':
+            return 'Client disconnected before the request finished'
+        return f'Request exceeded its {self.seconds:g}s deadline'
+
+
+def socket_disconnected(sock):
+    """Return a callable that reports whether the peer of ``sock`` has hung up.
+
+    A closed connection becomes readable with zero bytes pending, which a
+    non-blocking ``MSG_PEEK`` detects without consuming pipelined requests.
+    """
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+    return disconnected
@@ -0,0 +1,437 @@
+"""
+Local stand-in for snowflake.connector used by the benchmark suite and tests.
+Simulates warehouse latency, errors and canned Cortex outputs without network access or credits.
+"""
+
+import enum
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+from semantic_cache import hashing_embedding
+
+
+class errors:
+    """Mirror of the snowflake.connector.errors classes the backend catches."""
+
+    class Error(Exception):
+        def __init__(self, msg=None, errno=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.errno = errno
+
+    class DatabaseError(Error):
+        pass
+
+    class InterfaceError(Error):
+        pass
+
+    class OperationalError(DatabaseError):
+        pass
+
+    class ProgrammingError(DatabaseError):
+        pass
+
+    class NotSupportedError(DatabaseError):
+        pass
+
+
+class DictCursor:
+    """Marker class; cursors created with it return rows as dicts (the fake always does)."""
+
+
+class QueryStatus(enum.Enum):
+    RUNNING = 'RUNNING'
+    SUCCESS = 'SUCCESS'
+    FAILED_WITH_ERROR = 'FAILED_WITH_ERROR'
+
+
+class LatencyModel:
+    """Latency distribution in seconds.
+
+    ``kind`` is one of ``constant``, ``uniform`` (median +/- spread) or
+    ``lognormal`` (median with shape ``sigma``).
+    """
+
+    def __init__(self, kind='lognormal', median=0.05, sigma=0.5, spread=0.0):
+        self.kind = kind
+        self.median = median
+        self.sigma = sigma
+        self.spread = spread
+
+    def sample(self, rng):
+        if self.median <= 0:
+            return 0.0
+        if self.kind == 'constant':
+            return self.median
+        if self.kind == 'uniform':
+            return max(rng.uniform(self.median - self.spread, self.median + self.spread), 0.0)
+        return rng.lognormvariate(0.0, self.sigma) * self.median
+
+    def to_dict(self):
+        return {'kind': self.kind, 'median': self.median, 'sigma': self.sigma, 'spread': self.spread}
+
+
+class FakeConfig:
+    """Behaviour shared by every fake connection.
+
+    ``cortex_latency`` applies to statements calling SNOWFLAKE.CORTEX unless
+    ``model_latency`` has an entry for the model bound to the statement,
+    ``embed_latency`` to EMBED_TEXT calls, ``query_latency`` to everything
+    else and ``connect_latency`` to logins.
+    """
+
+    def __init__(self):
+        self.cortex_latency = LatencyModel(median=0.8, sigma=0.4)
+        self.query_latency = LatencyModel(median=0.02, sigma=0.3)
+        self.connect_latency = LatencyModel(kind='constant', median=0.3)
+        self.embed_latency = LatencyModel(median=0.06, sigma=0.3)
+        self.model_latency = {}
+        self.error_rate = 0.0
+        self.complete_outputs = {
+            'fraud_analysis': json.dumps({
+                'risk_score': 35, 'risk_level': 'Low',
+                'explanation': 'Amount and merchant are consistent with normal spending.'
+            }),
+            'risk_assessment': json.dumps({
+                'credit_score': 720, 'risk_category': 'Low', 'approval_recommendation': 'Approve',
+                'analysis': 'Stable income with low utilization.'
+            }),
+            'market_analysis': json.dumps({
+                'sentiment': 'Positive', 'market_impact': 'Moderate', 'sectors_affected': ['Technology'],
+                'investment_recommendation': 'Hold'
+            }),
+            'chat_response': ('Build an emergency fund first. Then pay down high-interest debt. '
+                              'Invest what remains in diversified, low-cost funds.'),
+        }
+        self.sentiment_score = 0.62
+        self.rest_api = False  # issue REST tokens; tests that stub urlopen turn this on
+        self.seed = None
+
+    def to_dict(self):
+        return {
+            'cortex_latency': self.cortex_latency.to_dict(),
+            'query_latency': self.query_latency.to_dict(),
+            'connect_latency': self.connect_latency.to_dict(),
+            'embed_latency': self.embed_latency.to_dict(),
+            'model_latency': {model: latency.to_dict() for model, latency in self.model_latency.items()},
+            'error_rate': self.error_rate,
+            'rest_api': self.rest_api,
+            'seed': self.seed,
+        }
+
+
+config = FakeConfig()
+_rng = random.Random()
+_rng_lock = threading.Lock()
+_async_queries = {}  # sfqid -> (ready_at, rows, error)
+_async_lock = threading.Lock()
+query_history = deque(maxlen=1000)  # newest last, like INFORMATION_SCHEMA.QUERY_HISTORY
+
+SAMPLE_TRANSACTIONS = [
+    {'CUSTOMER_ID': 'CUST001', 'AMOUNT': 125.00, 'LOCATION': 'New York, NY', 'TRANSACTION_TIME': '2024-01-15T09:30:00'},
+    {'CUSTOMER_ID': 'CUST001', 'AMOUNT': 2500.00, 'LOCATION': 'New York, NY', 'TRANSACTION_TIME': '2024-01-15T14:20:00'},
+    {'CUSTOMER_ID': 'CUST002', 'AMOUNT': 5000.00, 'LOCATION': 'Miami, FL', 'TRANSACTION_TIME': '2024-01-15T23:45:00'},
+    {'CUSTOMER_ID': 'CUST003', 'AMOUNT': 50.00, 'LOCATION': 'Los Angeles, CA', 'TRANSACTION_TIME': '2024-01-16T08:15:00'},
+]
+
+SAMPLE_CUSTOMERS = [
+    {'CUSTOMER_ID': 'CUST001', 'ANNUAL_INCOME': 75000.00, 'CREDIT_SCORE': 720, 'EMPLOYMENT_STATUS': 'Full-time',
+     'EMPLOYMENT_YEARS': 5, 'DEBT_TO_INCOME_RATIO': 25.0, 'PREVIOUS_DEFAULTS': 0, 'CREDIT_UTILIZATION': 15.0,
+     'STATE': 'NY'},
+    {'CUSTOMER_ID': 'CUST002', 'ANNUAL_INCOME': 45000.00, 'CREDIT_SCORE': 650, 'EMPLOYMENT_STATUS': 'Full-time',
+     'EMPLOYMENT_YEARS': 3, 'DEBT_TO_INCOME_RATIO': 40.0, 'PREVIOUS_DEFAULTS': 1, 'CREDIT_UTILIZATION': 35.0,
+     'STATE': 'FL'},
+    {'CUSTOMER_ID': 'CUST003', 'ANNUAL_INCOME': 95000.00, 'CREDIT_SCORE': 780, 'EMPLOYMENT_STATUS': 'Full-time',
+     'EMPLOYMENT_YEARS': 7, 'DEBT_TO_INCOME_RATIO': 20.0, 'PREVIOUS_DEFAULTS': 0, 'CREDIT_UTILIZATION': 10.0,
+     'STATE': 'CA'},
+]
+
+SAMPLE_NEWS = [
+    {'NEWS_ID': 'NEWS001', 'HEADLINE': 'Tech Stocks Rally on Strong Earnings', 'SOURCE': 'Financial Times',
+     'PUBLISH_DATE': '2024-01-16T08:00:00', 'SECTOR': 'Technology', 'SENTIMENT_SCORE': 0.85, 'IMPACT_LEVEL': 'High',
+     'SCORED_AT': '2024-01-16T13:00:00'},
+    {'NEWS_ID': 'NEWS002', 'HEADLINE': 'Federal Reserve Signals Interest Rate Cuts', 'SOURCE': 'Reuters',
+     'PUBLISH_DATE': '2024-01-16T10:30:00', 'SECTOR': 'Banking', 'SENTIMENT_SCORE': 0.60, 'IMPACT_LEVEL': 'Medium',
+     'SCORED_AT': '2024-01-16T13:00:00'},
+    {'NEWS_ID': 'NEWS003', 'HEADLINE': 'Banking Sector Faces Regulatory Challenges', 'SOURCE': 'Wall Street Journal',
+     'PUBLISH_DATE': '2024-01-16T12:15:00', 'SECTOR': 'Banking', 'SENTIMENT_SCORE': -0.40, 'IMPACT_LEVEL': 'Medium',
+     'SCORED_AT': '2024-01-16T13:00:00'},
+]
+
+_DML = ('MERGE', 'INSERT', 'UPDATE')
+_ALIAS = re.compile(r'\bas\s+([a-z_][a-z0-9_]*)', re.IGNORECASE)
+
+
+def configure(cortex_latency=None, query_latency=None, connect_latency=None, error_rate=None,
+              complete_outputs=None, sentiment_score=None, seed=None, model_latency=None, embed_latency=None,
+              rest_api=None):
+    """Update the shared fake behaviour; omitted arguments keep their value."""
+    if embed_latency is not None:
+        config.embed_latency = embed_latency
+    if cortex_latency is not None:
+        config.cortex_latency = cortex_latency
+    if query_latency is not None:
+        config.query_latency = query_latency
+    if connect_latency is not None:
+        config.connect_latency = connect_latency
+    if model_latency:
+        config.model_latency.update(model_latency)
+    if error_rate is not None:
+        config.error_rate = error_rate
+    if complete_outputs:
+        config.complete_outputs.update(complete_outputs)
+    if sentiment_score is not None:
+        config.sentiment_score = sentiment_score
+    if rest_api is not None:
+        config.rest_api = rest_api
+    if seed is not None:
+        config.seed = seed
+        _rng.seed(seed)
+    return config
+
+
+def _random():
+    with _rng_lock:
+        return _rng.random()
+
+
+def _latency(model):
+    with _rng_lock:
+        return model.sample(_rng)
+
+
+def _statement_latency(query, params):
+    if 'SNOWFLAKE.CORTEX' not in query.upper():
+        return _latency(config.query_latency)
+    if 'EMBED_TEXT' in query.upper():
+        return _latency(config.embed_latency)
+    values = params.values() if isinstance(params, dict) else (params or ())
+    for value in values:
+        if isinstance(value, str) and value in config.model_latency:
+            return _latency(config.model_latency[value])
+    return _latency(config.cortex_latency)
+
+
+def _rows_for(query, params):
+    """Return canned result rows for the statements the backend issues."""
+    text = ' '.join(query.split())
+    upper = text.upper()
+
+    if upper == 'SELECT 1':
+        return [{'1': 1}]
+    if 'FROM CUSTOMERS' in upper:
+        return _customer_rows(params)
+    if 'EMBED_TEXT_768(' in upper:
+        return [{'EMBEDDING': hashing_embedding(params[-1], 768)}]
+    if 'FLATTEN(' in upper and params:
+        items = json.loads(params[-1])
+        alias = _ALIAS.findall(text)[-1]
+        return [{'ITEM_INDEX': index, alias.upper(): config.complete_outputs.get(alias.lower())}
+                for index in range(len(items))]
+    if upper.startswith('UPDATE MARKET_NEWS'):
+        return [{'number of rows updated': len(SAMPLE_NEWS), 'number of multi-joined rows updated': 0}]
+    if upper.startswith('MERGE INTO SCORING_WATERMARKS'):
+        return [{'number of rows inserted': 0, 'number of rows updated': 1}]
+    if upper.startswith(_DML):
+        return [{'number of rows inserted': len(SAMPLE_TRANSACTIONS)}]
+    if 'TIME_SLICE(' in upper:
+        sectors = json.loads(params['sectors']) if params.get('sectors') else None
+        buckets = {}
+        for row in SAMPLE_NEWS:
+            if sectors is None or row['SECTOR'] in sectors:
+                key = (row['SECTOR'], row['PUBLISH_DATE'][:13] + ':00:00')
+                buckets.setdefault(key, []).append(row['SENTIMENT_SCORE'])
+        return [{'SECTOR': sector, 'BUCKET_START': start, 'ARTICLES': len(scores),
+                 'MEAN_SENTIMENT': sum(scores) / len(scores), 'MIN_SENTIMENT': min(scores),
+                 'MAX_SENTIMENT': max(scores)}
+                for (sector, start), scores in sorted(buckets.items())]
+    if 'FROM SCORING_WATERMARKS' in upper:
+        return [{'WATERMARK': max(row['PUBLISH_DATE'] for row in SAMPLE_NEWS)}]
+    if 'FROM MARKET_NEWS' in upper:
+        keys = {value for value in (params or ()) if isinstance(value, str)}
+        return [dict(row) for row in SAMPLE_NEWS if not keys or keys & {row['NEWS_ID'], row['SECTOR']}]
+    if 'FROM TRANSACTIONS' in upper and 'ROW_NUMBER()' in upper:
+        return [dict(row) for row in SAMPLE_TRANSACTIONS]
+    if 'FROM FRAUD_SCORES' in upper:
+        analysis = json.loads(config.complete_outputs['fraud_analysis'])
+        return [{
+            'TRANSACTION_ID': f'TXN{index:03d}', 'CUSTOMER_ID': row['CUSTOMER_ID'], 'AMOUNT': row['AMOUNT'],
+            'RISK_SCORE': analysis.get('risk_score'), 'RISK_LEVEL': analysis.get('risk_level'),
+            'EXPLANATION': analysis.get('explanation'), 'MODEL': 'fake', 'SCORED_AT': row['TRANSACTION_TIME'],
+        } for index, row in enumerate(SAMPLE_TRANSACTIONS, start=1)]
+
+    row = {}
+    for alias in _ALIAS.findall(text):
+        key = alias.lower()
+        if key == 'sentiment_score':
+            row['SENTIMENT_SCORE'] = config.sentiment_score
+        elif key in config.complete_outputs:
+            row[alias.upper()] = config.complete_outputs[key]
+        else:
+            row[alias.upper()] = None
+    return [row] if row else []
+
+
+def _customer_rows(params):
+    """Apply the ID list and equality/range filters the backend binds for customer lookups."""
+    if not isinstance(params, dict):
+        return [dict(row) for row in SAMPLE_CUSTOMERS if row['CUSTOMER_ID'] == params[0]]
+
+    ids = json.loads(params['customer_ids']) if params.get('customer_ids') else None
+    checks = [
+        ('state', 'STATE', lambda value, bound: value == bound),
+        ('employment_status', 'EMPLOYMENT_STATUS', lambda value, bound: value == bound),
+        ('min_credit_score', 'CREDIT_SCORE', lambda value, bound: value >= bound),
+        ('max_credit_score', 'CREDIT_SCORE', lambda value, bound: value <= bound),
+        ('min_annual_income', 'ANNUAL_INCOME', lambda value, bound: value >= bound),
+        ('max_annual_income', 'ANNUAL_INCOME', lambda value, bound: value <= bound),
+    ]
+    rows = [row for row in SAMPLE_CUSTOMERS
+            if (ids is None or row['CUSTOMER_ID'] in ids)
+            and all(params.get(name) is None or check(row[column], params[name]) for name, column, check in checks)]
+    return [dict(row) for row in rows[:params.get('limit') or len(rows)]]
+
+
+class FakeCursor:
+    """Cursor that sleeps for a sampled latency and returns canned rows."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = None
+        self.rowcount = None
+        self._rows = []
+        self._position = 0
+
+    def execute(self, query, params=None, timeout=None, _exec_async=False, _statement_params=None, **kwargs):
+        if self.connection.is_closed():
+            raise errors.InterfaceError('Connection is closed', errno=250002)
+
+        self.sfqid = uuid.uuid4().hex
+        query_history.append({'QUERY_ID': self.sfqid, 'QUERY_TAG': (_statement_params or {}).get('QUERY_TAG', ''),
+                              'QUERY_TEXT': query,
+                              'WAREHOUSE_NAME': self.connection.connection_params.get('warehouse')})
+        latency = _statement_latency(query, params)
+        error = None
+        if config.error_rate and _random() < config.error_rate:
+            error = errors.ProgrammingError('Simulated Snowflake failure', errno=100132)
+
+        if _exec_async:
+            with _async_lock:
+                _async_queries[self.sfqid] = (time.monotonic() + latency, _rows_for(query, params), error)
+            return {'queryId': self.sfqid}
+
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise errors.ProgrammingError('SQL execution canceled', errno=604)
+
+        time.sleep(latency)
+        if error is not None:
+            raise error
+        rows = _rows_for(query, params)
+        self._set_rows(rows)
+        if query.lstrip().upper().startswith(_DML) and rows:
+            self.rowcount = sum(rows[0].values())
+        return self
+
+    def execute_async(self, query, params=None, **kwargs):
+        return self.execute(query, params, _exec_async=True, **kwargs)
+
+    def get_results_from_sfqid(self, sfqid):
+        with _async_lock:
+            ready_at, rows, error = _async_queries[sfqid]
+        time.sleep(max(ready_at - time.monotonic(), 0.0))
+        if error is not None:
+            raise error
+        self.sfqid = sfqid
+        self._set_rows(rows)
+
+    def abort_query(self, qid):
+        with _async_lock:
+            if qid not in _async_queries:
+                return False
+            _async_queries[qid] = (time.monotonic(), [], errors.ProgrammingError('SQL execution canceled', errno=604))
+        return True
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self._rows) - self._position)
+
+    def fetch_arrow_batches(self):
+        raise errors.NotSupportedError('Arrow result batches are not available in the fake connector')
+
+    def close(self):
+        self._rows = []
+
+    def _set_rows(self, rows):
+        self._rows = rows
+        self._position = 0
+        self.rowcount = len(rows)
+
+
+class _Rest:
+    def __init__(self):
+        # Without a token the backend skips the Cortex REST stream, so nothing here reaches the network
+        self.token = uuid.uuid4().hex if config.rest_api else None
+
+
+class FakeConnection:
+    """Connection whose cursors hit the simulated warehouse."""
+
+    def __init__(self, **connection_params):
+        self.connection_params = connection_params
+        self.host = f"{connection_params.get('account', 'fake')}.snowflakecomputing.com"
+        self.rest = _Rest()
+        self._closed = False
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def get_query_status(self, sfqid):
+        with _async_lock:
+            ready_at, _, error = _async_queries[sfqid]
+        if time.monotonic() < ready_at:
+            return QueryStatus.RUNNING
+        return QueryStatus.FAILED_WITH_ERROR if error is not None else QueryStatus.SUCCESS
+
+    def get_query_status_throw_if_error(self, sfqid):
+        status = self.get_query_status(sfqid)
+        if status == QueryStatus.FAILED_WITH_ERROR:
+            with _async_lock:
+                raise _async_queries[sfqid][2]
+        return status
+
+    @staticmethod
+    def is_still_running(status):
+        return status == QueryStatus.RUNNING
+
+    @staticmethod
+    def is_an_error(status):
+        return status == QueryStatus.FAILED_WITH_ERROR
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+def connect(**connection_params):
+    """Simulate a Snowflake login."""
+    time.sleep(_latency(config.connect_latency))
+    return FakeConnection(**connection_params)
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for serving the FinAI backend in production.
+A threaded worker sized to the Snowflake pool; it opens its connections after fork and holds all in-memory state.
+"""
+
+import os
+
+from scheduler import DEFAULT_CLASSES
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+
+# One process by default rather than one per core. Requests spend nearly all their time waiting on Snowflake with
+# the GIL released, so one worker's threads already keep the cores that matter busy. Everything the app coordinates
+# on is per process: the async job store, chat sessions, the response and semantic caches, fraud pre-screen windows,
+# the circuit breaker, admission limits and the workload connection pools. With N workers, jobs and sessions 404 on
+# the wrong worker, caches and pre-screen history split N ways, each worker trips its breaker separately, and
+# Snowflake sees N times the pool size in sessions. Scale with SERVER_THREADS; raise this only for CPU-bound load
+# behind sticky routing.
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# gthread workers multiplex connections on an event loop and run requests on a
+# bounded thread pool. The scheduler lets ADMISSION_MAX_ACTIVE requests use
+# Snowflake at once and a few per priority class wait; the spare threads answer
+# the rest with 429 immediately instead of leaving them in an unbounded queue.
+worker_class = 'gthread'
+_max_active = int(os.getenv('ADMISSION_MAX_ACTIVE', os.getenv('SNOWFLAKE_POOL_MAX_SIZE', '8')))
+_max_queue = sum(queue * _max_active for _, _, queue, _, _, _ in DEFAULT_CLASSES.values())
+threads = int(os.getenv('SERVER_THREADS', str(_max_active + _max_queue + 4)))
+worker_connections = threads * 4
+backlog = int(os.getenv('SERVER_BACKLOG', '256'))
+
+keepalive = int(os.getenv('SERVER_KEEPALIVE', '5'))
+# Longer than the largest request deadline so workers are not killed mid-request
+timeout = int(os.getenv('SERVER_WORKER_TIMEOUT', '330'))
+graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+max_requests = int(os.getenv('SERVER_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+# Import the app once in the master so forks are fast; Snowflake is connected per worker
+preload_app = True
+accesslog = os.getenv('SERVER_ACCESS_LOG', '-')
+
+
+def post_worker_init(worker):
+    """Open this worker's Snowflake pool before it starts taking requests."""
+    from app import initialize_snowflake
+
+    if not initialize_snowflake():
+        worker.log.error("Snowflake initialization failed; requests will retry the connection")
@@ -0,0 +1,136 @@
+"""
+Lightweight Prometheus-style metrics for the FinAI backend.
+Histograms and counters are kept in process and rendered in the text exposition format.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Seconds; spans sub-millisecond cache hits up to multi-second LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name + _format_labels(self.labelnames, labels), value)
+                for labels, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels.
+
+    ``observe`` costs one bisect and a few additions under a short lock, so it
+    is cheap enough for every query and request.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+
+        samples = []
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                samples.append((self.name + '_bucket' + _format_labels(self.labelnames, labels, ('le', bound)),
+                                cumulative))
+            samples.append((self.name + '_sum' + _format_labels(self.labelnames, labels), series[-1]))
+            samples.append((self.name + '_count' + _format_labels(self.labelnames, labels), cumulative))
+        return samples
+
+
+class GaugeCallback:
+    """Gauge whose samples are read from a callback at scrape time.
+
+    The callback returns a dict mapping label-value tuples to numbers.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help_text, labelnames, callback):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+
+    def samples(self):
+        return [(self.name + _format_labels(self.labelnames, labels), value)
+                for labels, value in sorted(self._callback().items())]
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them for ``/api/metrics``."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name, help_text, labelnames, callback):
+        return self.register(GaugeCallback(name, help_text, labelnames, callback))
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {value}")
+        return '\n'.join(lines) + '\n'
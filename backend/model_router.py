@@ -0,0 +1,90 @@
+"""
+Cortex model routing for the FinAI backend.
+Maps each endpoint to a fast or accurate model tier with COMPLETE options, a latency budget and a smaller fallback model.
+"""
+
+import json
+import threading
+
+# endpoint -> (default tier, max_tokens, temperature, latency budget in seconds)
+DEFAULT_POLICIES = {
+    'fraud': ('fast', 256, 0.0, 2.0),
+    'sentiment': ('accurate', 512, 0.2, 10.0),
+    'risk': ('accurate', 512, 0.2, 15.0),
+    'chat': ('accurate', 1024, 0.7, 20.0),
+    'chat_summary': ('fast', 256, 0.0, 10.0),
+}
+
+
+class ModelRoute:
+    """The model, options and fallback chosen for one request."""
+
+    def __init__(self, endpoint, tier, model, fallback_model, max_tokens, temperature, latency_budget):
+        self.endpoint = endpoint
+        self.tier = tier
+        self.model = model
+        self.fallback_model = fallback_model if fallback_model != model else None
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.latency_budget = latency_budget or None
+
+    @property
+    def options(self):
+        """COMPLETE options as the JSON text bound to PARSE_JSON(%s)."""
+        return json.dumps({'max_tokens': self.max_tokens, 'temperature': self.temperature})
+
+    def to_dict(self):
+        return {
+            'tier': self.tier,
+            'model': self.model,
+            'fallback_model': self.fallback_model,
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            'latency_budget': self.latency_budget,
+        }
+
+
+class ModelRouter:
+    """Choose a Cortex model per endpoint and request.
+
+    ``tiers`` maps tier names (``fast``, ``accurate``) to models and
+    ``fallbacks`` maps each tier to the smaller model retried when the
+    primary runs past the endpoint's latency budget. ``policies`` maps an
+    endpoint to ``(default tier, max_tokens, temperature, latency budget)``.
+    """
+
+    def __init__(self, tiers, fallbacks, policies):
+        self.tiers = dict(tiers)
+        self.fallbacks = dict(fallbacks)
+        self.policies = dict(policies)
+        self._lock = threading.Lock()
+        self._fallbacks_used = {}
+
+    def has_tier(self, tier):
+        return tier in self.tiers
+
+    def route(self, endpoint, tier=None):
+        """Return the ModelRoute for ``endpoint``; ``tier`` overrides the server policy."""
+        default_tier, max_tokens, temperature, latency_budget = self.policies[endpoint]
+        tier = tier or default_tier
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown model tier '{tier}' (expected one of {', '.join(sorted(self.tiers))})")
+        return ModelRoute(endpoint, tier, self.tiers[tier], self.fallbacks.get(tier),
+                          max_tokens, temperature, latency_budget)
+
+    def record_fallback(self, route):
+        with self._lock:
+            self._fallbacks_used[route.endpoint] = self._fallbacks_used.get(route.endpoint, 0) + 1
+
+    def stats(self):
+        """Return the configured tiers, per-endpoint defaults and fallback counts."""
+        with self._lock:
+            fallbacks_used = dict(self._fallbacks_used)
+        return {
+            'tiers': self.tiers,
+            'fallbacks': self.fallbacks,
+            'endpoints': {
+                endpoint: {**self.route(endpoint).to_dict(), 'fallbacks_used': fallbacks_used.get(endpoint, 0)}
+                for endpoint in sorted(self.policies)
+            },
+        }
@@ -0,0 +1,110 @@
+"""
+Query tracing for the FinAI backend.
+Tags Snowflake statements with the request's trace ID and keeps the slowest recent executions for debugging.
+"""
+
+import contextvars
+import json
+import re
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+_trace_id = contextvars.ContextVar('finai_trace_id', default=None)
+_VALID_TRACE_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+# Snowflake rejects QUERY_TAG values longer than this
+QUERY_TAG_MAX_LENGTH = 2000
+
+
+def new_trace_id(candidate=None):
+    """Return ``candidate`` if it is a usable trace ID (e.g. from a client header), else a fresh one."""
+    if candidate and _VALID_TRACE_ID.match(candidate):
+        return candidate
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id):
+    """Make ``trace_id`` current for this thread's context; ``None`` clears it."""
+    _trace_id.set(trace_id)
+
+
+def query_tag(endpoint, model, trace_id=None):
+    """QUERY_TAG JSON so statements can be found in QUERY_HISTORY by trace ID and endpoint."""
+    tag = json.dumps({'app': 'finai', 'trace_id': trace_id, 'endpoint': endpoint, 'model': model},
+                     separators=(',', ':'))
+    return tag[:QUERY_TAG_MAX_LENGTH]
+
+
+def prompt_chars(params):
+    """Characters of text bound to a statement; for Cortex calls this is dominated by the prompt."""
+    values = params.values() if isinstance(params, dict) else (params or ())
+    return sum(len(value) for value in values if isinstance(value, str))
+
+
+class SlowQueryLog:
+    """Ring buffer of the most recent statements slower than ``threshold`` seconds.
+
+    Every recorded execution is counted, but only slow ones are kept, at
+    most ``max_entries`` of them; the oldest fall out first. Entries carry
+    the Snowflake query ID and trace ID, never bound parameter values.
+    """
+
+    def __init__(self, threshold=1.0, max_entries=500):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._slow = 0
+
+    def record(self, endpoint, model, query, query_id, prompt_size, checkout_seconds, execute_seconds,
+               fetch_seconds, error=None, trace_id=None):
+        """Count one execution and keep it if its total time reaches the threshold."""
+        total = checkout_seconds + execute_seconds + fetch_seconds
+        with self._lock:
+            self._recorded += 1
+            if total < self.threshold or self.max_entries <= 0:
+                return None
+            self._slow += 1
+            entry = {
+                'recorded_at': datetime.now(timezone.utc).isoformat(),
+                'trace_id': trace_id,
+                'query_id': query_id,
+                'endpoint': endpoint,
+                'model': model,
+                'statement': ' '.join(query.split())[:200],
+                'prompt_chars': prompt_size,
+                'checkout_ms': round(checkout_seconds * 1000, 1),
+                'execute_ms': round(execute_seconds * 1000, 1),
+                'fetch_ms': round(fetch_seconds * 1000, 1),
+                'total_ms': round(total * 1000, 1),
+                'error': error,
+            }
+            self._entries.append(entry)
+            return entry
+
+    def entries(self, limit=None, endpoint=None, trace_id=None):
+        """Slow statements, newest first, optionally for one endpoint or trace."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        if endpoint:
+            entries = [entry for entry in entries if entry['endpoint'] == endpoint]
+        if trace_id:
+            entries = [entry for entry in entries if entry['trace_id'] == trace_id]
+        return entries[:limit] if limit else entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_seconds': self.threshold,
+                'max_entries': self.max_entries,
+                'entries': len(self._entries),
+                'recorded': self._recorded,
+                'slow': self._slow,
+            }
@@ -0,0 +1,307 @@
+"""
+Replay tool for traffic captured by traffic_capture.py.
+Plays a capture back against the Flask app (with the fake Snowflake connector) or a live server and reports latency per route.
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import fake_snowflake
+from benchmark import fake_snowflake_backend, percentile, summarize
+from fake_snowflake import LatencyModel
+from traffic_capture import SESSION_ID_PATTERN
+
+logger = logging.getLogger(__name__)
+
+
+def load_capture(paths, routes=None, limit=None):
+    """Read capture files (e.g. one per server process) and return their records in arrival order.
+
+    ``routes`` keeps only paths starting with one of the given prefixes.
+    """
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping malformed record at {path}:{line_number}")
+                    continue
+                if routes and not record['path'].startswith(tuple(routes)):
+                    continue
+                records.append(record)
+    records.sort(key=lambda record: record['ts'])
+    return records[:limit] if limit else records
+
+
+def _request_parts(record):
+    path = record['path'] + (f"?{record['query']}" if record.get('query') else '')
+    body = None if record.get('body') is None else json.dumps(record['body']).encode('utf-8')
+    return path, dict(record.get('headers') or {}), body
+
+
+class SessionMap:
+    """Maps the masked chat session IDs in a capture to sessions created on replay.
+
+    The first replayed request that returned a masked ID without sending
+    it (normally ``POST /api/chat/sessions``) is its creator; the real ID
+    in that request's replayed response is substituted wherever later
+    requests send the masked one, in ``session_id`` body fields or in the
+    path. A request whose session's creator has not finished yet waits up
+    to ``timeout`` seconds for it, as the original client did. IDs created
+    before the capture started stay masked and will miss on replay.
+    """
+
+    def __init__(self, records, timeout=30):
+        self.timeout = timeout
+        self._creators = {record['session_id'] for record in records
+                          if record.get('session_id') and record['session_id'] not in self._sent(record)}
+        self._real = {}  # masked ID -> replayed ID, None if the creator failed
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def _sent(record):
+        ids = {segment for segment in record['path'].split('/') if segment.startswith('masked-')}
+        body = record.get('body')
+        if isinstance(body, dict) and isinstance(body.get('session_id'), str):
+            ids.add(body['session_id'])
+        return ids
+
+    def rewrite(self, record):
+        """Return ``record`` with masked session IDs replaced by their replayed sessions."""
+        real = {}
+        for masked in self._sent(record) & self._creators:
+            with self._condition:
+                self._condition.wait_for(lambda: masked in self._real, self.timeout)
+                if self._real.get(masked):
+                    real[masked] = self._real[masked]
+        if not real:
+            return record
+
+        record = {**record, 'path': '/'.join(real.get(segment, segment) for segment in record['path'].split('/'))}
+        body = record.get('body')
+        if isinstance(body, dict) and body.get('session_id') in real:
+            record['body'] = {**body, 'session_id': real[body['session_id']]}
+        return record
+
+    def learn(self, record, body):
+        """Map the session ``record`` created, given its replayed response body (None if it failed)."""
+        masked = record.get('session_id')
+        if masked not in self._creators or masked in self._sent(record):
+            return
+        match = SESSION_ID_PATTERN.search(body or b'')
+        with self._condition:
+            if masked not in self._real:
+                self._real[masked] = match.group(1).decode('utf-8') if match else None
+                self._condition.notify_all()
+
+
+def app_sender(app):
+    """Send records to ``app`` in process, one test client per replay thread."""
+    local = threading.local()
+
+    def send(record):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        path, headers, body = _request_parts(record)
+        response = client.open(path, method=record['method'], headers=headers, data=body)
+        return response.status_code, response.get_data()  # drains streamed bodies
+
+    return send
+
+
+def http_sender(base_url, timeout=330):
+    """Send records to a running server at ``base_url``."""
+    base_url = base_url.rstrip('/')
+
+    def send(record):
+        path, headers, body = _request_parts(record)
+        request = urllib.request.Request(base_url + path, data=body, headers=headers, method=record['method'])
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    return send
+
+
+def run_replay(records, send, speed=1.0, concurrency=16, url_map=None, label=None, api_key=None):
+    """Replay ``records`` through ``send(record) -> (status, response body)`` and return the results.
+
+    Requests are issued open-loop: each is due ``speed`` times sooner than
+    its captured offset from the first request, whether or not earlier
+    ones have finished, and runs on one of ``concurrency`` threads. Latency
+    is measured from the due time, so time spent waiting for a free thread
+    counts against the server instead of silently slowing the load down;
+    that wait is also reported on its own as lag. ``speed`` 0 sends every
+    request as soon as a thread is free. Routes are grouped by ``url_map``
+    rule when given, else by path.
+
+    Chat sessions are mapped to the ones created on replay (see
+    SessionMap). Captured ``X-API-Key`` headers are masked, so they are
+    replaced with ``api_key`` when given.
+    """
+    if not records:
+        raise ValueError("Nothing to replay")
+    adapter = url_map.bind('localhost') if url_map is not None else None
+    sessions = SessionMap(records)
+
+    def route_of(record):
+        if adapter is not None:
+            try:
+                return adapter.match(record['path'], method=record['method'], return_rule=True)[0].rule
+            except Exception:
+                pass
+        return record['path']
+
+    samples = {}  # route -> [(seconds, lag seconds, ok, status matched, captured seconds)]
+    samples_lock = threading.Lock()
+    first_ts = records[0]['ts']
+
+    def prepare(record):
+        record = sessions.rewrite(record)
+        headers = record.get('headers') or {}
+        if api_key and 'X-API-Key' in headers:
+            record = {**record, 'headers': {**headers, 'X-API-Key': api_key}}
+        return record
+
+    def replay(record, due):
+        began = time.perf_counter()
+        body = None
+        try:
+            status, body = send(prepare(record))
+            ok = status < 500
+        except Exception as e:
+            logger.warning(f"Replay of {record['method']} {record['path']} failed: {e}")
+            status, ok = None, False
+        finally:
+            sessions.learn(record, body)
+        finished = time.perf_counter()
+        captured = record.get('duration_ms')
+        with samples_lock:
+            samples.setdefault(route_of(record), []).append((
+                finished - due, began - due, ok, status == record.get('status'),
+                None if captured is None else captured / 1000,
+            ))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as executor:
+        for record in records:
+            due = started + (record['ts'] - first_ts) / speed if speed else time.perf_counter()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(replay, record, due)
+    wall_seconds = time.perf_counter() - started
+
+    def summary(results):
+        captured = [seconds for *_, seconds in results if seconds is not None]
+        lags = sorted(lag for _, lag, *_ in results)
+        return {
+            **summarize([seconds for seconds, *_ in results], sum(1 for _, _, ok, *_ in results if not ok),
+                        wall_seconds),
+            'status_mismatches': sum(1 for _, _, _, matched, _ in results if not matched),
+            'lag_p95_ms': round(percentile(lags, 0.95) * 1000, 2) if lags else None,
+            'captured': summarize(captured, 0, None) if captured else None,
+        }
+
+    all_results = [result for results in samples.values() for result in results]
+    return {
+        'label': label,
+        'timestamp': datetime.now().isoformat(),
+        'config': {'requests': len(records), 'speed': speed, 'concurrency': concurrency},
+        'captured_seconds': round(records[-1]['ts'] - first_ts, 3),
+        'wall_seconds': round(wall_seconds, 3),
+        'overall': summary(all_results),
+        'routes': {route: summary(results) for route, results in sorted(samples.items())},
+    }
+
+
+def replay_in_process(records, speed=1.0, concurrency=16, label=None, api_key=None):
+    """Replay against the Flask app with the fake Snowflake connector (configured with ``fake_snowflake.configure``)."""
+    from app import app, cortex_ai
+
+    with fake_snowflake_backend(cortex_ai):
+        if not cortex_ai.connect():
+            raise RuntimeError("Could not connect the fake Snowflake backend")
+        return run_replay(records, app_sender(app), speed, concurrency, app.url_map, label, api_key)
+
+
+def print_report(results):
+    """Print replayed vs. captured latency per route."""
+    header = (f"{'route':<34}{'requests':>9}{'errors':>8}{'status≠':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'lag p95':>10}{'capt p95':>10}")
+    print(header)
+    print('-' * len(header))
+    rows = list(results['routes'].items()) + [('overall', results['overall'])]
+    for name, summary in rows:
+        captured = (summary['captured'] or {}).get('p95_ms')
+        print(f"{name[:33]:<34}{summary['requests']:>9}{summary['errors']:>8}{summary['status_mismatches']:>8}"
+              f"{summary['p50_ms'] or 0:>10}{summary['p95_ms'] or 0:>10}{summary['p99_ms'] or 0:>10}"
+              f"{summary['lag_p95_ms'] or 0:>10}{captured or '-':>10}")
+    speed = results['config']['speed']
+    print(f"\nReplayed {results['captured_seconds']}s of traffic in {results['wall_seconds']}s "
+          f"at {f'{speed}x' if speed else 'maximum'} speed, concurrency {results['config']['concurrency']}, "
+          f"error rate {results['overall']['error_rate']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay captured FinAI traffic and report latency per route.')
+    parser.add_argument('captures', nargs='+', help='capture files written by TRAFFIC_CAPTURE_PATH')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='playback speed; 2 replays twice as fast, 0 as fast as the threads allow')
+    parser.add_argument('--concurrency', type=int, default=16, help='replay threads')
+    parser.add_argument('--routes', default=None, help='comma-separated path prefixes to replay')
+    parser.add_argument('--limit', type=int, default=None, help='replay only the first N requests')
+    parser.add_argument('--url', default=None,
+                        help='replay against a running server instead of the in-process app with fake Snowflake')
+    parser.add_argument('--api-key', default=None,
+                        help='X-API-Key to send in place of the masked key on requests that had one')
+    parser.add_argument('--cortex-latency', type=float, default=0.8, help='median Cortex call latency (s)')
+    parser.add_argument('--query-latency', type=float, default=0.02, help='median non-Cortex query latency (s)')
+    parser.add_argument('--connect-latency', type=float, default=0.3, help='login latency (s)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for fake latencies and errors')
+    parser.add_argument('--label', default=None, help='name recorded with the results')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    routes = [prefix.strip() for prefix in args.routes.split(',') if prefix.strip()] if args.routes else None
+    records = load_capture(args.captures, routes, args.limit)
+
+    if args.url:
+        from app import app
+
+        results = run_replay(records, http_sender(args.url), args.speed, args.concurrency, app.url_map, args.label,
+                             args.api_key)
+    else:
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='lognormal', median=args.cortex_latency, sigma=0.4),
+            query_latency=LatencyModel(kind='lognormal', median=args.query_latency, sigma=0.4),
+            connect_latency=LatencyModel(kind='constant', median=args.connect_latency),
+            seed=args.seed,
+        )
+        results = replay_in_process(records, args.speed, args.concurrency, args.label, args.api_key)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
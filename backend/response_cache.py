@@ -0,0 +1,98 @@
+"""
+In-process cache for Cortex AI results.
+Repeated prompts are answered from memory instead of re-running COMPLETE/SENTIMENT in Snowflake.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so formatting differences don't defeat the cache."""
+    return ' '.join(str(prompt).split())
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with a TTL per endpoint.
+
+    Keys combine the endpoint, the model and a hash of the normalized prompt,
+    so cached answers from one model are never served for another. Cached
+    values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=1024, ttls=None, default_ttl=300):
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._evictions = 0
+
+    def ttl_for(self, endpoint):
+        """Return the TTL in seconds for an endpoint (0 disables caching)."""
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    @staticmethod
+    def make_key(endpoint, model, prompt):
+        """Build the cache key for a prompt sent to a model by an endpoint."""
+        digest = hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+        return (endpoint, model, digest)
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None on a miss or expiry."""
+        endpoint = key[0]
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits[endpoint] = self._hits.get(endpoint, 0) + 1
+                    return value
+                del self._entries[key]
+
+            self._misses[endpoint] = self._misses.get(endpoint, 0) + 1
+            return None
+
+    def set(self, key, value):
+        """Store ``value`` under ``key`` for the endpoint's TTL."""
+        ttl = self.ttl_for(key[0])
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters per endpoint plus occupancy."""
+        with self._lock:
+            endpoints = sorted(set(self._hits) | set(self._misses))
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'endpoints': {
+                    endpoint: {
+                        'hits': self._hits.get(endpoint, 0),
+                        'misses': self._misses.get(endpoint, 0),
+                        'ttl': self.ttl_for(endpoint),
+                    }
+                    for endpoint in endpoints
+                },
+            }
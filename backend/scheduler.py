@@ -0,0 +1,218 @@
+"""
+Priority scheduling of Snowflake capacity for the FinAI backend.
+Orders requests by class, reserves headroom for latency-critical endpoints and rate-limits each API key.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+# class -> (priority, share of capacity it may fill, queue length per unit of capacity,
+#           queue timeout in seconds, requests per second per API key, burst)
+DEFAULT_CLASSES = {
+    'high': (0, 1.0, 2, 2.0, 50.0, 100),
+    'normal': (1, 0.75, 2, 5.0, 10.0, 20),
+    'low': (2, 0.5, 4, 20.0, 2.0, 10),
+}
+
+# (path prefix, class); the first match wins and unmatched paths are 'normal'
+DEFAULT_ROUTES = (
+    ('/api/fraud/analyze/batch', 'low'),
+    ('/api/fraud/analyze', 'high'),
+    ('/api/fraud/bulk-score', 'low'),
+    ('/api/fraud/scores', 'low'),
+    ('/api/risk/portfolio', 'low'),
+    ('/api/market/news/score', 'low'),
+    ('/api/chat/financial', 'low'),
+)
+
+
+class PriorityClass:
+    """Scheduling parameters for one class of requests.
+
+    Classes with a lower ``priority`` are served first. A request of this
+    class only starts while fewer than ``max_active`` requests of *any*
+    class are running, so ``capacity - max_active`` slots stay reserved for
+    higher classes. ``rate`` and ``burst`` size a token bucket per API key;
+    a ``rate`` of 0 disables rate limiting for the class.
+    """
+
+    def __init__(self, name, priority, max_active, max_queue, queue_timeout, rate=0.0, burst=None):
+        self.name = name
+        self.priority = priority
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+
+        self.active = 0
+        self.waiting = deque()
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0, 'rate_limited': 0}
+        self.service_seconds = 0.5  # moving average used for Retry-After
+        self.wait_seconds = 0.0
+
+    def to_dict(self):
+        return {
+            'priority': self.priority,
+            'active': self.active,
+            'queued': len(self.waiting),
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'rate': self.rate,
+            'burst': self.burst,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'avg_service_seconds': round(self.service_seconds, 4),
+            'avg_wait_seconds': round(self.wait_seconds, 4),
+        }
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``burst``; each request takes one."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Take a token and return 0, or return the seconds until one is available."""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Ticket:
+    __slots__ = ('granted', 'enqueued')
+
+    def __init__(self):
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class Scheduler:
+    """Share ``capacity`` concurrent slots between priority classes.
+
+    Within a class requests are served in arrival order. When a slot frees
+    up it goes to the waiting request of the highest-priority class whose
+    ``max_active`` still allows it, so a burst of low-priority work queues
+    behind itself instead of in front of latency-critical requests.
+    Per-client token buckets are kept for at most ``max_clients`` (API key,
+    class) pairs, least recently used first out. ``on_wait(class_name,
+    seconds)`` is called with each admitted request's queueing time.
+    """
+
+    def __init__(self, capacity, classes, default_class=None, max_clients=10000, on_wait=None):
+        self.capacity = capacity
+        self.classes = {cls.name: cls for cls in classes}
+        self.default_class = default_class or max(classes, key=lambda cls: cls.priority).name
+        self.max_clients = max_clients
+        self.on_wait = on_wait
+        self._by_priority = sorted(classes, key=lambda cls: cls.priority)
+        self._active = 0
+        self._cond = threading.Condition()
+        self._buckets = OrderedDict()
+        self._buckets_lock = threading.Lock()
+
+    def acquire(self, class_name, client=None):
+        """Wait for a slot; return ``(None, 0)`` once admitted or ``(reason, retry_after)``."""
+        cls = self.classes.get(class_name) or self.classes[self.default_class]
+        if cls.rate > 0 and client is not None:
+            wait = self._take_token(client, cls)
+            if wait:
+                with self._cond:
+                    cls.rejected['rate_limited'] += 1
+                return 'rate_limited', max(1, math.ceil(wait))
+
+        with self._cond:
+            if self._active < min(cls.max_active, self.capacity) and not cls.waiting:
+                self._start_locked(cls)
+                waited = 0.0
+            elif len(cls.waiting) >= cls.max_queue:
+                cls.rejected['queue_full'] += 1
+                return 'queue_full', self._retry_after_locked(cls)
+            else:
+                ticket = _Ticket()
+                cls.waiting.append(ticket)
+                deadline = ticket.enqueued + cls.queue_timeout
+                while not ticket.granted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        cls.waiting.remove(ticket)
+                        cls.rejected['queue_timeout'] += 1
+                        return 'queue_timeout', self._retry_after_locked(cls)
+                    self._cond.wait(remaining)
+                waited = time.monotonic() - ticket.enqueued
+            cls.wait_seconds += 0.1 * (waited - cls.wait_seconds)
+
+        if self.on_wait:
+            self.on_wait(cls.name, waited)
+        return None, 0
+
+    def release(self, class_name, elapsed):
+        cls = self.classes.get(class_name) or self.classes[self.default_class]
+        with self._cond:
+            self._active -= 1
+            cls.active -= 1
+            cls.service_seconds += 0.1 * (elapsed - cls.service_seconds)
+            self._dispatch_locked()
+
+    def _start_locked(self, cls):
+        self._active += 1
+        cls.active += 1
+        cls.admitted += 1
+
+    def _dispatch_locked(self):
+        """Hand free slots to the head of the highest-priority class allowed to use them."""
+        granted = False
+        while self._active < self.capacity:
+            for cls in self._by_priority:
+                if cls.waiting and self._active < cls.max_active:
+                    cls.waiting.popleft().granted = True
+                    self._start_locked(cls)
+                    granted = True
+                    break
+            else:
+                break
+        if granted:
+            self._cond.notify_all()
+
+    def _retry_after_locked(self, cls):
+        waiting = len(cls.waiting) + 1
+        return max(1, math.ceil(cls.service_seconds * waiting / max(min(cls.max_active, self.capacity), 1)))
+
+    def _take_token(self, client, cls):
+        key = (client, cls.name)
+        now = time.monotonic()
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(cls.rate, cls.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+    def stats(self):
+        with self._cond:
+            classes = {cls.name: cls.to_dict() for cls in self._by_priority}
+            active = self._active
+        with self._buckets_lock:
+            clients = len(self._buckets)
+        return {
+            'capacity': self.capacity,
+            'active': active,
+            'queued': sum(cls['queued'] for cls in classes.values()),
+            'tracked_clients': clients,
+            'classes': classes,
+        }
@@ -0,0 +1,198 @@
+"""
+Semantic answer cache for FinAI chat.
+Reuses a stored answer when a new question's embedding is close enough to one already answered.
+"""
+
+import math
+import operator
+import re
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional; the index falls back to pure-Python dot products
+    np = None
+
+LOCAL_EMBEDDING_DIM = 256
+
+_WORD = re.compile(r"[a-z0-9$%']+")
+# Function words that change how a question is phrased but not what it asks; negations are kept
+_STOPWORDS = frozenset("""
+a about am an and are as at be can could do does for from get good how i i'm if in is it me my of on or
+should so than that the there this to vs was we what when which would you your
+""".split())
+
+
+def hashing_embedding(text, dim=LOCAL_EMBEDDING_DIM):
+    """Embed ``text`` locally by hashing its content words and word pairs into ``dim`` signed buckets.
+
+    A stand-in for Cortex EMBED_TEXT: it recognises rewordings that share
+    vocabulary (word order, filler words, punctuation, case) but not
+    synonyms, so it needs no model and no Snowflake round trip.
+    """
+    words = [word.strip("'") for word in _WORD.findall(str(text).lower())]
+    words = [_stem(word) for word in words if word and word not in _STOPWORDS]
+    features = [(word, 1.0) for word in words] + [(f'{a} {b}', 0.5) for a, b in zip(words, words[1:])]
+
+    vector = [0.0] * dim
+    for feature, weight in features:
+        digest = zlib.crc32(feature.encode('utf-8'))
+        vector[digest % dim] += weight if digest & 0x80000000 else -weight
+    return _normalize(vector)
+
+
+def _stem(word):
+    """Fold simple plurals so 'funds' and 'fund' hash alike."""
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of answers keyed by question embeddings.
+
+    Embeddings are stored unit-normalized, one row per answer, so cosine
+    similarity is a dot product; with NumPy the whole index is searched
+    with one matrix product per batch of questions. A lookup only matches
+    entries in the same ``namespace`` (model and context) whose similarity
+    is at least ``threshold``. At most ``max_entries`` answers are kept for
+    ``ttl`` seconds; a full index replaces an expired entry, or else the
+    least recently used one. ``backend`` forces 'numpy' or 'python'; by
+    default NumPy is used when it is installed.
+    """
+
+    def __init__(self, dim, threshold=0.9, max_entries=2048, ttl=3600, backend=None):
+        if backend not in (None, 'numpy', 'python'):
+            raise ValueError(f"Unknown semantic cache backend: {backend}")
+        if backend == 'numpy' and np is None:
+            raise ValueError("The numpy semantic cache backend requires NumPy")
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend or ('numpy' if np is not None else 'python')
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._size = 0  # slots in use; entries only ever occupy [0, _size)
+            self._namespaces = [None] * self.max_entries
+            self._values = [None] * self.max_entries
+            if self.backend == 'numpy':
+                self._matrix = np.zeros((self.max_entries, self.dim), dtype=np.float32)
+                self._namespace_ids = np.full(self.max_entries, -1, dtype=np.int64)
+                self._expires = np.zeros(self.max_entries)
+                self._last_used = np.zeros(self.max_entries)
+            else:
+                self._matrix = [None] * self.max_entries
+                self._namespace_ids = [-1] * self.max_entries
+                self._expires = [0.0] * self.max_entries
+                self._last_used = [0.0] * self.max_entries
+
+    def get(self, namespace, embedding):
+        """Return ``(value, similarity)`` for the closest cached question, or None."""
+        return self.search(namespace, [embedding])[0]
+
+    def search(self, namespace, embeddings):
+        """Look up a batch of question embeddings; one ``(value, similarity)`` or None per embedding."""
+        queries = [self._unit(embedding) for embedding in embeddings]
+        namespace_id = zlib.crc32(namespace.encode('utf-8'))
+        now = time.monotonic()
+
+        with self._lock:
+            if self.backend == 'numpy':
+                best = self._search_numpy(namespace_id, queries, now)
+            else:
+                best = self._search_python(namespace_id, queries, now)
+
+            results = []
+            for slot, similarity in best:
+                if slot is None or similarity < self.threshold or self._namespaces[slot] != namespace:
+                    self._misses += 1
+                    results.append(None)
+                    continue
+                self._hits += 1
+                self._last_used[slot] = now
+                results.append((self._values[slot], similarity))
+            return results
+
+    def _search_numpy(self, namespace_id, queries, now):
+        size = self._size
+        live = (self._namespace_ids[:size] == namespace_id) & (self._expires[:size] > now)
+        if not live.any():
+            return [(None, 0.0)] * len(queries)
+        scores = np.asarray(queries, dtype=np.float32) @ self._matrix[:size].T
+        scores[:, ~live] = -np.inf
+        slots = scores.argmax(axis=1)
+        return [(int(slot), float(scores[row, slot])) for row, slot in enumerate(slots)]
+
+    def _search_python(self, namespace_id, queries, now):
+        live = [slot for slot in range(self._size)
+                if self._namespace_ids[slot] == namespace_id and self._expires[slot] > now]
+        best = []
+        for query in queries:
+            scored = [(sum(map(operator.mul, query, self._matrix[slot])), slot) for slot in live]
+            similarity, slot = max(scored) if scored else (0.0, None)
+            best.append((slot, similarity))
+        return best
+
+    def set(self, namespace, embedding, value):
+        """Store ``value`` as the answer for a question with this embedding."""
+        if self.max_entries <= 0:
+            return
+        vector = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            slot = self._free_slot(now)
+            self._namespaces[slot] = namespace
+            self._values[slot] = value
+            self._namespace_ids[slot] = zlib.crc32(namespace.encode('utf-8'))
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            if self.backend == 'numpy':
+                self._matrix[slot] = vector
+            else:
+                self._matrix[slot] = array('f', vector)
+
+    def _free_slot(self, now):
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+        self._evictions += 1
+        if self.backend == 'numpy':
+            expired = np.flatnonzero(self._expires <= now)
+            return int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+        expired = [slot for slot in range(self._size) if self._expires[slot] <= now]
+        return expired[0] if expired else min(range(self._size), key=self._last_used.__getitem__)
+
+    def _unit(self, embedding):
+        vector = [float(value) for value in embedding]
+        if len(vector) != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dimensional embedding, got {len(vector)}")
+        return _normalize(vector)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            entries = sum(1 for slot in range(self._size) if self._expires[slot] > now)
+            return {
+                'backend': self.backend,
+                'dim': self.dim,
+                'threshold': self.threshold,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
@@ -0,0 +1,37 @@
+"""
+Production entrypoint for the FinAI backend.
+Runs app:app under gunicorn with gunicorn.conf.py; extra arguments are passed through to gunicorn.
+"""
+
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def main():
+    try:
+        from gunicorn.app.wsgiapp import WSGIApplication
+    except ImportError:
+        # gunicorn is POSIX-only; fall back to a threaded, non-debug server (single process)
+        logging.basicConfig(level=logging.INFO)
+        logger.warning("gunicorn is not installed; serving with the threaded Werkzeug server in one process")
+        from werkzeug.serving import run_simple
+        from app import app, initialize_snowflake
+
+        if not initialize_snowflake():
+            logger.error("Failed to initialize Snowflake connection. Please check your credentials.")
+            sys.exit(1)
+        run_simple(os.getenv('HOST', '0.0.0.0'), int(os.getenv('PORT', '5000')), app, threaded=True)
+        return
+
+    os.chdir(os.path.dirname(CONFIG_PATH))
+    sys.argv = [sys.argv[0], '--config', CONFIG_PATH, *sys.argv[1:], 'app:app']
+    WSGIApplication('%(prog)s [OPTIONS]').run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Request coalescing for the FinAI backend.
+Concurrent identical Cortex calls share one in-flight Snowflake query instead of each running their own.
+"""
+
+import threading
+
+
+class _Call:
+    """One in-flight execution that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and receive the same result or exception.
+    Keys are tuples whose first element is the endpoint, used for the stats.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executed = {}
+        self._collapsed = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once for all concurrent callers of ``key``."""
+        endpoint = key[0]
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._collapsed[endpoint] = self._collapsed.get(endpoint, 0) + 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed[endpoint] = self._executed.get(endpoint, 0) + 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self):
+        """Return executed and collapsed counts per endpoint plus current in-flight keys."""
+        with self._lock:
+            endpoints = sorted(set(self._executed) | set(self._collapsed))
+            return {
+                'in_flight': len(self._calls),
+                'endpoints': {
+                    endpoint: {
+                        'executed': self._executed.get(endpoint, 0),
+                        'collapsed': self._collapsed.get(endpoint, 0),
+                    }
+                    for endpoint in endpoints
+                },
+            }
@@ -60,6 +60,1615 @@ def test_health_endpoint():
         print(f"❌ Health endpoint test failed: {e}")
         return False
 
+def test_connection_pool():
+    """Test that the pool hands out separate connections and respects max_size."""
+    try:
+        from connection_pool import SnowflakeConnectionPool, PoolExhaustedError
+        
+        class FakeConnection:
+            def __init__(self):
+                self.closed = False
+            def is_closed(self):
+                return self.closed
+            def close(self):
+                self.closed = True
+        
+        pool = SnowflakeConnectionPool(FakeConnection, min_size=1, max_size=2, checkout_timeout=0.1)
+        pool.fill()
+        
+        first = pool.acquire()
+        second = pool.acquire()
+        if first.connection is second.connection:
+            print("❌ Pool returned the same connection twice")
+            return False
+        
+        try:
+            pool.acquire()
+            print("❌ Pool allowed more than max_size checkouts")
+            return False
+        except PoolExhaustedError:
+            pass
+        
+        pool.release(first)
+        pool.release(second, discard=True)
+        stats = pool.stats()
+        if stats['size'] != 1 or stats['idle'] != 1:
+            print(f"❌ Unexpected pool stats after release: {stats}")
+            return False
+        
+        pool.close()
+        print("✅ Connection pool working")
+        print(f"   Stats: {stats}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Connection pool test failed: {e}")
+        return False
+
+def test_pool_keepalive():
+    """Test that keepalive discards dead idle connections and refills the pool."""
+    try:
+        from connection_pool import SnowflakeConnectionPool
+        
+        class FakeConnection:
+            alive = True
+            def is_closed(self):
+                return False
+            def close(self):
+                pass
+        
+        def probe(connection):
+            if not connection.alive:
+                raise RuntimeError("session expired")
+        
+        pool = SnowflakeConnectionPool(FakeConnection, min_size=1, max_size=2, liveness_ttl=0, probe=probe)
+        pool.fill()
+        
+        dead = pool.acquire()
+        dead.connection.alive = False
+        pool.release(dead)
+        
+        probed = pool.keepalive()
+        replacement = pool.acquire()
+        if probed != 1 or replacement is dead or pool.size != 1:
+            print("❌ Keepalive did not replace the dead connection")
+            return False
+        
+        pool.release(replacement)
+        pool.close()
+        print("✅ Pool keepalive working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Pool keepalive test failed: {e}")
+        return False
+
+def test_fraud_batch():
+    """Test that batch fraud scoring keeps input order and reports per-item errors."""
+    try:
+        import json
+        from app import SnowflakeCortexAI
+        
+        cortex_ai = SnowflakeCortexAI()
+        cortex_ai.fraud_batch_chunk_size = 2
+        
+        def fake_fetch_all(query, params, **kwargs):
+            contexts = json.loads(params[-1])
+            rows = []
+            for index, context in enumerate(contexts):
+                score = None if 'FAIL' in context else json.dumps({'risk_score': index, 'risk_level': 'Low'})
+                rows.append({'ITEM_INDEX': index, 'FRAUD_ANALYSIS': score})
+            return list(reversed(rows))
+        
+        cortex_ai._fetch_all = fake_fetch_all
+        result = cortex_ai.analyze_fraud_batch([
+            {'id': 'TXN001', 'amount': 10},
+            {'id': 'TXN002', 'merchant': 'FAIL'},
+            'not a transaction',
+            {'id': 'TXN004', 'amount': 20},
+        ])
+        
+        ids = [item.get('id') for item in result['results']]
+        if ids != ['TXN001', 'TXN002', None, 'TXN004'] or result['errors'] != 2:
+            print(f"❌ Unexpected batch result: {result}")
+            return False
+        
+        print("✅ Fraud batch scoring working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fraud batch test failed: {e}")
+        return False
+
+def test_response_cache():
+    """Test LRU eviction, TTL expiry and hit/miss counting in the response cache."""
+    try:
+        import time
+        from response_cache import ResponseCache
+        
+        cache = ResponseCache(max_entries=2, ttls={'fraud': 60, 'chat': 0.05})
+        first = cache.make_key('fraud', 'model', 'Amount:  $10')
+        second = cache.make_key('fraud', 'model', 'Amount: $20')
+        third = cache.make_key('fraud', 'model', 'Amount: $30')
+        
+        cache.set(first, {'risk_score': 10})
+        cache.set(second, {'risk_score': 20})
+        cache.get(first)  # first is now most recently used
+        cache.set(third, {'risk_score': 30})
+        
+        if cache.get(cache.make_key('fraud', 'model', 'Amount: $10')) != {'risk_score': 10}:
+            print("❌ Normalized prompt missed the cache")
+            return False
+        if cache.get(second) is not None:
+            print("❌ Least recently used entry was not evicted")
+            return False
+        
+        chat = cache.make_key('chat', 'model', 'hello')
+        cache.set(chat, {'response': 'hi'})
+        time.sleep(0.1)
+        if cache.get(chat) is not None:
+            print("❌ Expired entry was returned")
+            return False
+        
+        stats = cache.stats()
+        if stats['endpoints']['fraud'] != {'hits': 2, 'misses': 1, 'ttl': 60}:
+            print(f"❌ Unexpected cache counters: {stats}")
+            return False
+        
+        print("✅ Response cache working")
+        print(f"   Stats: {stats['endpoints']}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Response cache test failed: {e}")
+        return False
+
+def test_fraud_prescreen():
+    """Test that the pre-screen clears benign purchases and escalates unusual ones."""
+    try:
+        from fraud_prescreen import FraudPrescreen, parse_timestamp
+        
+        prescreen = FraudPrescreen(small_amount=100, min_history=3)
+        for day, amount in enumerate([120, 150, 130, 140]):
+            prescreen.observe('CUST001', amount, 'New York, NY', f'2024-01-1{day}T09:00:00Z')
+        
+        typical = prescreen.screen({'customer_id': 'CUST001', 'amount': 135,
+                                    'location': 'New York, NY', 'timestamp': '2024-01-15T10:00:00Z'})
+        unusual = prescreen.screen({'customer_id': 'CUST001', 'amount': 2500,
+                                    'location': 'New York, NY', 'timestamp': '2024-01-15T11:00:00Z'})
+        new_city = prescreen.screen({'customer_id': 'CUST001', 'amount': 20,
+                                     'location': 'Miami, FL', 'timestamp': '2024-01-15T12:00:00Z'})
+        
+        # A first purchase has no baseline, however small
+        newcomer = prescreen.screen({'customer_id': 'CUST002', 'amount': 15,
+                                     'location': 'New York, NY', 'timestamp': '2024-01-15T12:00:00Z'})
+        
+        if not typical or typical['risk_level'] != 'Low' or unusual or new_city or newcomer:
+            print(f"❌ Unexpected verdicts: {typical}, {unusual}, {new_city}, {newcomer}")
+            return False
+        
+        stats = prescreen.stats()
+        if stats['fast_path'] != 1 or stats['escalated'] != 3:
+            print(f"❌ Unexpected pre-screen counters: {stats}")
+            return False
+        
+        # History older than the window is no baseline, even if nothing newer was observed since
+        stale = prescreen.screen({'customer_id': 'CUST001', 'amount': 135,
+                                  'location': 'New York, NY', 'timestamp': '2024-06-15T10:00:00Z'})
+        stale_features = prescreen._windows['CUST001'].features(
+            parse_timestamp('2024-06-15T10:00:00Z'), 135, 'New York, NY')
+        if stale or stale_features['history_count'] or stale_features['known_location']:
+            print(f"❌ Stale history used as a baseline: {stale}, {stale_features}")
+            return False
+        
+        # Screening unknown customers must not create windows that evict real ones
+        flood = FraudPrescreen(max_customers=2)
+        flood.observe('CUST001', 50, 'New York, NY', '2024-01-10T09:00:00Z')
+        for index in range(5):
+            flood.screen({'customer_id': f'NEW{index}', 'amount': 20, 'location': 'New York, NY',
+                          'timestamp': '2024-01-15T10:00:00Z'})
+        if list(flood._windows) != ['CUST001']:
+            print(f"❌ Screening created customer windows: {list(flood._windows)}")
+            return False
+        
+        # Screening alone leaves history untouched; retried IDs are recorded once
+        purchase = {'id': 'TXN-9', 'customer_id': 'CUST003', 'amount': 40,
+                    'location': 'Austin, TX', 'timestamp': '2024-01-15T12:00:00Z'}
+        for _ in range(3):
+            prescreen.screen(purchase)
+            prescreen.record(purchase)
+        history = prescreen.screen({**purchase, 'id': 'TXN-10'})
+        if history is not None or prescreen._windows['CUST003'].features(
+                parse_timestamp(purchase['timestamp']), 40, 'Austin, TX')['history_count'] != 1:
+            print(f"❌ Retried transaction recorded more than once: {prescreen._windows['CUST003'].events}")
+            return False
+        
+        print("✅ Fraud pre-screen working")
+        print(f"   Stats: {stats}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fraud pre-screen test failed: {e}")
+        return False
+
+def test_fraud_scores_stream():
+    """Test that stored fraud scores stream back as gzip-compressed NDJSON."""
+    try:
+        import gzip
+        import json
+        from app import app, cortex_ai
+        
+        pages = [
+            [{'TRANSACTION_ID': 'TXN001', 'RISK_SCORE': 15}, {'TRANSACTION_ID': 'TXN002', 'RISK_SCORE': 25}],
+            [{'TRANSACTION_ID': 'TXN003', 'RISK_SCORE': 95}],
+        ]
+        original = cortex_ai.ensure_connection, cortex_ai.iter_fraud_scores
+        cortex_ai.ensure_connection = lambda: True
+        cortex_ai.iter_fraud_scores = lambda page_size, since: iter(pages)
+        
+        try:
+            with app.test_client() as client:
+                response = client.get('/api/fraud/scores?page_size=2')
+                body = gzip.decompress(response.get_data())
+        finally:
+            cortex_ai.ensure_connection, cortex_ai.iter_fraud_scores = original
+        
+        rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        if response.headers.get('Content-Encoding') != 'gzip' or [r['TRANSACTION_ID'] for r in rows] != ['TXN001', 'TXN002', 'TXN003']:
+            print(f"❌ Unexpected stream: {response.headers} {rows}")
+            return False
+        
+        print("✅ Fraud score streaming working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fraud score streaming test failed: {e}")
+        return False
+
+def test_chat_event_stream():
+    """Test that chat streams sentence chunks over SSE when the client asks for it."""
+    try:
+        from app import app, cortex_ai
+        
+        original = cortex_ai.ensure_connection, cortex_ai.financial_chat, cortex_ai.chat_streaming
+        cortex_ai.ensure_connection = lambda: True
+        cortex_ai.chat_streaming = 'sentence'
+        cortex_ai.financial_chat = lambda question, context=None, use_cache=True, tier=None, deadline=None, session=None: {
+            'response': 'Pay off high-interest debt first. Then invest the rest!'
+        }
+        
+        try:
+            with app.test_client() as client:
+                response = client.post('/api/chat/financial', json={'question': 'Debt or invest?'},
+                                       headers={'Accept': 'text/event-stream', 'X-Cache-Bypass': '1'})
+                body = response.get_data(as_text=True)
+        finally:
+            cortex_ai.ensure_connection, cortex_ai.financial_chat, cortex_ai.chat_streaming = original
+        
+        if not response.mimetype == 'text/event-stream' or body.count('data: {"delta"') != 2 or 'event: done' not in body:
+            print(f"❌ Unexpected event stream: {body!r}")
+            return False
+        
+        print("✅ Chat event stream working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chat event stream test failed: {e}")
+        return False
+
+def test_chat_rest_streaming():
+    """Test that chat relays Cortex REST tokens, reports mid-stream errors and falls back to sentences without a token."""
+    try:
+        import json
+        import urllib.request
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai
+        
+        class StubStream:
+            def __init__(self, tokens, error=None):
+                self.lines = [f'data: {json.dumps({"choices": [{"delta": {"content": token}}]})}\n'.encode('utf-8')
+                              for token in tokens]
+                self.error = error
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc_info):
+                return False
+            
+            def __iter__(self):
+                for line in self.lines:
+                    yield line
+                    yield b'\n'
+                if self.error is not None:
+                    raise self.error
+                yield b'data: [DONE]\n'
+        
+        requests_sent, streams = [], []
+        
+        def stub_urlopen(http_request, timeout=None):
+            requests_sent.append(http_request)
+            return streams.pop(0)
+        
+        def chat(client):
+            response = client.post('/api/chat/financial', json={'question': 'Debt or invest?'},
+                                   headers={'Accept': 'text/event-stream', 'X-Cache-Bypass': '1'})
+            return response.get_data(as_text=True)
+        
+        def complete_statements():
+            return sum('COMPLETE' in entry['QUERY_TEXT'] for entry in fake_snowflake.query_history)
+        
+        original_config, original_urlopen = fake_snowflake.config, urllib.request.urlopen
+        original_streaming = cortex_ai.chat_streaming, cortex_ai._chat_rest_retry_at
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+            rest_api=True,
+        )
+        urllib.request.urlopen = stub_urlopen
+        cortex_ai.chat_streaming, cortex_ai._chat_rest_retry_at = 'rest', 0.0
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    statements_before = complete_statements()
+                    streams.append(StubStream(['Pay off debt', ' first.']))
+                    streamed = chat(client)
+                    rest_statements = complete_statements() - statements_before
+                    
+                    streams.append(StubStream(['Pay off'], error=ConnectionResetError('connection reset')))
+                    interrupted = chat(client)
+                    retry_at_after_interruption = cortex_ai._chat_rest_retry_at
+            
+            # Sessions without a REST token fall back to SQL COMPLETE, one sentence at a time
+            fake_snowflake.configure(rest_api=False)
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    sent_before = len(requests_sent)
+                    fallback = chat(client)
+                    fell_back_without_request = len(requests_sent) == sent_before
+                    retry_at_after_fallback = cortex_ai._chat_rest_retry_at
+        finally:
+            fake_snowflake.config = original_config
+            urllib.request.urlopen = original_urlopen
+            cortex_ai.chat_streaming, cortex_ai._chat_rest_retry_at = original_streaming
+        
+        if '"delta": "Pay off debt"' not in streamed or '"delta": " first."' not in streamed or \
+                'event: done' not in streamed or rest_statements:
+            print(f"❌ REST tokens not relayed ({rest_statements} COMPLETE statements): {streamed!r}")
+            return False
+        if not requests_sent[0].full_url.endswith('/api/v2/cortex/inference:complete') or \
+                not requests_sent[0].get_header('Authorization', '').startswith('Snowflake Token="'):
+            print(f"❌ Unexpected REST request: {requests_sent[0].full_url} {requests_sent[0].headers}")
+            return False
+        if '"delta": "Pay off"' not in interrupted or 'event: error' not in interrupted or \
+                'event: done' in interrupted or interrupted.count('"delta"') != 1 or retry_at_after_interruption:
+            print(f"❌ Mid-stream error not reported as an error event: {interrupted!r}")
+            return False
+        if not fell_back_without_request or 'event: done' not in fallback or fallback.count('"delta"') < 1 or \
+                not retry_at_after_fallback:
+            print(f"❌ Missing REST token did not fall back to sentence chunks: {fallback!r}")
+            return False
+        
+        print("✅ Chat REST token streaming working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chat REST streaming test failed: {e}")
+        return False
+
+def test_async_jobs():
+    """Test async submission returns a job ID and polling collects the result."""
+    try:
+        import json
+        from app import app, cortex_ai
+        from circuit_breaker import CircuitOpenError
+        from connection_pool import SnowflakeConnectionPool
+        
+        class FakeCursor:
+            sfqid = None
+            def execute_async(self, query, params, **kwargs):
+                FakeCursor.sfqid = 'query-1'
+            def get_results_from_sfqid(self, sfqid):
+                self.row = {'RISK_ASSESSMENT': json.dumps({'credit_score': 720, 'risk_category': 'Low'})}
+            def fetchone(self):
+                return self.row
+            def close(self):
+                pass
+        
+        class FakeConnection:
+            polls = 0
+            def cursor(self, cursor_class=None):
+                return FakeCursor()
+            def get_query_status_throw_if_error(self, query_id):
+                FakeConnection.polls += 1
+                return 'RUNNING' if FakeConnection.polls == 1 else 'SUCCESS'
+            def is_still_running(self, status):
+                return status == 'RUNNING'
+            def is_closed(self):
+                return False
+            def close(self):
+                pass
+        
+        def circuit_open(job):
+            raise CircuitOpenError('Snowflake', 4.2)
+        
+        original = cortex_ai.ensure_connection, cortex_ai.pool, cortex_ai.refresh_job
+        cortex_ai.ensure_connection = lambda: True
+        cortex_ai.pool = SnowflakeConnectionPool(FakeConnection)
+        
+        try:
+            with app.test_client() as client:
+                submitted = client.post('/api/risk/assess?async=true', json={'income': 91000, 'defaults': 0},
+                                        headers={'X-Cache-Bypass': '1'})
+                job_id = submitted.get_json()['job_id']
+                running = client.get(f'/api/jobs/{job_id}').get_json()
+                finished = client.get(f'/api/jobs/{job_id}?wait=2').get_json()
+                
+                pending_id = client.post('/api/risk/assess?async=true', json={'income': 52000, 'defaults': 1},
+                                         headers={'X-Cache-Bypass': '1'}).get_json()['job_id']
+                cortex_ai.refresh_job = circuit_open
+                unavailable = client.get(f'/api/jobs/{pending_id}')
+        finally:
+            cortex_ai.pool.close()
+            cortex_ai.ensure_connection, cortex_ai.pool, cortex_ai.refresh_job = original
+        
+        if submitted.status_code != 202 or running['status'] != 'running' or finished['status'] != 'succeeded':
+            print(f"❌ Unexpected job lifecycle: {submitted.status_code} {running} {finished}")
+            return False
+        if finished['result']['credit_score'] != 720:
+            print(f"❌ Unexpected job result: {finished}")
+            return False
+        if unavailable.status_code != 503 or unavailable.headers.get('Retry-After') != '5':
+            print(f"❌ Polling with the circuit open: {unavailable.status_code} {unavailable.headers}")
+            return False
+        
+        print("✅ Async jobs working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Async jobs test failed: {e}")
+        return False
+
+def test_single_flight():
+    """Test that concurrent identical calls share one execution."""
+    try:
+        import threading
+        import time
+        from single_flight import SingleFlight
+        
+        single_flight = SingleFlight()
+        executions = []
+        
+        def slow_query():
+            executions.append(1)
+            time.sleep(0.2)
+            return {'SENTIMENT_SCORE': 0.85}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight.do(('sentiment', 'headline'), slow_query)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = single_flight.stats()['endpoints']['sentiment']
+        if len(executions) != 1 or len(results) != 5 or stats != {'executed': 1, 'collapsed': 4}:
+            print(f"❌ Calls were not coalesced: {len(executions)} executions, stats {stats}")
+            return False
+        
+        print("✅ Single-flight coalescing working")
+        print(f"   Stats: {stats}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Single-flight test failed: {e}")
+        return False
+
+def test_metrics_endpoint():
+    """Test that /api/metrics exposes request latency histograms."""
+    try:
+        from app import app
+        
+        with app.test_client() as client:
+            client.get('/api/health')
+            response = client.get('/api/metrics')
+            body = response.get_data(as_text=True)
+        
+        expected = 'finai_request_duration_seconds_count{endpoint="/api/health",method="GET",status="200"}'
+        if response.status_code != 200 or expected not in body or '# TYPE finai_snowflake_execute_seconds histogram' not in body:
+            print(f"❌ Unexpected metrics output:\n{body}")
+            return False
+        
+        print("✅ Metrics endpoint working")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Metrics endpoint test failed: {e}")
+        return False
+
+def test_benchmark():
+    """Test the load-testing harness against the fake Snowflake connector."""
+    try:
+        import fake_snowflake
+        from benchmark import run_benchmark, SCENARIOS
+        from fake_snowflake import LatencyModel
+        from app import cortex_ai
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        original_pool = cortex_ai.pool
+        try:
+            fake_snowflake.configure(
+                cortex_latency=LatencyModel(kind='constant', median=0.001),
+                query_latency=LatencyModel(kind='constant', median=0),
+                connect_latency=LatencyModel(kind='constant', median=0),
+            )
+            results = run_benchmark(concurrency=4, requests=len(SCENARIOS) * 2, label='test')
+        finally:
+            fake_snowflake.config = original_config
+        
+        if cortex_ai.pool is not original_pool:
+            print("❌ Benchmark did not restore the original connection pool")
+            return False
+        if set(results['routes']) != set(SCENARIOS) or results['overall']['errors']:
+            print(f"❌ Unexpected benchmark results: {results['overall']}")
+            return False
+        if results['overall']['p99_ms'] is None or results['overall']['rps'] <= 0:
+            print(f"❌ Missing percentiles or throughput: {results['overall']}")
+            return False
+        
+        print(f"✅ Benchmark harness working ({results['overall']['requests']} requests, "
+              f"p95 {results['overall']['p95_ms']} ms)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Benchmark test failed: {e}")
+        return False
+
+def test_fast_startup():
+    """Test lazy imports, cached private key material and parallel pool pre-warming."""
+    try:
+        import subprocess
+        import tempfile
+        import time
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from connection_pool import SnowflakeConnectionPool
+        from app import cortex_ai
+        
+        # A fresh interpreter shows whether importing the app pulls in the heavy packages
+        probe = subprocess.run(
+            [sys.executable, '-c', "import sys, app; print(any(m in sys.modules for m in "
+                                   "('snowflake.connector', 'cryptography.hazmat.primitives.serialization')))"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=60)
+        if probe.stdout.strip().splitlines()[-1:] != ['False']:
+            print(f"❌ Heavy imports loaded at app import: {probe.stdout or probe.stderr}")
+            return False
+        
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+        with tempfile.NamedTemporaryFile(suffix='.p8', delete=False) as key_file:
+            key_file.write(pem)
+        
+        reads = []
+        original_read = cortex_ai._read_private_key
+        cortex_ai._read_private_key = lambda *args: reads.append(args) or original_read(*args)
+        try:
+            first = cortex_ai._load_private_key(key_file.name)
+            second = cortex_ai._load_private_key(key_file.name)
+            stat = os.stat(key_file.name)
+            os.utime(key_file.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            third = cortex_ai._load_private_key(key_file.name)
+        finally:
+            cortex_ai._read_private_key = original_read
+            os.unlink(key_file.name)
+        
+        if not first or first != second or first != third or len(reads) != 2:
+            print(f"❌ Private key was parsed {len(reads)} times, expected 2")
+            return False
+        
+        class SlowConnection:
+            def __init__(self):
+                time.sleep(0.2)
+            def is_closed(self):
+                return False
+            def close(self):
+                pass
+        
+        pool = SnowflakeConnectionPool(SlowConnection, min_size=1, max_size=4)
+        started = time.perf_counter()
+        opened = pool.prewarm(6)
+        elapsed = time.perf_counter() - started
+        stats = pool.stats()
+        pool.close()
+        
+        if opened != 4 or stats['idle'] != 4 or elapsed > 0.6:
+            print(f"❌ Pre-warm opened {opened} connections in {elapsed:.2f}s: {stats}")
+            return False
+        
+        print(f"✅ Fast startup working (4 connections pre-warmed in {elapsed:.2f}s)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fast startup test failed: {e}")
+        return False
+
+def test_model_routing():
+    """Test tier selection, COMPLETE options and fallback when the latency budget is exceeded."""
+    try:
+        import json
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai
+        
+        router = cortex_ai.router
+        original_config, original_policies = fake_snowflake.config, dict(router.policies)
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0.001),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+            model_latency={router.tiers['fast']: LatencyModel(kind='constant', median=1.0)},
+        )
+        router.policies['fraud'] = ('fast', 64, 0.0, 0.1)
+        transaction = {'amount': 900, 'merchant': 'Unknown', 'location': 'Unknown'}
+        
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                slow = cortex_ai.analyze_fraud(transaction, use_cache=False)
+                accurate = cortex_ai.analyze_fraud(transaction, use_cache=False, tier='accurate')
+                with app.test_client() as client:
+                    rejected = client.post('/api/fraud/analyze?tier=premium', json=transaction)
+        finally:
+            fake_snowflake.config = original_config
+            router.policies = original_policies
+        
+        if slow.get('model') != router.fallbacks['fast'] or accurate.get('model') != router.tiers['accurate']:
+            print(f"❌ Unexpected models: fallback={slow.get('model')}, accurate={accurate.get('model')}")
+            return False
+        if rejected.status_code != 400:
+            print(f"❌ Unknown tier returned {rejected.status_code}")
+            return False
+        if json.loads(router.route('chat', 'fast').options) != {'max_tokens': 1024, 'temperature': 0.7}:
+            print(f"❌ Unexpected COMPLETE options: {router.route('chat', 'fast').options}")
+            return False
+        
+        print(f"✅ Model routing working (fell back to {slow['model']})")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Model routing test failed: {e}")
+        return False
+
+def test_budget_timeouts_keep_breaker_closed():
+    """Test that latency-budget timeouts fall back to the smaller model without opening the circuit breaker."""
+    try:
+        import fake_snowflake
+        from concurrent.futures import ThreadPoolExecutor
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from circuit_breaker import CircuitBreaker
+        from app import app, cortex_ai
+        
+        router = cortex_ai.router
+        original_config, original_policies = fake_snowflake.config, dict(router.policies)
+        original_breaker = cortex_ai.breaker
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0.001),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+            model_latency={router.tiers['fast']: LatencyModel(kind='constant', median=0.5)},
+        )
+        router.policies['fraud'] = ('fast', 64, 0.0, 0.1)
+        cortex_ai.breaker = CircuitBreaker('Snowflake', failure_threshold=2, backoff=5)
+        
+        def analyze(variant):
+            with app.test_client() as client:
+                return client.post('/api/fraud/analyze', headers={'Cache-Control': 'no-cache'},
+                                   json={'amount': 900 + variant, 'merchant': 'Unknown', 'location': 'Unknown'})
+        
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    responses = list(executor.map(analyze, range(8)))
+            breaker = cortex_ai.breaker.stats()
+        finally:
+            fake_snowflake.config = original_config
+            router.policies = original_policies
+            cortex_ai.breaker = original_breaker
+        
+        statuses = [response.status_code for response in responses]
+        models = {response.get_json().get('model') for response in responses}
+        if statuses != [200] * 8 or models != {router.fallbacks['fast']}:
+            print(f"❌ Budget timeouts did not fall back: {statuses}, {models}")
+            return False
+        if breaker['state'] != 'closed' or breaker['trips']:
+            print(f"❌ Budget timeouts tripped the circuit breaker: {breaker}")
+            return False
+        
+        print(f"✅ Budget timeouts fell back to {router.fallbacks['fast']} with the breaker closed")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Budget timeout breaker test failed: {e}")
+        return False
+
+def test_request_deadline():
+    """Test that a request past its deadline gets a 504 and its Snowflake query is cancelled."""
+    try:
+        import time
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai, QUERIES_CANCELLED
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=2.0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        transaction = {'amount': 450, 'merchant': 'Unknown', 'location': 'Unknown'}
+        cancelled = lambda: sum(value for name, value in QUERIES_CANCELLED.samples() if 'endpoint="fraud"' in name)
+        cancelled_before = cancelled()
+        
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    started = time.perf_counter()
+                    response = client.post('/api/fraud/analyze', json=transaction,
+                                           headers={'X-Request-Timeout': '0.2', 'Cache-Control': 'no-cache'})
+                    elapsed = time.perf_counter() - started
+        finally:
+            fake_snowflake.config = original_config
+        
+        if response.status_code != 504 or response.get_json().get('reason') != 'expired':
+            print(f"❌ Expected 504/expired, got {response.status_code}: {response.get_json()}")
+            return False
+        if elapsed > 1.0:
+            print(f"❌ Deadline not enforced promptly ({elapsed:.2f}s)")
+            return False
+        if cancelled() != cancelled_before + 1:
+            print("❌ Timed-out query was not cancelled")
+            return False
+        
+        print(f"✅ Request deadline working (504 after {elapsed:.2f}s, query cancelled)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Request deadline test failed: {e}")
+        return False
+
+def test_news_sentiment_scoring():
+    """Test incremental market_news scoring, stored score lookups and sector aggregation."""
+    try:
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    scored = client.post('/api/market/news/score', json={}).get_json()
+                    article = client.get('/api/market/news/NEWS002/sentiment')
+                    banking = client.get('/api/market/news/sentiment?sector=Banking').get_json()
+                    missing = client.get('/api/market/news/NEWS999/sentiment')
+                    sectors = client.get('/api/market/sentiment/sectors?sector=Banking&bucket=1d').get_json()
+                    invalid_bucket = client.get('/api/market/sentiment/sectors?bucket=fortnight')
+        finally:
+            fake_snowflake.config = original_config
+        
+        if scored.get('scored') != 3 or not scored.get('watermark'):
+            print(f"❌ Unexpected scoring run: {scored}")
+            return False
+        if article.status_code != 200 or article.get_json().get('impact_level') != 'Medium':
+            print(f"❌ Unexpected stored score: {article.status_code} {article.get_json()}")
+            return False
+        if banking.get('count') != 2 or missing.status_code != 404:
+            print(f"❌ Unexpected sector lookup ({banking}) or missing article status {missing.status_code}")
+            return False
+        
+        if sectors.get('articles') != 2 or [series['sector'] for series in sectors['series']] != ['Banking']:
+            print(f"❌ Unexpected sector aggregation: {sectors}")
+            return False
+        if invalid_bucket.status_code != 400:
+            print(f"❌ Invalid bucket returned {invalid_bucket.status_code}")
+            return False
+        
+        print(f"✅ News sentiment scoring working (scored {scored['scored']}, watermark {scored['watermark']})")
+        return True
+        
+    except Exception as e:
+        print(f"❌ News sentiment scoring test failed: {e}")
+        return False
+
+def test_customer_risk_lookup():
+    """Test risk assessment by customer ID and portfolio assessment by IDs and filter."""
+    try:
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        cortex_ai.risk_batch_chunk_size = 1
+        
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    single = client.get('/api/risk/assess/CUST002')
+                    missing = client.get('/api/risk/assess/CUST999')
+                    by_ids = client.post('/api/risk/portfolio',
+                                         json={'customer_ids': ['CUST003', 'CUST999', 'CUST001']}).get_json()
+                    by_filter = client.post('/api/risk/portfolio',
+                                            json={'filter': {'min_credit_score': 700}}).get_json()
+                    bad_filter = client.post('/api/risk/portfolio', json={'filter': {'ssn': '123'}})
+        finally:
+            fake_snowflake.config = original_config
+            cortex_ai.risk_batch_chunk_size = 25
+        
+        if single.status_code != 200 or single.get_json().get('credit_score') != 720 or missing.status_code != 404:
+            print(f"❌ Unexpected lookup: {single.status_code} {single.get_json()}, missing {missing.status_code}")
+            return False
+        if [item['customer_id'] for item in by_ids['results']] != ['CUST003', 'CUST999', 'CUST001'] \
+                or by_ids['errors'] != 1:
+            print(f"❌ Unexpected portfolio by IDs: {by_ids}")
+            return False
+        if by_filter.get('count') != 2 or by_filter.get('risk_categories') != {'Low': 2}:
+            print(f"❌ Unexpected portfolio by filter: {by_filter}")
+            return False
+        if bad_filter.status_code != 400:
+            print(f"❌ Unknown filter key returned {bad_filter.status_code}")
+            return False
+        
+        print(f"✅ Customer risk lookup working ({by_ids['count']} IDs, {by_filter['count']} by filter)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Customer risk lookup test failed: {e}")
+        return False
+
+def test_chat_sessions():
+    """Test chat session LRU eviction, bounded history and background compaction."""
+    try:
+        import time
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from chat_sessions import ChatSessionStore, estimate_tokens
+        from app import app, cortex_ai
+        
+        store = ChatSessionStore(summarizer=lambda summary, turns: f"{len(turns)} earlier turns",
+                                 max_sessions=2, token_budget=100, keep_turns=2)
+        first, second = store.create(), store.create()
+        store.get(first.id)  # first is now most recently used
+        store.create()
+        if store.get(second.id) is not None or store.get(first.id) is None:
+            print("❌ Least recently used session was not evicted")
+            return False
+        
+        for turn in range(10):
+            store.record_turn(first, f"Question {turn} " + 'x' * 80, 'Answer ' + 'y' * 80)
+        for _ in range(50):
+            if not first.compacting:
+                break
+            time.sleep(0.01)
+        history = first.history(store.token_budget)
+        if estimate_tokens(history) > store.token_budget or not first.summary or store.stats()['compactions'] < 1:
+            print(f"❌ History not bounded or compacted: {first.to_dict()}")
+            return False
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    session_id = client.post('/api/chat/sessions').get_json()['session_id']
+                    for turn in range(3):
+                        reply = client.post('/api/chat/financial',
+                                            json={'question': f'Turn {turn}: how do I budget?', 'session_id': session_id})
+                    state = client.get(f'/api/chat/sessions/{session_id}').get_json()
+                    expired = client.post('/api/chat/financial', json={'question': 'Hi', 'session_id': 'gone'})
+        finally:
+            fake_snowflake.config = original_config
+        
+        if reply.get_json().get('session_id') != session_id or state.get('turns') != 3:
+            print(f"❌ Unexpected session state: {state}")
+            return False
+        if expired.status_code != 404:
+            print(f"❌ Unknown session returned {expired.status_code}")
+            return False
+        
+        print(f"✅ Chat sessions working ({first.compactions} compactions, history {estimate_tokens(history)} tokens)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chat sessions test failed: {e}")
+        return False
+
+def test_semantic_chat_cache():
+    """Test that reworded chat questions reuse a stored answer and unrelated ones do not."""
+    try:
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        import semantic_cache
+        from semantic_cache import SemanticCache, hashing_embedding
+        from app import app, cortex_ai
+        
+        # Cover both index implementations; NumPy must be picked whenever it is installed
+        backends = ['python'] + (['numpy'] if semantic_cache.np is not None else [])
+        if SemanticCache(dim=8).backend != backends[-1]:
+            print(f"❌ Semantic cache did not default to {backends[-1]}: {SemanticCache(dim=8).backend}")
+            return False
+        for backend in backends:
+            cache = SemanticCache(dim=256, threshold=0.9, max_entries=2, backend=backend)
+            cache.set('model', hashing_embedding('How do index funds work?'), {'response': 'index'})
+            cache.set('model', hashing_embedding('Should I pay off debt or invest?'), {'response': 'debt'})
+            cache.set('model', hashing_embedding('What is a good emergency fund size?'), {'response': 'fund'})
+            match = cache.get('model', hashing_embedding('should i pay off my debts or invest'))
+            if match is None or match[0]['response'] != 'debt' or cache.stats()['evictions'] != 1:
+                print(f"❌ Reworded question missed the {backend} semantic cache: {match}, {cache.stats()}")
+                return False
+            if cache.get('model', hashing_embedding('Should I buy or sell gold?')) is not None \
+                    or cache.get('other-model', hashing_embedding('Should I pay off debt or invest?')) is not None:
+                print(f"❌ {backend} semantic cache matched an unrelated question or another namespace")
+                return False
+        
+        original_config = fake_snowflake.config
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+            embed_latency=LatencyModel(kind='constant', median=0),
+        )
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                hits_before = cortex_ai.semantic_cache.stats()['hits']
+                with app.test_client() as client:
+                    first = client.post('/api/chat/financial', json={'question': 'Should I pay off my debt or invest?'})
+                    reworded = client.post('/api/chat/financial', json={'question': 'should i pay off debt, or invest'})
+                    other = client.post('/api/chat/financial', json={'question': 'How do index funds work?'})
+                    stats = client.get('/api/cache/stats').get_json()['semantic']
+        finally:
+            fake_snowflake.config = original_config
+        
+        if 'semantic_similarity' in first.get_json() or 'semantic_similarity' not in reworded.get_json():
+            print(f"❌ Unexpected semantic cache responses: {first.get_json()}, {reworded.get_json()}")
+            return False
+        if 'semantic_similarity' in other.get_json() or stats['hits'] - hits_before != 1 or stats['entries'] != 2:
+            print(f"❌ Unexpected semantic cache stats: {stats}")
+            return False
+        
+        print(f"✅ Semantic chat cache working ({stats['backend']} index, "
+              f"similarity {reworded.get_json()['semantic_similarity']})")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Semantic chat cache test failed: {e}")
+        return False
+
+def test_slow_query_log():
+    """Test that statements carry the request trace ID as QUERY_TAG and slow ones are logged with their query ID."""
+    try:
+        import json
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from query_log import SlowQueryLog
+        from app import app, cortex_ai
+        
+        original_config, original_log = fake_snowflake.config, cortex_ai.slow_queries
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0.05),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        cortex_ai.slow_queries = SlowQueryLog(threshold=0.03, max_entries=2)
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    headers = {'X-Trace-ID': 'trace-risk-1', 'X-Cache-Bypass': '1'}
+                    response = client.post('/api/risk/assess', json={'income': 91000, 'defaults': 0}, headers=headers)
+                    client.get('/api/risk/assess/CUST001', headers={'X-Cache-Bypass': '1'})
+                    for income in (50000, 60000):
+                        client.post('/api/risk/assess', json={'income': income}, headers={'X-Cache-Bypass': '1'})
+                    slow = client.get('/api/debug/slow-queries').get_json()
+                    traced = client.get('/api/debug/slow-queries?trace_id=trace-risk-1').get_json()
+                    generated = client.get('/api/health').headers.get('X-Trace-ID')
+        finally:
+            fake_snowflake.config = original_config
+            cortex_ai.slow_queries = original_log
+        
+        if response.headers.get('X-Trace-ID') != 'trace-risk-1' or not generated or generated == 'trace-risk-1':
+            print(f"❌ Unexpected trace IDs: {response.headers.get('X-Trace-ID')}, {generated}")
+            return False
+        if len(slow['queries']) != 2 or slow['slow'] != 4 or slow['recorded'] <= slow['slow']:
+            print(f"❌ Slow-query ring buffer not bounded or fast queries logged: {slow}")
+            return False
+        
+        tags = {entry['QUERY_ID']: json.loads(entry['QUERY_TAG']) for entry in fake_snowflake.query_history
+                if entry['QUERY_TAG']}
+        if traced['queries']:
+            print(f"❌ Evicted entry still returned: {traced}")
+            return False
+        newest = slow['queries'][0]
+        tag = tags.get(newest['query_id'], {})
+        if tag.get('endpoint') != 'risk' or tag.get('trace_id') != newest['trace_id'] or newest['prompt_chars'] <= 0:
+            print(f"❌ Slow query not joinable to its query tag: {newest}, {tag}")
+            return False
+        if not any(tag.get('trace_id') == 'trace-risk-1' for tag in tags.values()):
+            print("❌ Client trace ID was not carried into QUERY_TAG")
+            return False
+        
+        print(f"✅ Slow-query log working ({newest['total_ms']}ms, query {newest['query_id'][:8]})")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Slow-query log test failed: {e}")
+        return False
+
+def test_circuit_breaker():
+    """Test that Snowflake outages open the circuit, fail fast with 503 and recover through a half-open probe."""
+    try:
+        import time
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from circuit_breaker import CircuitBreaker, CircuitOpenError
+        from app import app, cortex_ai
+        
+        breaker = CircuitBreaker('test', failure_threshold=2, backoff=0.05)
+        for _ in range(2):
+            breaker.allow()
+            breaker.failure(RuntimeError('down'))
+        try:
+            breaker.allow()
+            print("❌ Open breaker let a call through")
+            return False
+        except CircuitOpenError as e:
+            if not 0 < e.retry_after <= 0.05:
+                print(f"❌ Backoff outside its jitter window: {e.retry_after}")
+                return False
+        time.sleep(0.06)
+        breaker.allow()  # this thread becomes the half-open probe
+        if breaker.state != 'half_open':
+            print(f"❌ Breaker did not half-open after the backoff: {breaker.state}")
+            return False
+        breaker.success()
+        if breaker.state != 'closed':
+            print(f"❌ Successful probe did not close the breaker: {breaker.state}")
+            return False
+        
+        # A burst of in-flight calls failing after the trip opens the circuit once, for the base backoff
+        burst = CircuitBreaker('test', failure_threshold=2, backoff=1.0)
+        for _ in range(12):
+            burst.allow()
+        for _ in range(12):
+            burst.failure(RuntimeError('down'))
+        burst_stats = burst.stats()
+        if burst_stats['trips'] != 1 or not 0 < burst_stats['retry_in'] <= 1.0:
+            print(f"❌ In-flight failures re-tripped the open breaker: {burst_stats}")
+            return False
+        
+        def unreachable(**connection_params):
+            raise fake_snowflake.errors.OperationalError('Failed to connect to DB', errno=250001)
+        
+        original_config, original_breaker = fake_snowflake.config, cortex_ai.breaker
+        original_connect = fake_snowflake.connect
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        cortex_ai.breaker = CircuitBreaker('Snowflake', failure_threshold=2, backoff=0.2)
+        headers = {'X-Cache-Bypass': '1'}
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                fake_snowflake.connect = unreachable
+                with app.test_client() as client:
+                    statuses = [client.post('/api/risk/assess', json={'income': 50000}, headers=headers)
+                                for _ in range(4)]
+                    rejected = statuses[-1]
+                    started = time.perf_counter()
+                    client.post('/api/risk/assess', json={'income': 50000}, headers=headers)
+                    fail_fast = time.perf_counter() - started
+                    degraded = client.get('/api/health').get_json()
+                    
+                    fake_snowflake.connect = original_connect
+                    time.sleep(0.25)
+                    recovered = client.post('/api/risk/assess', json={'income': 50000}, headers=headers)
+                    healthy = client.get('/api/health').get_json()
+        finally:
+            fake_snowflake.connect = original_connect
+            fake_snowflake.config = original_config
+            cortex_ai.breaker = original_breaker
+        
+        if rejected.status_code != 503 or not rejected.headers.get('Retry-After'):
+            print(f"❌ Open circuit not answered with 503 and Retry-After: {[r.status_code for r in statuses]}")
+            return False
+        if degraded['status'] != 'degraded' or degraded['snowflake_circuit']['state'] != 'open':
+            print(f"❌ Health endpoint does not report the open circuit: {degraded}")
+            return False
+        if recovered.status_code != 200 or healthy['snowflake_circuit']['state'] != 'closed':
+            print(f"❌ Circuit did not close after Snowflake recovered: {recovered.status_code}, {healthy}")
+            return False
+        
+        print(f"✅ Circuit breaker working (open-circuit reply in {fail_fast * 1000:.1f}ms, "
+              f"{degraded['snowflake_circuit']['trips']} trip)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Circuit breaker test failed: {e}")
+        return False
+
+def test_workload_isolation():
+    """Test that bulk endpoints run on their own warehouse and pool, leaving interactive calls unblocked."""
+    try:
+        import time
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import app, cortex_ai
+        
+        bulk, interactive = cortex_ai.workloads['bulk'], cortex_ai.workloads['interactive']
+        original_config, original_warehouse = fake_snowflake.config, bulk.warehouse
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        bulk.warehouse = 'FINAI_BULK_WH'
+        bulk_before, interactive_before = bulk.stats()['queries'], interactive.stats()['queries']
+        headers = {'X-Cache-Bypass': '1'}
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                with app.test_client() as client:
+                    portfolio = client.post('/api/risk/portfolio', json={'customer_ids': ['CUST001', 'CUST002']},
+                                            headers=headers)
+                    portfolio_queries = list(fake_snowflake.query_history)[-1:]
+                    
+                    # Saturate the bulk pool; interactive requests must not wait for it
+                    held = [bulk.pool.acquire() for _ in range(bulk.pool.max_size)]
+                    started = time.perf_counter()
+                    assessed = client.post('/api/risk/assess', json={'income': 91000}, headers=headers)
+                    interactive_seconds = time.perf_counter() - started
+                    assessed_queries = list(fake_snowflake.query_history)[-1:]
+                    for pooled in held:
+                        bulk.pool.release(pooled)
+                    workloads = client.get('/api/health').get_json()['workloads']
+        finally:
+            fake_snowflake.config = original_config
+            bulk.warehouse = original_warehouse
+        
+        if portfolio.status_code != 200 or assessed.status_code != 200:
+            print(f"❌ Unexpected status codes: {portfolio.status_code}, {assessed.status_code}")
+            return False
+        if portfolio_queries[0]['WAREHOUSE_NAME'] != 'FINAI_BULK_WH' or \
+                assessed_queries[0]['WAREHOUSE_NAME'] != interactive.warehouse:
+            print(f"❌ Statements ran on the wrong warehouse: {portfolio_queries}, {assessed_queries}")
+            return False
+        if interactive_seconds > 1:
+            print(f"❌ Interactive request waited on the saturated bulk pool ({interactive_seconds:.2f}s)")
+            return False
+        if workloads['bulk']['queries'] <= bulk_before or workloads['interactive']['queries'] <= interactive_before:
+            print(f"❌ Per-workload statistics not recorded: {workloads}")
+            return False
+        
+        print(f"✅ Workload isolation working (interactive call in {interactive_seconds * 1000:.1f}ms "
+              f"with the bulk pool saturated)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Workload isolation test failed: {e}")
+        return False
+
+def test_traffic_capture_replay():
+    """Test that captured requests are written with PII masked and replay with a per-route latency report."""
+    try:
+        import json
+        import os
+        import tempfile
+        import fake_snowflake
+        from fake_snowflake import LatencyModel
+        from traffic_capture import PiiMasker, TrafficCapture
+        from benchmark import fake_snowflake_backend
+        from replay import load_capture, replay_in_process
+        from app import app, cortex_ai
+        
+        original_config, original_wsgi_app = fake_snowflake.config, app.wsgi_app
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'capture-{pid}.jsonl')
+            capture = TrafficCapture(app.wsgi_app, path, masker=PiiMasker(salt='test'), exempt=('/api/health',))
+            app.wsgi_app = capture
+            try:
+                with fake_snowflake_backend(cortex_ai), app.test_client() as client:
+                    client.post('/api/risk/assess', json={'income': 91000, 'email': 'pat@example.com',
+                                                          'customer_id': 'CUST001'},
+                                headers={'X-API-Key': 'secret-key'})
+                    client.post('/api/risk/assess', json={'income': 91000, 'email': 'pat@example.com',
+                                                          'customer_id': 'CUST001'})
+                    client.get('/api/risk/assess/CUST001')
+                    client.get('/api/health')
+                capture.flush()
+            finally:
+                app.wsgi_app = original_wsgi_app
+            
+            captured = path.format(pid=os.getpid())
+            with open(captured) as f:
+                raw = f.read()
+            records = load_capture([captured])
+            try:
+                results = replay_in_process(records, speed=0, concurrency=2)
+            finally:
+                fake_snowflake.config = original_config
+        
+        if records and records[0]['status'] != 200:
+            print(f"❌ Captured request failed: {records[0]}")
+            return False
+        if len(records) != 3 or any(value in raw for value in ('pat@example.com', 'secret-key', 'CUST001')):
+            print(f"❌ Capture not sampled or not masked: {raw}")
+            return False
+        masked = [record['body']['email'] for record in records[:2]]
+        customer = records[0]['body']['customer_id']
+        if masked[0] != masked[1] or not masked[0].startswith('masked-') or records[0]['body']['income'] != 91000 or \
+                records[2]['path'] != f'/api/risk/assess/{customer}':
+            print(f"❌ Masking is not stable or dropped non-PII fields: {records}")
+            return False
+        if not all(record['status'] and record['response_bytes'] and record['duration_ms'] for record in records):
+            print(f"❌ Capture missing status, size or timing: {records}")
+            return False
+        route = results['routes'].get('/api/risk/assess')
+        if not route or route['requests'] != 2 or route['errors'] or route['status_mismatches']:
+            print(f"❌ Unexpected replay report: {results['routes']}")
+            return False
+        
+        print(f"✅ Traffic capture and replay working (replay p95 {route['p95_ms']}ms, "
+              f"captured p95 {route['captured']['p95_ms']}ms)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Traffic capture test failed: {e}")
+        return False
+
+def test_replay_chat_sessions():
+    """Test that replay maps masked chat sessions to the ones it creates and swaps in a real API key."""
+    try:
+        import os
+        import tempfile
+        import fake_snowflake
+        from fake_snowflake import LatencyModel
+        from traffic_capture import PiiMasker, TrafficCapture
+        from benchmark import fake_snowflake_backend
+        from replay import app_sender, load_capture, run_replay
+        from app import app, cortex_ai
+        
+        original_config, original_wsgi_app = fake_snowflake.config, app.wsgi_app
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0),
+        )
+        headers = {'X-API-Key': 'secret-key', 'X-Cache-Bypass': '1'}
+        sent_keys = []
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'capture.jsonl')
+                capture = TrafficCapture(app.wsgi_app, path, masker=PiiMasker(salt='test'))
+                app.wsgi_app = capture
+                try:
+                    with fake_snowflake_backend(cortex_ai), app.test_client() as client:
+                        session_id = client.post('/api/chat/sessions', headers=headers).get_json()['session_id']
+                        client.post('/api/chat/financial', json={'question': 'Should I refinance?',
+                                                                 'session_id': session_id}, headers=headers)
+                        client.get(f'/api/chat/sessions/{session_id}', headers=headers)
+                    capture.flush()
+                finally:
+                    app.wsgi_app = original_wsgi_app
+                with open(path) as f:
+                    raw = f.read()
+                records = load_capture([path])
+            
+            sender = app_sender(app)
+            
+            def send(record):
+                sent_keys.append(record['headers'].get('X-API-Key'))
+                return sender(record)
+            
+            with fake_snowflake_backend(cortex_ai):
+                results = run_replay(records, send, speed=0, concurrency=3, url_map=app.url_map, api_key='replay-key')
+        finally:
+            fake_snowflake.config = original_config
+        
+        if session_id in raw or len(records) != 3 or [record['status'] for record in records] != [201, 200, 200]:
+            print(f"❌ Session capture not masked or incomplete: {raw}")
+            return False
+        if results['overall']['status_mismatches'] or results['overall']['errors']:
+            print(f"❌ Replayed session requests did not find their sessions: {results['routes']}")
+            return False
+        if sent_keys != ['replay-key'] * 3:
+            print(f"❌ Masked API key not replaced: {sent_keys}")
+            return False
+        
+        print("✅ Replay maps chat sessions and API keys")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Replay chat sessions test failed: {e}")
+        return False
+
+def test_initialize_all_workload_pools():
+    """Test that startup connects, pre-warms and keeps alive every workload pool, not just the interactive one."""
+    try:
+        import os
+        import fake_snowflake
+        from benchmark import fake_snowflake_backend
+        from fake_snowflake import LatencyModel
+        from app import cortex_ai, initialize_snowflake, STARTUP_SECONDS
+        
+        original_config, original_prescreen = fake_snowflake.config, cortex_ai.prescreen
+        saved_prewarm = os.environ.get('SNOWFLAKE_POOL_PREWARM_BULK')
+        fake_snowflake.config = fake_snowflake.FakeConfig()
+        fake_snowflake.configure(
+            cortex_latency=LatencyModel(kind='constant', median=0),
+            query_latency=LatencyModel(kind='constant', median=0),
+            connect_latency=LatencyModel(kind='constant', median=0.05),
+        )
+        os.environ['SNOWFLAKE_POOL_PREWARM_BULK'] = '2'
+        cortex_ai.prescreen = None
+        try:
+            with fake_snowflake_backend(cortex_ai):
+                initialized = initialize_snowflake()
+                sizes = {name: workload.pool.stats()['size'] for name, workload in cortex_ai.workloads.items()}
+                keepalive = {name: bool(workload.pool._keepalive_thread) for name, workload in cortex_ai.workloads.items()}
+        finally:
+            fake_snowflake.config = original_config
+            cortex_ai.prescreen = original_prescreen
+            if saved_prewarm is None:
+                os.environ.pop('SNOWFLAKE_POOL_PREWARM_BULK', None)
+            else:
+                os.environ['SNOWFLAKE_POOL_PREWARM_BULK'] = saved_prewarm
+        
+        if not initialized or not all(sizes.values()) or sizes['bulk'] != 2:
+            print(f"❌ Not every workload pool was connected and pre-warmed: {sizes}")
+            return False
+        if cortex_ai.keepalive_interval and not all(keepalive.values()):
+            print(f"❌ Keepalive not started for every pool: {keepalive}")
+            return False
+        missing = [name for name in sizes if f'pool_{name}' not in STARTUP_SECONDS]
+        if missing:
+            print(f"❌ Startup time not recorded for pools: {missing}")
+            return False
+        
+        print(f"✅ All workload pools connected at startup ({sizes}, {STARTUP_SECONDS['connect']:.2f}s)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Workload pool startup test failed: {e}")
+        return False
+
+def test_admission_control():
+    """Test that requests beyond the active and queue limits are shed with 429 and Retry-After."""
+    try:
+        import time
+        import threading
+        from werkzeug.test import Client
+        from werkzeug.wrappers import Response as WerkzeugResponse
+        from admission import AdmissionController
+        
+        def slow_app(environ, start_response):
+            time.sleep(0.3)
+            return WerkzeugResponse('ok')(environ, start_response)
+        
+        controller = AdmissionController(slow_app, max_active=1, max_queue=1, queue_timeout=5,
+                                         exempt=('/api/health',))
+        statuses, retry_after = [], []
+        
+        def call(path='/api/chat/financial'):
+            response = Client(controller).get(path)
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                retry_after.append(response.headers.get('Retry-After'))
+        
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        health = threading.Thread(target=call, args=('/api/health',))
+        health.start()
+        for thread in threads + [health]:
+            thread.join()
+        
+        if sorted(statuses) != [200, 200, 200, 429] or not retry_after or not retry_after[0].isdigit():
+            print(f"❌ Unexpected admission outcome: {statuses}, Retry-After {retry_after}")
+            return False
+        stats = controller.stats()
+        if stats['active'] != 0 or stats['rejected']['queue_full'] != 1:
+            print(f"❌ Unexpected admission stats: {stats}")
+            return False
+        
+        print(f"✅ Admission control working (shed 1 of 3, Retry-After {retry_after[0]}s)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Admission control test failed: {e}")
+        return False
+
+def test_job_polls_bypass_admission():
+    """Test that long-polling job status does not take the admission slots Snowflake-bound requests need."""
+    try:
+        import time
+        import threading
+        from async_jobs import AsyncJob
+        from app import app, cortex_ai, scheduler
+        
+        job = AsyncJob('risk', query_id='query-1')
+        original = cortex_ai.jobs.get, cortex_ai.refresh_job
+        cortex_ai.jobs.get = lambda job_id: job
+        cortex_ai.refresh_job = lambda job: job
+        statuses = []
+        
+        def poll():
+            with app.test_client() as client:
+                statuses.append(client.get('/api/jobs/query-1?wait=1').status_code)
+        
+        pollers = [threading.Thread(target=poll) for _ in range(scheduler.capacity + 4)]
+        try:
+            for thread in pollers:
+                thread.start()
+            time.sleep(0.2)
+            started = time.perf_counter()
+            with app.test_client() as client:
+                normal = client.get('/api/cache/stats')
+            normal_seconds = time.perf_counter() - started
+            for thread in pollers:
+                thread.join()
+        finally:
+            cortex_ai.jobs.get, cortex_ai.refresh_job = original
+        
+        if normal.status_code != 200 or normal_seconds > 0.5:
+            print(f"❌ Normal request blocked behind job polls: {normal.status_code} in {normal_seconds:.2f}s")
+            return False
+        if statuses != [200] * len(pollers):
+            print(f"❌ Job polls were shed: {statuses}")
+            return False
+        
+        print(f"✅ Job polls bypass admission ({len(pollers)} long-polls, normal request in "
+              f"{normal_seconds * 1000:.1f}ms)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Job poll admission test failed: {e}")
+        return False
+
+def test_priority_scheduler():
+    """Test that high-priority requests bypass queued low-priority work and API keys are rate limited."""
+    try:
+        import time
+        import threading
+        from werkzeug.test import Client
+        from werkzeug.wrappers import Response as WerkzeugResponse
+        from admission import AdmissionController
+        from scheduler import PriorityClass, Scheduler
+        
+        def slow_app(environ, start_response):
+            time.sleep(0.2)
+            return WerkzeugResponse('ok')(environ, start_response)
+        
+        def classify(path):
+            return 'high' if path.startswith('/api/fraud') else 'low'
+        
+        # Two slots; low may only fill one, so one is always free for high
+        scheduler = Scheduler(2, [PriorityClass('high', 0, 2, 4, 5.0), PriorityClass('low', 1, 1, 4, 5.0)])
+        controller = AdmissionController(slow_app, scheduler=scheduler, classify=classify)
+        finished = {}
+        
+        def call(name, path):
+            started = time.monotonic()
+            Client(controller).get(path)
+            finished[name] = time.monotonic() - started
+        
+        threads = [threading.Thread(target=call, args=(f'chat{i}', '/api/chat/financial')) for i in range(3)]
+        threads.append(threading.Thread(target=call, args=('fraud', '/api/fraud/analyze')))
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        time.sleep(0.05)
+        queued = scheduler.stats()['classes']['low']['queued']
+        for thread in threads:
+            thread.join()
+        
+        if queued != 2 or finished['fraud'] > 0.35 or max(finished.values()) < 0.55:
+            print(f"❌ High priority request was not isolated from low priority queueing: {finished}, queued {queued}")
+            return False
+        
+        # A freed slot goes to the waiting high-priority request before earlier low-priority ones
+        scheduler = Scheduler(1, [PriorityClass('high', 0, 1, 4, 5.0), PriorityClass('low', 1, 1, 4, 5.0)])
+        controller = AdmissionController(slow_app, scheduler=scheduler, classify=classify)
+        order = []
+        
+        def ordered_call(name, path):
+            Client(controller).get(path)
+            order.append(name)
+        
+        threads = [threading.Thread(target=ordered_call, args=args) for args in
+                   [('chat0', '/api/chat/financial'), ('chat1', '/api/chat/financial'),
+                    ('fraud', '/api/fraud/analyze')]]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+        
+        if order != ['chat0', 'fraud', 'chat1']:
+            print(f"❌ Unexpected completion order: {order}")
+            return False
+        
+        # Token bucket per API key: one request of burst, then 429 until it refills
+        scheduler = Scheduler(4, [PriorityClass('low', 0, 4, 4, 5.0, rate=0.01, burst=1)])
+        controller = AdmissionController(lambda environ, start_response: WerkzeugResponse('ok')(environ, start_response),
+                                         scheduler=scheduler, client_id=lambda environ: environ.get('HTTP_X_API_KEY'))
+        statuses = [Client(controller).get('/api/chat/financial', headers={'X-API-Key': key}).status_code
+                    for key in ('alpha', 'alpha', 'beta')]
+        limited = Client(controller).get('/api/chat/financial', headers={'X-API-Key': 'alpha'})
+        
+        if statuses != [200, 429, 200] or limited.get_json()['reason'] != 'rate_limited' \
+                or int(limited.headers['Retry-After']) < 60:
+            print(f"❌ Unexpected rate limiting: {statuses}, {limited.get_json()}")
+            return False
+        if controller.stats()['rejected']['rate_limited'] != 2:
+            print(f"❌ Unexpected rate limit stats: {controller.stats()}")
+            return False
+        
+        print(f"✅ Priority scheduler working (fraud {finished['fraud'] * 1000:.0f}ms behind 3 queued chats)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Priority scheduler test failed: {e}")
+        return False
+
 def main():
     """Run all tests."""
     print("🧪 Testing FinAI Flask Backend")
@@ -68,7 +1677,36 @@ def main():
     tests = [
         ("Import Test", test_import),
         ("Routes Test", test_routes),
-        ("Health Endpoint Test", test_health_endpoint)
+        ("Health Endpoint Test", test_health_endpoint),
+        ("Connection Pool Test", test_connection_pool),
+        ("Pool Keepalive Test", test_pool_keepalive),
+        ("Fraud Batch Test", test_fraud_batch),
+        ("Response Cache Test", test_response_cache),
+        ("Fraud Pre-screen Test", test_fraud_prescreen),
+        ("Fraud Score Streaming Test", test_fraud_scores_stream),
+        ("Chat Event Stream Test", test_chat_event_stream),
+        ("Chat REST Streaming Test", test_chat_rest_streaming),
+        ("Async Jobs Test", test_async_jobs),
+        ("Single-flight Test", test_single_flight),
+        ("Metrics Endpoint Test", test_metrics_endpoint),
+        ("Benchmark Harness Test", test_benchmark),
+        ("Fast Startup Test", test_fast_startup),
+        ("Model Routing Test", test_model_routing),
+        ("Request Deadline Test", test_request_deadline),
+        ("News Sentiment Scoring Test", test_news_sentiment_scoring),
+        ("Customer Risk Lookup Test", test_customer_risk_lookup),
+        ("Chat Sessions Test", test_chat_sessions),
+        ("Semantic Chat Cache Test", test_semantic_chat_cache),
+        ("Slow Query Log Test", test_slow_query_log),
+        ("Circuit Breaker Test", test_circuit_breaker),
+        ("Budget Timeout Breaker Test", test_budget_timeouts_keep_breaker_closed),
+        ("Workload Isolation Test", test_workload_isolation),
+        ("Workload Pool Startup Test", test_initialize_all_workload_pools),
+        ("Traffic Capture Replay Test", test_traffic_capture_replay),
+        ("Replay Chat Sessions Test", test_replay_chat_sessions),
+        ("Admission Control Test", test_admission_control),
+        ("Job Poll Admission Test", test_job_polls_bypass_admission),
+        ("Priority Scheduler Test", test_priority_scheduler)
     ]
     
     passed = 0
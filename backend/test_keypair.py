@@ -69,12 +69,11 @@ def test_keypair_auth():
             
             # Test a simple query
             try:
-                cortex_ai.cursor.execute("SELECT CURRENT_USER() as user, CURRENT_WAREHOUSE() as warehouse")
-                result = cortex_ai.cursor.fetchone()
+                result = cortex_ai._fetch_one("SELECT CURRENT_USER() as user, CURRENT_WAREHOUSE() as warehouse")
                 print(f"   Connected as: {result['USER']}")
                 print(f"   Using warehouse: {result['WAREHOUSE']}")
                 
-                cortex_ai.connection.close()
+                cortex_ai.pool.close()
                 return True
                 
             except Exception as e:
@@ -0,0 +1,271 @@
+"""
+Traffic capture for the FinAI backend.
+Records sampled API requests with their timings and response sizes to JSONL, PII masked, for replay with replay.py.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# JSON body fields whose values are replaced with a keyed hash; matched case-insensitively at any depth
+DEFAULT_MASK_FIELDS = frozenset({
+    'name', 'first_name', 'last_name', 'full_name', 'customer_name', 'email', 'phone', 'ssn', 'address',
+    'date_of_birth', 'dob', 'account_number', 'card_number', 'iban', 'session_id', 'customer_id',
+})
+
+# Request headers worth replaying; anything else (cookies, authorization) is dropped
+CAPTURED_HEADERS = ('Content-Type', 'Accept', 'Prefer', 'Cache-Control', 'X-Cache-Bypass', 'X-Model-Tier',
+                    'X-Request-Timeout')
+MASKED_HEADERS = ('X-API-Key',)
+
+# Paths ending in an ID, masked like the matching body field (customer_id, session_id) so requests stay grouped
+MASKED_PATHS = (
+    re.compile(r'^(/api/chat/sessions/)([^/]+)$'),
+    re.compile(r'^(/api/risk/assess/)([^/]+)$'),
+)
+
+# A session ID handed out in a JSON response or an SSE event
+SESSION_ID_PATTERN = re.compile(rb'"session_id":\s*"([^"]+)"')
+
+# PII that turns up inside free text such as chat questions
+_TEXT_PATTERNS = (
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), '[email]'),
+    (re.compile(r'\b\d{3}-\d{2}-\d{4}\b'), '[ssn]'),
+    (re.compile(r'\b(?:\d[ -]?){12,18}\d\b'), '[card]'),
+    (re.compile(r'(?<![\w$.,])\+?\(?\d{3}\)?[ .-]?\d{3}[ .-]?\d{4}\b'), '[phone]'),
+)
+
+
+def mask_text(text):
+    for pattern, replacement in _TEXT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class PiiMasker:
+    """Masks PII in captured JSON bodies.
+
+    Values of ``fields`` become ``masked-<hash>`` tokens keyed with
+    ``salt``, so one customer's requests still share a token (keeping cache
+    and rate-limit behaviour realistic on replay) without the raw value
+    being recoverable. Other strings have emails, SSNs, card and phone
+    numbers replaced; numbers and booleans are kept as they are.
+    """
+
+    def __init__(self, fields=DEFAULT_MASK_FIELDS, salt=None):
+        self.fields = frozenset(field.lower() for field in fields)
+        self.salt = (salt or os.urandom(16).hex()).encode('utf-8')
+
+    def token(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), key=self.salt[:64], digest_size=6).hexdigest()
+        return f'masked-{digest}'
+
+    def mask(self, value, field=None):
+        if isinstance(value, dict):
+            return {key: self.mask(item, key) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.mask(item, field) for item in value]
+        if field is not None and field.lower() in self.fields and value is not None:
+            return self.token(value)
+        if isinstance(value, str):
+            return mask_text(value)
+        return value
+
+
+class TrafficCapture:
+    """WSGI middleware that writes a sample of requests to a JSONL file.
+
+    Each of ``sample_rate`` of the requests not under an ``exempt`` prefix
+    is recorded with its arrival time, method, path, query string, a few
+    replay-relevant headers, its JSON body (masked by ``masker``, and only
+    up to ``max_body`` bytes), the response status and size, the masked
+    chat session ID the response returned (if any, within its first
+    ``max_body`` bytes), and the time until the response body was fully
+    sent. Records are written by a
+    background thread; if more than ``max_pending`` are waiting, new ones
+    are dropped and counted rather than slowing requests down.
+
+    ``path`` may contain ``{pid}`` so each server process writes its own
+    file.
+    """
+
+    def __init__(self, app, path, sample_rate=1.0, max_body=65536, masker=None, exempt=(), max_pending=10000):
+        self.app = app
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body = max_body
+        self.masker = masker or PiiMasker()
+        self.exempt = tuple(exempt)
+
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._captured = 0
+        self._dropped = 0
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(self.exempt) or random.random() >= self.sample_rate:
+            return self.app(environ, start_response)
+
+        started = time.perf_counter()
+        record = {
+            'ts': round(time.time(), 6),
+            'method': environ.get('REQUEST_METHOD', 'GET'),
+            'path': self._mask_path(path),
+            'query': environ.get('QUERY_STRING', ''),
+            'headers': self._headers(environ),
+        }
+        record['request_bytes'], record['body'] = self._read_body(environ)
+
+        def capturing_start_response(status, headers, *args):
+            record['status'] = int(status.split(' ', 1)[0])
+            record['trace_id'] = next((value for name, value in headers if name.lower() == 'x-trace-id'), None)
+            return start_response(status, headers, *args)
+
+        def finish(response_bytes, head):
+            record['response_bytes'] = response_bytes
+            record['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            session = SESSION_ID_PATTERN.search(head)
+            if session:
+                record['session_id'] = self.masker.token(session.group(1).decode('utf-8'))
+            self._enqueue(record)
+
+        return _CountingIterable(self.app(environ, capturing_start_response), finish, self.max_body)
+
+    def _mask_path(self, path):
+        for pattern in MASKED_PATHS:
+            match = pattern.match(path)
+            if match:
+                return match.group(1) + self.masker.token(match.group(2))
+        return path
+
+    def _headers(self, environ):
+        headers = {}
+        for name in CAPTURED_HEADERS + MASKED_HEADERS:
+            value = environ.get('CONTENT_TYPE' if name == 'Content-Type' else 'HTTP_' + name.upper().replace('-', '_'))
+            if value:
+                headers[name] = self.masker.token(value) if name in MASKED_HEADERS else value
+        return headers
+
+    def _read_body(self, environ):
+        """Return ``(size, masked JSON body or None)``, leaving the body readable by the app."""
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > self.max_body:
+            return length, None
+
+        raw = environ['wsgi.input'].read(length)
+        environ['wsgi.input'] = io.BytesIO(raw)
+        try:
+            return length, self.masker.mask(json.loads(raw))
+        except ValueError:
+            return length, None
+
+    def _enqueue(self, record):
+        self._ensure_writer()
+        try:
+            self._pending.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            return
+        with self._stats_lock:
+            self._captured += 1
+
+    def _ensure_writer(self):
+        # Started lazily so each forked server process gets its own writer thread
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._write_loop, name='traffic-capture', daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+
+    def _write_loop(self):
+        path = self.path.format(pid=os.getpid())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            while True:
+                records = [self._pending.get()]
+                while True:
+                    try:
+                        records.append(self._pending.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+                    f.flush()
+                except Exception as e:
+                    logger.error(f"Traffic capture write failed: {e}")
+                finally:
+                    for _ in records:
+                        self._pending.task_done()
+
+    def flush(self):
+        """Block until every captured record has been written."""
+        self._pending.join()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'path': self.path,
+                'sample_rate': self.sample_rate,
+                'captured': self._captured,
+                'dropped': self._dropped,
+                'pending': self._pending.qsize(),
+            }
+
+
+class _CountingIterable:
+    """Response body wrapper that counts bytes sent and reports once the body is finished or closed.
+
+    The first ``keep`` bytes are passed to ``finish`` along with the count.
+    """
+
+    def __init__(self, body, finish, keep=0):
+        self._body = body
+        self._finish = finish
+        self._keep = keep
+        self._head = bytearray()
+        self._bytes = 0
+        self._finished = False
+
+    def __iter__(self):
+        try:
+            for chunk in self._body:
+                self._bytes += len(chunk)
+                if len(self._head) < self._keep:
+                    self._head += chunk[:self._keep - len(self._head)]
+                yield chunk
+        finally:
+            self._finish_once()
+
+    def close(self):
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._finish_once()
+
+    def _finish_once(self):
+        if not self._finished:
+            self._finished = True
+            self._finish(self._bytes, bytes(self._head))
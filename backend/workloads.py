@@ -0,0 +1,95 @@
+"""
+Workload isolation for the FinAI backend.
+Routes each endpoint to a workload class with its own Snowflake warehouse and connection pool, so bulk jobs never queue in front of interactive calls.
+"""
+
+import contextvars
+import threading
+from collections import deque
+
+DEFAULT_WORKLOAD = 'interactive'
+
+# workload -> (minimum pool size, maximum pool size); each can be overridden per workload
+DEFAULT_WORKLOADS = {
+    'interactive': (1, 8),
+    'chat': (0, 4),
+    'bulk': (0, 4),
+}
+
+# (path prefix, workload); the first match wins and unmatched paths are interactive
+DEFAULT_WORKLOAD_ROUTES = (
+    ('/api/fraud/analyze/batch', 'bulk'),
+    ('/api/fraud/bulk-score', 'bulk'),
+    ('/api/fraud/scores', 'bulk'),
+    ('/api/risk/portfolio', 'bulk'),
+    ('/api/market/news/score', 'bulk'),
+    ('/api/chat', 'chat'),
+)
+
+_workload = contextvars.ContextVar('finai_workload', default=None)
+
+
+def workload_for_path(path, routes=DEFAULT_WORKLOAD_ROUTES, default=DEFAULT_WORKLOAD):
+    for prefix, name in routes:
+        if path.startswith(prefix):
+            return name
+    return default
+
+
+def current_workload():
+    return _workload.get()
+
+
+def set_workload(name):
+    """Route this context's Snowflake calls to workload ``name``; ``None`` restores the default."""
+    _workload.set(name)
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Workload:
+    """One class of Snowflake traffic: its warehouse, connection pool and latency statistics.
+
+    ``record`` is called once per statement with the time it waited for a
+    pooled connection and its total time. The most recent ``samples`` of
+    each are kept for percentiles, so a bulk run shows up in its own
+    numbers instead of in the interactive ones.
+    """
+
+    def __init__(self, name, warehouse, pool=None, samples=1024):
+        self.name = name
+        self.warehouse = warehouse
+        self.pool = pool
+
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._errors = 0
+        self._checkout = deque(maxlen=samples)
+        self._latency = deque(maxlen=samples)
+
+    def record(self, checkout_seconds, total_seconds, error=False):
+        with self._lock:
+            self._queries += 1
+            self._errors += bool(error)
+            self._checkout.append(checkout_seconds)
+            self._latency.append(total_seconds)
+
+    def stats(self):
+        with self._lock:
+            checkout, latency = list(self._checkout), list(self._latency)
+            queries, errors = self._queries, self._errors
+        return {
+            'warehouse': self.warehouse,
+            'pool': self.pool.stats() if self.pool is not None else None,
+            'queries': queries,
+            'errors': errors,
+            'checkout_p50_ms': round(_percentile(checkout, 0.5) * 1000, 1),
+            'checkout_p95_ms': round(_percentile(checkout, 0.95) * 1000, 1),
+            'latency_p50_ms': round(_percentile(latency, 0.5) * 1000, 1),
+            'latency_p95_ms': round(_percentile(latency, 0.95) * 1000, 1),
+        }
@@ -55,7 +55,8 @@ echo "2. Build and run on iOS Simulator or device"
 echo ""
 
 echo "🚀 To start the backend server:"
-echo "   cd backend && python app.py"
+echo "   cd backend && python app.py      # development"
+echo "   cd backend && python serve.py    # production (gunicorn)"
 echo ""
 
 echo "🎯 Features to demonstrate:"
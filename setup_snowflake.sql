@@ -53,7 +53,29 @@ CREATE OR REPLACE TABLE market_news (
     publish_date TIMESTAMP,
     sector VARCHAR(100),
     sentiment_score DECIMAL(3,2),
-    impact_level VARCHAR(20)
+    impact_level VARCHAR(20),
+    content_hash VARCHAR(64),  -- SHA2 of headline and content when last scored
+    scored_at TIMESTAMP
+);
+
+-- Optional (Enterprise Edition): speeds up /api/market/news/<news_id>/sentiment and sector lookups
+-- ALTER TABLE market_news ADD SEARCH OPTIMIZATION ON EQUALITY(news_id, sector);
+
+-- High-water marks for incremental scoring jobs (/api/market/news/score)
+CREATE TABLE IF NOT EXISTS scoring_watermarks (
+    pipeline VARCHAR(100) PRIMARY KEY,
+    watermark TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+-- Create fraud scores table populated by the bulk scoring job (/api/fraud/bulk-score)
+CREATE TABLE IF NOT EXISTS fraud_scores (
+    transaction_id VARCHAR(50) PRIMARY KEY,
+    risk_score INTEGER,
+    risk_level VARCHAR(20),
+    explanation TEXT,
+    model VARCHAR(100),
+    scored_at TIMESTAMP
 );
 
 -- Insert sample transaction data
@@ -71,7 +93,7 @@ INSERT INTO customers VALUES
 ('CUST003', 'Mike', 'Davis', 'mike.davis@email.com', '555-0789', '789 Pine St', 'Los Angeles', 'CA', '90210', '1988-11-08', 95000.00, 780, 'Full-time', 7, 20.0, 0, 10.0, '2019-06-01 00:00:00');
 
 -- Insert sample market news
-INSERT INTO market_news VALUES
+INSERT INTO market_news (news_id, headline, content, source, publish_date, sector, sentiment_score, impact_level) VALUES
 ('NEWS001', 'Tech Stocks Rally on Strong Earnings', 'Major technology companies reported better-than-expected earnings for Q4, driving significant gains across the NASDAQ index. Apple, Microsoft, and Google led the charge with double-digit percentage increases.', 'Financial Times', '2024-01-16 08:00:00', 'Technology', 0.85, 'High'),
 ('NEWS002', 'Federal Reserve Signals Interest Rate Cuts', 'The Federal Reserve indicated potential interest rate cuts in the coming months, citing cooling inflation and economic stability concerns.', 'Reuters', '2024-01-16 10:30:00', 'Banking', 0.60, 'Medium'),
 ('NEWS003', 'Banking Sector Faces Regulatory Challenges', 'New regulatory requirements are expected to impact banking operations and profitability in the upcoming quarter.', 'Wall Street Journal', '2024-01-16 12:15:00', 'Banking', -0.40, 'Medium');